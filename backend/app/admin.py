@@ -0,0 +1,45 @@
+import hmac
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.config import settings
+from app.models.registry import RoomListPage, RoomRegistrySummary
+from app.services.room_service import room_service
+
+
+def require_admin(authorization: Optional[str] = Header(default=None)) -> None:
+    """Allow requests bearing ADMIN_TOKEN; without one configured the endpoints don't exist"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+# Every endpoint reads the rooms:active/rooms:activity registry, never KEYS
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/rooms", response_model=RoomListPage)
+async def list_rooms(
+    order: Literal["recent", "oldest", "active"] = "recent",
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=200)
+):
+    """Live rooms by latest activity, longest idle or most changes"""
+    return await room_service.list_rooms(order, offset, limit)
+
+
+@router.get("/rooms/summary", response_model=RoomRegistrySummary)
+async def rooms_summary():
+    """Room count plus the most recently active, least recently active and most active rooms"""
+    summary = await room_service.room_registry_summary()
+    if summary is None:
+        raise HTTPException(status_code=503, detail="Room registry unavailable")
+    return summary
+
+
+@router.post("/rooms/reindex")
+async def reindex_rooms():
+    """Register rooms the registry is missing, walking Redis with SCAN"""
+    return {"added": await room_service.reindex_rooms()}
@@ -3,15 +3,94 @@ from typing import List, Optional
 
 
 class Settings(BaseSettings):
+    # Where rooms live: "redis", or "memory" to keep them in this process
+    # (single node only; rooms are lost on restart, no Redis needed)
+    room_storage: str = "redis"
     # Redis connection - supports both URL format (Render) and host/port format (local)
     redis_url: Optional[str] = None
     redis_host: str = "redis"
     redis_port: int = 6379
     redis_db: int = 0
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0  # Seconds to wait for a free pooled connection
+    redis_socket_timeout: float = 5.0  # Seconds to connect, and to wait for a reply
+    redis_health_check_interval: int = 30  # Pooled connections idle this long are pinged before reuse
+    redis_retries: int = 2  # Reconnects per failed command, with exponential backoff
+    # Consecutive connection failures after which Redis calls fail fast for
+    # redis_breaker_reset seconds, doubling after each failed probe up to
+    # redis_breaker_max_reset
+    redis_breaker_threshold: int = 5
+    redis_breaker_reset: float = 1.0
+    redis_breaker_max_reset: float = 30.0
     room_ttl: int = 86400  # 24 hours
+    empty_room_ttl: int = 600  # Seconds a room created by POST /rooms lasts if nobody joins it
+    room_touch_interval: float = 300.0  # Min seconds between TTL refreshes of a room that is read but not written
+    room_reap_interval: float = 60.0  # Seconds between sweeps that touch rooms with connected users and reap expired ones
+    vote_history_limit: int = 100  # Revealed rounds kept per room
+    room_event_log_size: int = 200  # Changes kept per room (approximately) for replay on reconnect; 0 disables the log
+    room_cache_size: int = 1000  # Max rooms cached in-process (0 disables the cache)
+    room_cache_ttl: float = 30.0  # Seconds before a cached room is re-read from Redis
+    # File the rooms with connected users are snapshotted to every
+    # snapshot_interval seconds and on shutdown, and preloaded from at startup
+    # (unset disables snapshots). With ROOM_STORAGE=memory the snapshot holds
+    # every room, so rooms survive a restart.
+    snapshot_path: Optional[str] = None
+    snapshot_interval: float = 30.0
+    warm_start_rooms: int = 500  # Max rooms preloaded into the room cache at startup
+    # On shutdown each client is told to wait a random 1..reconnect_stagger
+    # seconds before reconnecting, so a restart does not bring them all back at once
+    reconnect_stagger: float = 10.0
     cors_origins: str = "http://localhost:5173"
+    admin_token: Optional[str] = None  # Bearer token for the /admin endpoints (unset disables them)
     environment: str = "development"
     log_level: str = "INFO"
+    log_format: str = "text"  # "text" or "json" (one object per line)
+    log_async: bool = True  # Write logs from a background thread instead of the event loop
+    log_sample_rate: float = 1.0  # Fraction of DEBUG/INFO records kept per message
+    log_rate_limit: int = 0  # Max records per second per message (0 = unlimited)
+    # Multi-node mode: Socket.IO broadcasts go through a Redis message queue
+    # and socket sessions live in Redis, so several workers can serve one app
+    multi_node: bool = False
+    socketio_channel: str = "planning_poker"
+    # Worker processes run by `python -m app.supervisor`, which routes each
+    # connection by its room query parameter so all sockets of a room share a
+    # worker; worker_index is set by the supervisor for each worker
+    workers: int = 1
+    worker_index: int = 0
+    # Socket.IO wire format: "json", or "msgpack" (needs the msgpack package
+    # here and VITE_SOCKET_PARSER=msgpack in the frontend)
+    socketio_serializer: str = "json"
+    # Token-bucket limits on client events: each socket and each room may
+    # send `rate` events per second, with bursts of up to `burst`
+    rate_limit_enabled: bool = True
+    rate_limit_socket_rate: float = 5.0
+    rate_limit_socket_burst: int = 10
+    rate_limit_room_rate: float = 50.0
+    rate_limit_room_burst: int = 200
+    rate_limit_shared: bool = False  # Keep room buckets in Redis so the limit spans every node
+    # POST /rooms calls allowed per client address: `rate` per second, bursts of `burst`
+    room_create_rate: float = 0.1
+    room_create_burst: int = 10
+    # Proxies trusted to report the client address in X-Forwarded-For
+    # (comma-separated IPs or networks, "*" for any). Behind a load balancer
+    # this must cover it, or every client shares the proxy's address and
+    # its per-address limits
+    forwarded_allow_ips: str = "127.0.0.1"
+    # Seconds to collect a room's vote notifications into one votes_batched
+    # event (0 sends each vote as it happens); a batch of vote_batch_max_size
+    # votes is sent without waiting
+    vote_batch_window: float = 0.0
+    vote_batch_max_size: int = 200
+    # Seconds a user stays online after their last socket disconnects; a
+    # rejoin within it costs no write or broadcast (0 = mark offline at once)
+    disconnect_grace_period: float = 5.0
+    presence_flush_interval: float = 1.0  # Seconds between batched writes of expired grace periods
+
+    @property
+    def redis_connection_url(self) -> str:
+        if self.redis_url:
+            return self.redis_url
+        return f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"
 
     @property
     def cors_origins_list(self) -> List[str]:
@@ -1,17 +1,47 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.admin import router as admin_router
 from app.websocket.manager import socket_app
+from app.services.room_cache import room_cache, listen_for_invalidations
+from app.services.room_service import room_service
+from app.services.room_store import room_store
+from app.services.redis_service import redis_service
+from app.utils.instrumentation import round_trip_stats
+from app.utils.metrics import metrics, CallbackMetric
+from app.utils.log_config import configure_logging, shutdown_logging
+from app.websocket.sessions import session_store
+from app.websocket.presence import presence
+from app.websocket.rate_limit import TokenBuckets
+from app.websocket.room_reaper import maintain_rooms
+from app.websocket.room_snapshots import maintain_snapshots, save_snapshot, warm_start
+import asyncio
 import logging
+import math
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
+# Background tasks started on startup and cancelled on shutdown
+background_tasks: list = []
+
+# POST /rooms calls per client address. Rooms nobody joins also expire after
+# empty_room_ttl, so creating rooms in a loop cannot fill the keyspace.
+room_creations = TokenBuckets(settings.room_create_rate, settings.room_create_burst)
+
+# Gauges read at scrape time, so they cost nothing on the hot path
+metrics.register(CallbackMetric("connected_sockets", "Sockets connected to this process",
+                                session_store.socket_count))
+metrics.register(CallbackMetric("active_rooms", "Rooms with a socket on this process",
+                                session_store.room_count))
+metrics.register(CallbackMetric("room_cache_entries", "Rooms held in the in-process cache",
+                                lambda: room_cache.stats()["size"]))
+metrics.register(CallbackMetric("room_cache_lookups_total", "Room cache lookups by result",
+                                lambda: {"hit": room_cache.hits, "miss": room_cache.misses},
+                                type="counter", labelname="result"))
+
 # Create FastAPI app
 app = FastAPI(
     title="Planning Poker API",
@@ -34,10 +64,47 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "environment": settings.environment
+        "environment": settings.environment,
+        "worker": settings.worker_index,
+        "room_cache": room_cache.stats(),
+        "redis_circuit": redis_service.breaker.stats(),
+        "redis_round_trips": round_trip_stats.stats()
     }
 
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: ready only while the room store answers"""
+    if not await room_store.health_check():
+        response.status_code = 503
+        return {"status": "unavailable", "storage": settings.room_storage}
+    return {"status": "ready", "storage": settings.room_storage}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/rooms", status_code=201)
+async def create_room(request: Request):
+    """Create an empty room under a newly allocated, unused code"""
+    if settings.rate_limit_enabled:
+        wait = room_creations.acquire(request.client.host if request.client else "")
+        if wait:
+            raise HTTPException(status_code=429, detail="Too many rooms created, please slow down",
+                                headers={"Retry-After": str(math.ceil(wait))})
+    try:
+        room = await room_service.create_room()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"room_code": room.room_code}
+
+
+app.include_router(admin_router)
+
+
 # Mount Socket.IO at root (this catches all other routes)
 app.mount("/", socket_app)
 
@@ -46,10 +113,30 @@ app.mount("/", socket_app)
 async def startup_event():
     # Import events to register handlers
     import app.websocket.events
-    logger.info(f"Starting Planning Poker API in {settings.environment} mode")
-    logger.info(f"CORS origins: {settings.cors_origins_list}")
+    logger.info("Starting Planning Poker API in %s mode", settings.environment)
+    logger.info("CORS origins: %s", settings.cors_origins_list)
+    # Connect here rather than at import; the app starts even if Redis is not up yet
+    if settings.room_storage == "redis" or settings.rate_limit_shared:
+        await redis_service.connect()
+    # Runs before the server accepts connections, so reconnecting clients find their rooms cached
+    if settings.snapshot_path:
+        await warm_start()
+        background_tasks.append(asyncio.create_task(maintain_snapshots()))
+    # Only a shared store has other workers whose changes make cached rooms stale
+    if room_cache.enabled and room_store.shared:
+        background_tasks.append(asyncio.create_task(listen_for_invalidations()))
+    background_tasks.append(asyncio.create_task(maintain_rooms()))
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Planning Poker API")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Users still inside their disconnect grace period would otherwise stay online
+    await presence.flush_all()
+    if settings.snapshot_path:
+        await save_snapshot()
+    await redis_service.close()
+    shutdown_logging()
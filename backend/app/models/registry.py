@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class RoomActivity(BaseModel):
+    """A room as listed in the room registry"""
+    room_code: str
+    created_at: Optional[str] = None
+    last_activity: str  # Last change or TTL touch, ISO 8601
+    changes: int = 0  # The room's version: how many times it has changed
+    users: int = 0
+    online: int = 0
+
+
+class RoomListPage(BaseModel):
+    """A slice of the room registry"""
+    rooms: List[RoomActivity]
+    order: str  # "recent", "oldest" or "active"
+    offset: int
+    total: int
+
+
+class RoomRegistrySummary(BaseModel):
+    """Registry totals and its extremes"""
+    rooms: int
+    most_recently_active: Optional[RoomActivity] = None
+    least_recently_active: Optional[RoomActivity] = None
+    most_active: List[RoomActivity] = []  # By number of changes
@@ -1,12 +1,21 @@
 from pydantic import BaseModel
 from typing import Dict, List, Optional
 from app.models.user import User
+from app.models.stats import VoteStats
 
 
 class VoteHistory(BaseModel):
     round: int
     votes: Dict[str, str]
     revealed_at: str
+    stats: Optional[VoteStats] = None
+
+
+class VoteHistoryPage(BaseModel):
+    """A slice of a room's vote history, newest round first"""
+    entries: List[VoteHistory]
+    offset: int
+    total: int
 
 
 class Room(BaseModel):
@@ -14,8 +23,8 @@ class Room(BaseModel):
     created_at: str
     state: str = "voting"  # "voting" or "revealed"
     current_round: int = 1
+    version: int = 0  # Incremented by every mutation
     users: Dict[str, User] = {}
-    vote_history: List[VoteHistory] = []
 
     class Config:
         json_schema_extra = {
@@ -24,6 +33,7 @@ class Room(BaseModel):
                 "created_at": "2025-12-20T10:00:00Z",
                 "state": "voting",
                 "current_round": 1,
+                "version": 1,
                 "users": {
                     "user_123": {
                         "id": "user_123",
@@ -33,7 +43,6 @@ class Room(BaseModel):
                         "current_vote": None,
                         "joined_at": "2025-12-20T10:00:00Z"
                     }
-                },
-                "vote_history": []
+                }
             }
         }
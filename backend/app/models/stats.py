@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class VoteStats(BaseModel):
+    """Statistics for a single revealed round"""
+    vote_count: int
+    numeric_count: int  # Votes other than "?" and "☕"
+    average: Optional[float] = None
+    median: Optional[float] = None
+    mode: List[str] = []  # Most common card(s), in deck order
+    min: Optional[float] = None
+    max: Optional[float] = None
+    spread: Optional[float] = None  # max - min
+    consensus: bool = False  # Every numeric vote is the same card
+    distribution: Dict[str, int] = {}  # Card -> number of votes, for every card in the deck
+
+
+class RoomStats(BaseModel):
+    """Running totals across every revealed round of a room"""
+    rounds: int = 0
+    consensus_rounds: int = 0
+    vote_count: int = 0
+    numeric_count: int = 0
+    average: Optional[float] = None  # Mean of every numeric vote ever cast
+    distribution: Dict[str, int] = {}
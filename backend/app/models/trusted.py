@@ -0,0 +1,28 @@
+from typing import Type, TypeVar
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+_object_setattr = object.__setattr__
+
+
+def construct(cls: Type[M], **fields) -> M:
+    """
+    Build a model from trusted data without validating it.
+
+    For data this service wrote itself (Redis snapshots, history entries,
+    computed stats). Behaves like model_construct, but sets the instance
+    dict directly instead of looping over every field in Python, which
+    makes it about twice as fast as validation where model_construct is
+    slower. Missing fields get their defaults.
+    """
+    if len(fields) != len(cls.model_fields):
+        for name, field in cls.model_fields.items():
+            if name not in fields:
+                fields[name] = field.get_default(call_default_factory=True)
+    model = cls.__new__(cls)
+    _object_setattr(model, "__dict__", fields)
+    _object_setattr(model, "__pydantic_fields_set__", set(fields))
+    _object_setattr(model, "__pydantic_extra__", None)
+    _object_setattr(model, "__pydantic_private__", None)
+    return model
@@ -0,0 +1,382 @@
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, Deque, Dict, List, Set, Tuple
+from app.config import settings
+from app.models.room import Room, VoteHistory, VoteHistoryPage
+from app.models.registry import RoomActivity, RoomRegistrySummary
+from app.models.stats import VoteStats
+from app.models.user import User
+from app.models.trusted import construct
+from app.services.room_store_base import RoomStore
+from app.services.vote_stats import compute_round_stats, stats_increments
+from app.utils import serializer
+
+
+class _StoredRoom:
+    """One room's state, laid out like its Redis keys"""
+
+    __slots__ = ("room_code", "created_at", "state", "current_round", "facilitator", "version",
+                 "users", "online", "votes", "history", "totals", "events", "last_activity")
+
+    def __init__(self, room_code: str, created_at: str):
+        self.room_code = room_code
+        self.created_at = created_at
+        self.state = "voting"
+        self.current_round = 1
+        self.facilitator = ""
+        self.version = 0
+        self.users: Dict[str, dict] = {}  # user_id -> {id, name, joined_at}
+        self.online: Set[str] = set()
+        self.votes: Dict[str, str] = {}
+        self.history: Deque[VoteHistory] = deque(maxlen=settings.vote_history_limit)
+        self.totals: Dict[str, float] = {}
+        # (version, event, JSON data), oldest first
+        self.events: Deque[Tuple[int, str, str]] = deque(maxlen=settings.room_event_log_size)
+        self.last_activity = time.time()
+
+
+class MemoryRoomStore(RoomStore):
+    """
+    Rooms kept in a dict in this process, for single-node deployments and
+    for running the app without a Redis server.
+
+    Mirrors RedisRoomStore: each method runs without awaiting, so it is
+    atomic on the event loop; rooms expire room_ttl seconds after their last
+    change or touch; every change bumps the version and is logged for
+    replay. Rooms are lost when the process exits, unless a snapshot file
+    is configured (see dump_rooms).
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._rooms: Dict[str, _StoredRoom] = {}
+
+    async def health_check(self) -> bool:
+        return True
+
+    def dump_rooms(self) -> Optional[List[dict]]:
+        # Copies, so the snapshot can be encoded off the event loop while rooms change
+        return [
+            {
+                "room_code": stored.room_code,
+                "created_at": stored.created_at,
+                "state": stored.state,
+                "current_round": stored.current_round,
+                "facilitator": stored.facilitator,
+                "version": stored.version,
+                "users": [dict(user) for user in stored.users.values()],
+                "online": list(stored.online),
+                "votes": dict(stored.votes),
+                "history": list(stored.history),
+                "totals": dict(stored.totals),
+                "events": list(stored.events),
+                "last_activity": stored.last_activity
+            }
+            for stored in self._live_rooms()
+        ]
+
+    def restore_rooms(self, rooms: List[dict]) -> int:
+        restored = 0
+        for data in rooms:
+            if data["room_code"] in self._rooms:
+                continue
+            stored = _StoredRoom(data["room_code"], data["created_at"])
+            stored.last_activity = data["last_activity"]
+            if self._expired(stored):
+                continue
+            stored.state = data["state"]
+            stored.current_round = data["current_round"]
+            stored.facilitator = data["facilitator"]
+            stored.version = data["version"]
+            stored.users = {user["id"]: user for user in data["users"]}
+            stored.votes = data["votes"]
+            stored.totals = data["totals"]
+            for entry in data["history"]:
+                if entry.get("stats") is not None:
+                    entry["stats"] = construct(VoteStats, **entry["stats"])
+                stored.history.append(construct(VoteHistory, **entry))
+            stored.events.extend(tuple(event) for event in data["events"])
+            # Nobody is connected to a process that just started; logging it
+            # as a change lets clients replay it when they reconnect
+            if data["online"]:
+                if len(data["online"]) == 1:
+                    self._bump(stored, "user_disconnected", {"user_id": data["online"][0]})
+                else:
+                    self._bump(stored, "users_disconnected", {"user_ids": data["online"]})
+                stored.last_activity = data["last_activity"]
+            self._rooms[stored.room_code] = stored
+            restored += 1
+        return restored
+
+    @staticmethod
+    def _expired(stored: _StoredRoom) -> bool:
+        return stored.last_activity + settings.room_ttl <= time.time()
+
+    def _get(self, room_code: str) -> Optional[_StoredRoom]:
+        """A live room; expired rooms stay in the dict until reaped, as keys stay listed in Redis"""
+        stored = self._rooms.get(room_code)
+        if stored is None or self._expired(stored):
+            return None
+        return stored
+
+    @staticmethod
+    def _refresh(stored: _StoredRoom) -> None:
+        stored.last_activity = time.time()
+
+    @staticmethod
+    def _bump(stored: _StoredRoom, event: str, data: dict) -> int:
+        """Increment the version and log the change as a delta event (without its version)"""
+        stored.version += 1
+        if settings.room_event_log_size > 0:
+            stored.events.append((stored.version, event, serializer.dumps(data)))
+        stored.last_activity = time.time()
+        return stored.version
+
+    @staticmethod
+    def _user(stored: _StoredRoom, user_id: str) -> dict:
+        """A user as sent in user_joined/user_updated"""
+        user = stored.users[user_id]
+        return {
+            "id": user_id,
+            "name": user["name"],
+            "connected": user_id in stored.online,
+            "is_facilitator": user_id == stored.facilitator,
+            "current_vote": stored.votes.get(user_id),
+            "joined_at": user["joined_at"]
+        }
+
+    @staticmethod
+    def _to_room(stored: _StoredRoom) -> Room:
+        """Build a fresh Room model; nothing here came from clients, so skip validation"""
+        users = [
+            construct(
+                User,
+                id=user_id,
+                name=user["name"],
+                connected=user_id in stored.online,
+                is_facilitator=user_id == stored.facilitator,
+                current_vote=stored.votes.get(user_id),
+                joined_at=user["joined_at"]
+            )
+            for user_id, user in stored.users.items()
+        ]
+        users.sort(key=lambda user: user.joined_at)
+        return construct(
+            Room,
+            room_code=stored.room_code,
+            created_at=stored.created_at,
+            state=stored.state,
+            current_round=stored.current_round,
+            version=stored.version,
+            users={user.id: user for user in users}
+        )
+
+    async def create_room(self, room_code: str, created_at: str) -> bool:
+        if self._get(room_code):
+            return False
+        stored = self._rooms[room_code] = _StoredRoom(room_code, created_at)
+        # Expires after empty_room_ttl, as in Redis, unless a join refreshes it
+        stored.last_activity -= settings.room_ttl - min(settings.empty_room_ttl, settings.room_ttl)
+        return True
+
+    async def load_room(self, room_code: str) -> Optional[Room]:
+        stored = self._get(room_code)
+        return self._to_room(stored) if stored else None
+
+    async def touch(self, room_code: str) -> bool:
+        stored = self._get(room_code)
+        if not stored:
+            return False
+        self._refresh(stored)
+        return True
+
+    async def expired_rooms(self, limit: int) -> List[str]:
+        expired = sorted(
+            (stored for stored in self._rooms.values() if self._expired(stored)),
+            key=lambda stored: stored.last_activity
+        )
+        return [stored.room_code for stored in expired[:limit]]
+
+    async def reap(self, room_code: str) -> bool:
+        stored = self._rooms.get(room_code)
+        if stored and not self._expired(stored):
+            return False
+        self._rooms.pop(room_code, None)
+        return True
+
+    @staticmethod
+    def _activity(stored: _StoredRoom) -> RoomActivity:
+        return construct(
+            RoomActivity,
+            room_code=stored.room_code,
+            created_at=stored.created_at,
+            last_activity=datetime.fromtimestamp(int(stored.last_activity), timezone.utc).isoformat(),
+            changes=stored.version,
+            users=len(stored.users),
+            online=len(stored.online)
+        )
+
+    def _live_rooms(self) -> List[_StoredRoom]:
+        return [stored for stored in self._rooms.values() if not self._expired(stored)]
+
+    async def list_rooms(self, order: str, offset: int, limit: int) -> Tuple[int, List[RoomActivity]]:
+        rooms = self._live_rooms()
+        if order == "active":
+            rooms.sort(key=lambda stored: stored.version, reverse=True)
+        else:
+            rooms.sort(key=lambda stored: stored.last_activity, reverse=order != "oldest")
+        return len(rooms), [self._activity(stored) for stored in rooms[offset:offset + limit]]
+
+    async def registry_summary(self, top: int = 5) -> Optional[RoomRegistrySummary]:
+        rooms = self._live_rooms()
+        by_activity = sorted(rooms, key=lambda stored: stored.last_activity)
+        most_active = sorted(rooms, key=lambda stored: stored.version, reverse=True)[:top]
+        return construct(
+            RoomRegistrySummary,
+            rooms=len(rooms),
+            most_recently_active=self._activity(by_activity[-1]) if rooms else None,
+            least_recently_active=self._activity(by_activity[0]) if rooms else None,
+            most_active=[self._activity(stored) for stored in most_active]
+        )
+
+    async def reindex(self) -> int:
+        # The dict is the registry; there is nothing to rebuild
+        return 0
+
+    async def add_user(
+        self,
+        room_code: str,
+        rejoin_user_id: Optional[str],
+        new_user_id: str,
+        user_name: str,
+        joined_at: str,
+        create_room: bool = False
+    ) -> Optional[Tuple[bool, str, Room]]:
+        stored = self._get(room_code)
+        if not stored:
+            if not create_room:
+                return None
+            stored = self._rooms[room_code] = _StoredRoom(room_code, joined_at)
+
+        rejoined = bool(rejoin_user_id) and rejoin_user_id in stored.users
+        if rejoined:
+            user_id = rejoin_user_id
+            stored.users[user_id]["name"] = user_name
+        else:
+            user_id = new_user_id
+            stored.users[user_id] = {"id": user_id, "name": user_name, "joined_at": joined_at}
+            if not stored.facilitator:
+                stored.facilitator = user_id
+        stored.online.add(user_id)
+        self._bump(stored, "user_updated" if rejoined else "user_joined", {"user": self._user(stored, user_id)})
+        return rejoined, user_id, self._to_room(stored)
+
+    async def remove_user(self, room_code: str, user_id: str) -> Tuple[bool, Optional[Room]]:
+        stored = self._get(room_code)
+        if not stored or stored.users.pop(user_id, None) is None:
+            return False, None
+        stored.online.discard(user_id)
+        stored.votes.pop(user_id, None)
+        if not stored.users:
+            del self._rooms[room_code]
+            return True, None
+        if stored.facilitator == user_id:
+            # Hand the facilitator role to the longest-present user
+            stored.facilitator = min(stored.users.values(), key=lambda user: user["joined_at"])["id"]
+        self._bump(stored, "user_left", {"user_id": user_id, "facilitator_id": stored.facilitator})
+        return True, self._to_room(stored)
+
+    async def set_offline(self, room_code: str, user_ids: List[str]) -> Tuple[int, List[str]]:
+        stored = self._get(room_code)
+        if not stored:
+            return 0, []
+        changed = [user_id for user_id in user_ids if user_id in stored.users and user_id in stored.online]
+        if not changed:
+            return 0, []
+        stored.online.difference_update(changed)
+        if len(changed) == 1:
+            version = self._bump(stored, "user_disconnected", {"user_id": changed[0]})
+        else:
+            version = self._bump(stored, "users_disconnected", {"user_ids": changed})
+        return version, changed
+
+    async def submit_vote(self, room_code: str, user_id: str, vote: str) -> int:
+        stored = self._get(room_code)
+        if not stored or user_id not in stored.users:
+            return -1
+        if stored.state != "voting":
+            return 0
+        stored.votes[user_id] = vote
+        return self._bump(stored, "vote_submitted", {"user_id": user_id})
+
+    async def clear_vote(self, room_code: str, user_id: str) -> int:
+        stored = self._get(room_code)
+        if not stored or user_id not in stored.users:
+            return 0
+        stored.votes.pop(user_id, None)
+        return self._bump(stored, "vote_cleared", {"user_id": user_id})
+
+    async def reveal_votes(
+        self, room_code: str, revealed_at: str
+    ) -> Optional[Tuple[bool, Room, Optional[Dict[str, str]]]]:
+        stored = self._get(room_code)
+        if not stored:
+            return None
+        if stored.state != "voting":
+            return False, self._to_room(stored), None
+        stored.state = "revealed"
+        totals = None
+        if stored.votes:
+            stats = compute_round_stats(stored.votes)
+            stored.history.appendleft(construct(
+                VoteHistory,
+                round=stored.current_round,
+                votes=dict(stored.votes),
+                revealed_at=revealed_at,
+                stats=stats
+            ))
+            for field, amount in stats_increments(stats).items():
+                stored.totals[field] = stored.totals.get(field, 0) + amount
+            totals = {field: str(value) for field, value in stored.totals.items()}
+        # Round statistics are derived from the votes when the event is replayed
+        self._bump(stored, "votes_revealed", {"votes": dict(stored.votes)})
+        return True, self._to_room(stored), totals
+
+    async def get_stats_totals(self, room_code: str) -> Dict[str, str]:
+        stored = self._get(room_code)
+        if not stored:
+            return {}
+        return {field: str(value) for field, value in stored.totals.items()}
+
+    async def reset_round(self, room_code: str) -> Optional[Room]:
+        stored = self._get(room_code)
+        if not stored:
+            return None
+        stored.votes.clear()
+        stored.state = "voting"
+        stored.current_round += 1
+        self._bump(stored, "round_reset", {"round": stored.current_round})
+        return self._to_room(stored)
+
+    async def events_since(self, room_code: str, version: int) -> Optional[List[Tuple[int, str, str]]]:
+        stored = self._get(room_code)
+        if not stored:
+            return None
+        missed = stored.version - version
+        if missed == 0:
+            return []
+        if missed < 0 or missed > len(stored.events) or stored.events[-missed][0] != version + 1:
+            return None
+        return list(stored.events)[-missed:]
+
+    async def get_history(self, room_code: str, offset: int, limit: int) -> Optional[VoteHistoryPage]:
+        stored = self._get(room_code)
+        entries = list(stored.history) if stored else []
+        return construct(
+            VoteHistoryPage,
+            entries=entries[offset:offset + limit],
+            offset=offset,
+            total=len(entries)
+        )
@@ -0,0 +1,833 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Tuple
+from app.models.room import Room, VoteHistory, VoteHistoryPage
+from app.models.registry import RoomActivity, RoomRegistrySummary
+from app.models.user import User
+from app.models.stats import VoteStats
+from app.models.trusted import construct
+from app.services.redis_service import redis_service
+from app.services.room_store_base import RoomStore
+from app.services.room_cache import INVALIDATION_CHANNEL, INSTANCE_ID
+from app.services.vote_stats import CARD_DECK, NON_NUMERIC_CARDS
+from app.config import settings
+from app.utils import serializer
+
+logger = logging.getLogger(__name__)
+
+# Room storage layout (all keys share the room TTL):
+#   room:{code}             hash   room_code, created_at, state, current_round, facilitator, version
+#   room:{code}:users       hash   user_id -> JSON {id, name, joined_at}
+#   room:{code}:online      set    user_ids currently connected
+#   room:{code}:votes       hash   user_id -> vote
+#   room:{code}:history     list   JSON VoteHistory entries, newest first, capped
+#                                  at vote_history_limit and never part of a snapshot
+#   room:{code}:stats       hash   running totals over every revealed round
+#   room:{code}:events      stream the delta event of every change, with ID
+#                                  {version}-0, capped at about room_event_log_size
+#   rooms:active            zset   room codes scored by last write or touch (epoch
+#                                  seconds), so expired rooms are found without KEYS
+#   rooms:activity          zset   room codes scored by version (changes so far)
+#
+# Every mutation is a single Lua script, so it is atomic and touches only the
+# fields it changes instead of rewriting the whole room. Mutating scripts also
+# publish the room key on INVALIDATION_CHANNEL so other workers drop their
+# cached copy; the last ARGV is always this process's INSTANCE_ID.
+#
+# Scripts get every key they touch in KEYS: the seven room keys above, then
+# rooms:active and rooms:activity (see script_keys). The registry sets hold
+# every room, so the store needs a single Redis (with replicas or Sentinel
+# if wanted), not Redis Cluster, where one script cannot reach keys in
+# different hash slots.
+#
+# Refreshing the TTL (on every mutation, or a throttled touch for rooms that
+# are only read) also records the room's activity in rooms:active.
+#
+# Every mutation also increments the room's version, which clients use to
+# apply delta events in order and detect when they have missed one, and
+# appends the delta to the room's event stream so a client that reconnects
+# can be sent only what it missed.
+
+ACTIVE_ROOMS_KEY = "rooms:active"
+ROOM_ACTIVITY_KEY = "rooms:activity"
+
+# Shared Lua helpers, prepended to every script
+_PRELUDE = """
+local room, users, online, votes, history, stats, events = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5], KEYS[6], KEYS[7]
+local active_rooms, room_activity = KEYS[8], KEYS[9]
+
+local function notify()
+    redis.call('PUBLISH', '""" + INVALIDATION_CHANNEL + """', ARGV[#ARGV] .. ' ' .. room)
+end
+
+local function record(version, event, data)
+    if """ + str(settings.room_event_log_size) + """ <= 0 then
+        return
+    end
+    local args = {'XADD', events, 'MAXLEN', '~', """ + str(settings.room_event_log_size) + """, version .. '-0',
+                  'event', event, 'data', cjson.encode(data)}
+    local added = redis.pcall(unpack(args))
+    if type(added) == 'table' and added.err then
+        -- A stream left over from an earlier room with the same code
+        redis.call('DEL', events)
+        redis.call(unpack(args))
+    end
+end
+
+-- Increments the version and logs the change as a delta event (without its version)
+local function bump(event, data)
+    local version = redis.call('HINCRBY', room, 'version', 1)
+    redis.call('ZADD', room_activity, version, string.sub(room, 6))
+    record(version, event, data)
+    return version
+end
+
+local function unlist()
+    redis.call('ZREM', active_rooms, string.sub(room, 6))
+    redis.call('ZREM', room_activity, string.sub(room, 6))
+end
+
+local function refresh_ttl(ttl)
+    for i = 1, 7 do
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+    redis.call('ZADD', active_rooms, redis.call('TIME')[1], string.sub(room, 6))
+end
+
+local function snapshot()
+    return {
+        redis.call('HGETALL', room),
+        redis.call('HGETALL', users),
+        redis.call('SMEMBERS', online),
+        redis.call('HGETALL', votes)
+    }
+end
+"""
+
+# ARGV: room_code, created_at, ttl, room_ttl
+# The room gets the shorter ttl until someone joins, and is listed in
+# rooms:active as if idle for room_ttl - ttl, so it is reaped once expired
+_CREATE_ROOM = _PRELUDE + """
+if redis.call('EXISTS', room) == 1 then
+    return 0
+end
+redis.call('HSET', room, 'room_code', ARGV[1], 'created_at', ARGV[2],
+           'state', 'voting', 'current_round', 1, 'facilitator', '', 'version', 0)
+refresh_ttl(tonumber(ARGV[3]))
+redis.call('ZADD', active_rooms,
+           tonumber(redis.call('TIME')[1]) - tonumber(ARGV[4]) + tonumber(ARGV[3]), ARGV[1])
+notify()
+return 1
+"""
+
+_SNAPSHOT = _PRELUDE + """
+if redis.call('EXISTS', room) == 0 then
+    return nil
+end
+return snapshot()
+"""
+
+# ARGV: ttl
+# Refreshes the TTL of an existing room; returns 0 if the room is gone
+_TOUCH = _PRELUDE + """
+if redis.call('EXISTS', room) == 0 then
+    return 0
+end
+refresh_ttl(tonumber(ARGV[1]))
+return 1
+"""
+
+# ARGV: ttl
+# For a room listed as expired in rooms:active. If the room has in fact
+# expired, deletes any leftover keys, unlists it and returns 1. If it is
+# still alive (its TTL was refreshed without updating rooms:active), its
+# score is corrected from the remaining TTL and 0 is returned.
+_REAP = _PRELUDE + """
+local remaining = redis.call('TTL', room)
+if remaining ~= -2 then
+    if remaining < 0 then
+        remaining = tonumber(ARGV[1])
+    end
+    local now = tonumber(redis.call('TIME')[1])
+    redis.call('ZADD', active_rooms, now - tonumber(ARGV[1]) + remaining, string.sub(room, 6))
+    return 0
+end
+redis.call('DEL', room, users, online, votes, history, stats, events)
+unlist()
+notify()
+return 1
+"""
+
+# ARGV: rejoin_user_id (may be empty), new_user_id, user_name, joined_at,
+#       room_code (empty = the room must already exist), ttl
+# Returns {status, user_id, snapshot} where status 1 = rejoined, 2 = new user
+_ADD_USER = _PRELUDE + """
+if redis.call('EXISTS', room) == 0 then
+    if ARGV[5] == '' then
+        return nil
+    end
+    redis.call('HSET', room, 'room_code', ARGV[5], 'created_at', ARGV[4],
+               'state', 'voting', 'current_round', 1, 'facilitator', '', 'version', 0)
+end
+local status, user_id
+local existing = ARGV[1] ~= '' and redis.call('HGET', users, ARGV[1])
+if existing then
+    local user = cjson.decode(existing)
+    user['name'] = ARGV[3]
+    user_id = ARGV[1]
+    redis.call('HSET', users, user_id, cjson.encode(user))
+    status = 1
+else
+    user_id = ARGV[2]
+    redis.call('HSET', users, user_id, cjson.encode({id = user_id, name = ARGV[3], joined_at = ARGV[4]}))
+    if redis.call('HGET', room, 'facilitator') == '' then
+        redis.call('HSET', room, 'facilitator', user_id)
+    end
+    status = 2
+end
+redis.call('SADD', online, user_id)
+local user = cjson.decode(redis.call('HGET', users, user_id))
+user['connected'] = true
+user['is_facilitator'] = redis.call('HGET', room, 'facilitator') == user_id
+user['current_vote'] = redis.call('HGET', votes, user_id) or cjson.null
+bump(status == 1 and 'user_updated' or 'user_joined', {user = user})
+refresh_ttl(tonumber(ARGV[6]))
+notify()
+return {status, user_id, snapshot()}
+"""
+
+# ARGV: user_id, ttl
+# Returns {0} if the user is not in the room, {2} if the room was deleted,
+# otherwise {1, snapshot}
+_REMOVE_USER = _PRELUDE + """
+if redis.call('HDEL', users, ARGV[1]) == 0 then
+    return {0}
+end
+redis.call('SREM', online, ARGV[1])
+redis.call('HDEL', votes, ARGV[1])
+if redis.call('HLEN', users) == 0 then
+    redis.call('DEL', room, users, online, votes, history, stats, events)
+    unlist()
+    notify()
+    return {2}
+end
+if redis.call('HGET', room, 'facilitator') == ARGV[1] then
+    -- Hand the facilitator role to the longest-present user
+    local next_id, next_joined
+    local entries = redis.call('HGETALL', users)
+    for i = 1, #entries, 2 do
+        local joined_at = cjson.decode(entries[i + 1])['joined_at']
+        if not next_joined or joined_at < next_joined then
+            next_id, next_joined = entries[i], joined_at
+        end
+    end
+    redis.call('HSET', room, 'facilitator', next_id)
+end
+bump('user_left', {user_id = ARGV[1], facilitator_id = redis.call('HGET', room, 'facilitator')})
+refresh_ttl(tonumber(ARGV[2]))
+notify()
+return {1, snapshot()}
+"""
+
+# ARGV: ttl, user_id...
+# Marks the users offline with a single version bump; returns
+# {version, user_id...} for the users that were online, or {0} if none were
+_SET_OFFLINE = _PRELUDE + """
+local changed = {}
+for i = 2, #ARGV - 1 do
+    if redis.call('HEXISTS', users, ARGV[i]) == 1 and redis.call('SREM', online, ARGV[i]) == 1 then
+        changed[#changed + 1] = ARGV[i]
+    end
+end
+if #changed == 0 then
+    return {0}
+end
+local version
+if #changed == 1 then
+    version = bump('user_disconnected', {user_id = changed[1]})
+else
+    version = bump('users_disconnected', {user_ids = changed})
+end
+refresh_ttl(tonumber(ARGV[1]))
+notify()
+return {version, unpack(changed)}
+"""
+
+# ARGV: user_id, vote, ttl
+# Returns -1 if the room or user is missing, 0 if the room is not voting,
+# otherwise the new version
+_SUBMIT_VOTE = _PRELUDE + """
+local state = redis.call('HGET', room, 'state')
+if not state or redis.call('HEXISTS', users, ARGV[1]) == 0 then
+    return -1
+end
+if state ~= 'voting' then
+    return 0
+end
+redis.call('HSET', votes, ARGV[1], ARGV[2])
+local version = bump('vote_submitted', {user_id = ARGV[1]})
+refresh_ttl(tonumber(ARGV[3]))
+notify()
+return version
+"""
+
+# ARGV: user_id, ttl
+# Returns the new version, or 0 if the user is not in the room
+_CLEAR_VOTE = _PRELUDE + """
+if redis.call('HEXISTS', users, ARGV[1]) == 0 then
+    return 0
+end
+redis.call('HDEL', votes, ARGV[1])
+local version = bump('vote_cleared', {user_id = ARGV[1]})
+refresh_ttl(tonumber(ARGV[2]))
+notify()
+return version
+"""
+
+# ARGV: revealed_at, ttl
+# Returns {revealed, snapshot[, totals]}. Only the voting -> revealed
+# transition changes the room: if there are votes it pushes the round, with
+# its stats, onto the history and adds it to the running totals (returned
+# as totals), then bumps the version. A repeated reveal returns
+# {0, snapshot} and changes nothing. round_stats mirrors
+# vote_stats.compute_round_stats and the totals increments mirror
+# vote_stats.stats_increments, so both engines record the same round.
+_REVEAL_VOTES = _PRELUDE + """
+local deck = {""" + ", ".join(f"'{card}'" for card in CARD_DECK) + """}
+local non_numeric = {""" + ", ".join(f"['{card}'] = true" for card in NON_NUMERIC_CARDS) + """}
+
+-- Python's round(value, 2), which rounds exact halves to even
+local function round2(value)
+    local scaled = value * 100
+    local rounded = math.floor(scaled + 0.5)
+    if rounded - scaled == 0.5 and rounded % 2 == 1 then
+        rounded = rounded - 1
+    end
+    return rounded / 100
+end
+
+-- Returns the round's VoteStats fields and the sum of its numeric votes
+local function round_stats(round_votes, count)
+    local distribution, values, sum = {}, {}, 0
+    for _, card in ipairs(deck) do
+        distribution[card] = 0
+    end
+    for _, card in pairs(round_votes) do
+        distribution[card] = distribution[card] + 1
+        if not non_numeric[card] then
+            table.insert(values, tonumber(card))
+            sum = sum + tonumber(card)
+        end
+    end
+    local top, mode = 0, {}
+    for _, card in ipairs(deck) do
+        top = math.max(top, distribution[card])
+    end
+    for _, card in ipairs(deck) do
+        if distribution[card] == top then
+            table.insert(mode, card)
+        end
+    end
+    local result = {
+        vote_count = count, numeric_count = #values, mode = mode, distribution = distribution,
+        average = cjson.null, median = cjson.null, min = cjson.null, max = cjson.null, spread = cjson.null,
+        consensus = false
+    }
+    local n = #values
+    if n > 0 then
+        table.sort(values)
+        result.average = round2(sum / n)
+        if n % 2 == 1 then
+            result.median = values[(n + 1) / 2]
+        else
+            result.median = (values[n / 2] + values[n / 2 + 1]) / 2
+        end
+        result.min, result.max = values[1], values[n]
+        result.spread = values[n] - values[1]
+        result.consensus = values[1] == values[n]
+    end
+    return result, sum
+end
+
+local state = redis.call('HGET', room, 'state')
+if not state then
+    return nil
+end
+if state ~= 'voting' then
+    return {0, snapshot()}
+end
+redis.call('HSET', room, 'state', 'revealed')
+local revealed, count = {}, 0
+local entries = redis.call('HGETALL', votes)
+for i = 1, #entries, 2 do
+    revealed[entries[i]] = entries[i + 1]
+    count = count + 1
+end
+if count > 0 then
+    local round = tonumber(redis.call('HGET', room, 'current_round'))
+    local round_result, sum = round_stats(revealed, count)
+    redis.call('LPUSH', history, cjson.encode({
+        round = round, votes = revealed, revealed_at = ARGV[1], stats = round_result
+    }))
+    redis.call('LTRIM', history, 0, """ + str(settings.vote_history_limit - 1) + """)
+    redis.call('HINCRBY', stats, 'rounds', 1)
+    redis.call('HINCRBY', stats, 'consensus_rounds', round_result.consensus and 1 or 0)
+    redis.call('HINCRBY', stats, 'vote_count', count)
+    redis.call('HINCRBY', stats, 'numeric_count', round_result.numeric_count)
+    redis.call('HINCRBYFLOAT', stats, 'numeric_sum', tostring(sum))
+    for card, cards in pairs(round_result.distribution) do
+        if cards > 0 then
+            redis.call('HINCRBY', stats, 'dist:' .. card, cards)
+        end
+    end
+end
+-- Round statistics are derived from the votes when the event is replayed
+bump('votes_revealed', {votes = revealed})
+refresh_ttl(tonumber(ARGV[2]))
+notify()
+if count > 0 then
+    return {1, snapshot(), redis.call('HGETALL', stats)}
+end
+return {1, snapshot()}
+"""
+
+# ARGV: ttl
+_RESET_ROUND = _PRELUDE + """
+if redis.call('EXISTS', room) == 0 then
+    return nil
+end
+redis.call('DEL', votes)
+redis.call('HSET', room, 'state', 'voting')
+local round = redis.call('HINCRBY', room, 'current_round', 1)
+bump('round_reset', {round = round})
+refresh_ttl(tonumber(ARGV[1]))
+notify()
+return snapshot()
+"""
+
+
+def _pairs(flat: list) -> dict:
+    """Convert a flat HGETALL reply from Lua into a dict"""
+    return dict(zip(flat[::2], flat[1::2]))
+
+
+class RedisRoomStore(RoomStore):
+    """Atomic, field-level room persistence on top of Redis hashes"""
+
+    shared = True
+
+    def __init__(self):
+        client = redis_service.client
+        self._create_room = client.register_script(_CREATE_ROOM)
+        self._snapshot = client.register_script(_SNAPSHOT)
+        self._add_user = client.register_script(_ADD_USER)
+        self._remove_user = client.register_script(_REMOVE_USER)
+        self._set_offline = client.register_script(_SET_OFFLINE)
+        self._submit_vote = client.register_script(_SUBMIT_VOTE)
+        self._clear_vote = client.register_script(_CLEAR_VOTE)
+        self._reveal_votes = client.register_script(_REVEAL_VOTES)
+        self._reset_round = client.register_script(_RESET_ROUND)
+        self._touch = client.register_script(_TOUCH)
+        self._reap = client.register_script(_REAP)
+
+    async def health_check(self) -> bool:
+        return await redis_service.health_check()
+
+    @staticmethod
+    def keys(room_code: str) -> List[str]:
+        """All Redis keys belonging to a room, in the order the scripts expect"""
+        base = f"room:{room_code}"
+        return [
+            base, f"{base}:users", f"{base}:online", f"{base}:votes", f"{base}:history", f"{base}:stats",
+            f"{base}:events"
+        ]
+
+    @staticmethod
+    def script_keys(room_code: str) -> List[str]:
+        """KEYS for the room scripts: the room's keys, then the registry sets"""
+        return RedisRoomStore.keys(room_code) + [ACTIVE_ROOMS_KEY, ROOM_ACTIVITY_KEY]
+
+    @staticmethod
+    def _args(*args) -> list:
+        """Script arguments followed by this process's instance id"""
+        return [*args, INSTANCE_ID]
+
+    @staticmethod
+    def _to_room(snapshot: list) -> Room:
+        """
+        Build a Room model from a Lua snapshot reply.
+
+        Everything in Redis was written by this service, so the models are
+        built with construct() and skip validation.
+        """
+        room_fields, user_entries, online, votes = snapshot
+        room_fields = _pairs(room_fields)
+        votes = _pairs(votes)
+        online = set(online)
+        facilitator = room_fields.get("facilitator")
+
+        users = []
+        for user_id, raw in _pairs(user_entries).items():
+            data = serializer.loads(raw)
+            users.append(construct(
+                User,
+                id=user_id,
+                name=data["name"],
+                connected=user_id in online,
+                is_facilitator=user_id == facilitator,
+                current_vote=votes.get(user_id),
+                joined_at=data["joined_at"]
+            ))
+        users.sort(key=lambda user: user.joined_at)
+
+        return construct(
+            Room,
+            room_code=room_fields["room_code"],
+            created_at=room_fields["created_at"],
+            state=room_fields["state"],
+            current_round=int(room_fields["current_round"]),
+            version=int(room_fields.get("version", 0)),
+            users={user.id: user for user in users}
+        )
+
+    async def create_room(self, room_code: str, created_at: str) -> bool:
+        """Create an empty room, expiring after empty_room_ttl unless joined; returns False if the code is taken"""
+        ttl = min(settings.empty_room_ttl, settings.room_ttl)
+        try:
+            return bool(await self._create_room(
+                keys=self.script_keys(room_code), args=self._args(room_code, created_at, ttl, settings.room_ttl)
+            ))
+        except Exception as e:
+            logger.error("Error creating room %s: %s", room_code, e)
+            return False
+
+    async def load_room(self, room_code: str) -> Optional[Room]:
+        """Read a consistent snapshot of a room"""
+        try:
+            snapshot = await self._snapshot(keys=self.script_keys(room_code))
+            return self._to_room(snapshot) if snapshot else None
+        except Exception as e:
+            logger.error("Error loading room %s: %s", room_code, e)
+            return None
+
+    async def touch(self, room_code: str) -> bool:
+        """Refresh a room's TTL without writing to it; returns False if the room is gone"""
+        try:
+            return bool(await self._touch(keys=self.script_keys(room_code), args=self._args(settings.room_ttl)))
+        except Exception as e:
+            logger.error("Error refreshing TTL of room %s: %s", room_code, e)
+            return False
+
+    async def expired_rooms(self, limit: int) -> List[str]:
+        """Codes of rooms not written or touched for a full room_ttl, oldest first"""
+        try:
+            return await redis_service.client.zrangebyscore(
+                ACTIVE_ROOMS_KEY, "-inf", int(time.time()) - settings.room_ttl, start=0, num=limit
+            )
+        except Exception as e:
+            logger.error("Error listing expired rooms: %s", e)
+            return []
+
+    async def reap(self, room_code: str) -> bool:
+        """Clean up after a room listed as expired; returns False if it turned out to be alive"""
+        try:
+            return bool(await self._reap(keys=self.script_keys(room_code), args=self._args(settings.room_ttl)))
+        except Exception as e:
+            logger.error("Error reaping room %s: %s", room_code, e)
+            return False
+
+    async def describe_rooms(self, room_codes: List[str]) -> List[RoomActivity]:
+        """Registry entries for the given rooms, in one round-trip; rooms that are gone are skipped"""
+        if not room_codes:
+            return []
+        async with redis_service.pipeline(transaction=False) as pipe:
+            for room_code in room_codes:
+                room_key, users_key, online_key, _, _, _, _ = self.keys(room_code)
+                pipe.zscore(ACTIVE_ROOMS_KEY, room_code)
+                pipe.zscore(ROOM_ACTIVITY_KEY, room_code)
+                pipe.hget(room_key, "created_at")
+                pipe.hlen(users_key)
+                pipe.scard(online_key)
+            results = await pipe.execute()
+        rooms = []
+        for index, room_code in enumerate(room_codes):
+            last_activity, changes, created_at, users, online = results[index * 5:index * 5 + 5]
+            if last_activity is None:
+                continue
+            rooms.append(construct(
+                RoomActivity,
+                room_code=room_code,
+                created_at=created_at,
+                last_activity=datetime.fromtimestamp(last_activity, timezone.utc).isoformat(),
+                changes=int(changes or 0),
+                users=users,
+                online=online
+            ))
+        return rooms
+
+    async def list_rooms(self, order: str, offset: int, limit: int) -> Tuple[int, List[RoomActivity]]:
+        """
+        A page of the room registry.
+
+        Args:
+            order: "recent" (latest activity first), "oldest" (longest idle
+                first) or "active" (most changes first)
+
+        Returns:
+            (rooms in the registry, page of rooms)
+        """
+        key = ROOM_ACTIVITY_KEY if order == "active" else ACTIVE_ROOMS_KEY
+        try:
+            async with redis_service.pipeline(transaction=False) as pipe:
+                pipe.zcard(key)
+                pipe.zrange(key, offset, offset + limit - 1, desc=order != "oldest")
+                total, room_codes = await pipe.execute()
+            return total, await self.describe_rooms(room_codes)
+        except Exception as e:
+            logger.error("Error listing rooms: %s", e)
+            return 0, []
+
+    async def registry_summary(self, top: int = 5) -> Optional[RoomRegistrySummary]:
+        """Room count, the most and least recently active rooms and the most active ones"""
+        try:
+            async with redis_service.pipeline(transaction=False) as pipe:
+                pipe.zcard(ACTIVE_ROOMS_KEY)
+                pipe.zrange(ACTIVE_ROOMS_KEY, 0, 0, desc=True)
+                pipe.zrange(ACTIVE_ROOMS_KEY, 0, 0)
+                pipe.zrange(ROOM_ACTIVITY_KEY, 0, top - 1, desc=True)
+                total, newest, oldest, most_active = await pipe.execute()
+            described = {
+                room.room_code: room
+                for room in await self.describe_rooms(list(dict.fromkeys(newest + oldest + most_active)))
+            }
+        except Exception as e:
+            logger.error("Error summarizing rooms: %s", e)
+            return None
+        return construct(
+            RoomRegistrySummary,
+            rooms=total,
+            most_recently_active=described.get(newest[0]) if newest else None,
+            least_recently_active=described.get(oldest[0]) if oldest else None,
+            most_active=[described[code] for code in most_active if code in described]
+        )
+
+    async def reindex(self, batch_size: int = 500) -> int:
+        """
+        Add rooms missing from the registry, e.g. ones created before it existed.
+
+        Walks room:* hashes with SCAN, so Redis is never blocked. A room's
+        last activity is estimated from its remaining TTL and its number of
+        changes is its version.
+
+        Returns:
+            How many rooms were added
+        """
+        added = 0
+        batch: List[str] = []
+        try:
+            async for key in redis_service.scan_keys("room:*", count=batch_size, type="hash"):
+                # room:{code}:sockets is a hash too
+                if key.count(":") == 1:
+                    batch.append(key)
+                if len(batch) >= batch_size:
+                    added += await self._index(batch)
+                    batch = []
+            if batch:
+                added += await self._index(batch)
+        except Exception as e:
+            logger.error("Error reindexing rooms: %s", e)
+        return added
+
+    @staticmethod
+    async def _index(room_keys: List[str]) -> int:
+        async with redis_service.pipeline(transaction=False) as pipe:
+            for room_key in room_keys:
+                pipe.ttl(room_key)
+                pipe.hget(room_key, "version")
+            results = await pipe.execute()
+        now = int(time.time())
+        async with redis_service.pipeline(transaction=False) as pipe:
+            for index, room_key in enumerate(room_keys):
+                remaining, version = results[index * 2:index * 2 + 2]
+                room_code = room_key.removeprefix("room:")
+                last_activity = now - settings.room_ttl + remaining if remaining > 0 else now
+                pipe.zadd(ACTIVE_ROOMS_KEY, {room_code: last_activity}, nx=True)
+                pipe.zadd(ROOM_ACTIVITY_KEY, {room_code: int(version or 0)}, nx=True)
+            results = await pipe.execute()
+        return sum(results[::2])
+
+    async def add_user(
+        self,
+        room_code: str,
+        rejoin_user_id: Optional[str],
+        new_user_id: str,
+        user_name: str,
+        joined_at: str,
+        create_room: bool = False
+    ) -> Optional[Tuple[bool, str, Room]]:
+        """
+        Add a user, or mark an existing user as rejoined.
+
+        With create_room=True a missing room is created in the same script,
+        so joining a new room costs a single round-trip.
+
+        Returns:
+            (rejoined, user_id, room) or None if the room does not exist
+        """
+        try:
+            result = await self._add_user(
+                keys=self.script_keys(room_code),
+                args=self._args(
+                    rejoin_user_id or "", new_user_id, user_name, joined_at,
+                    room_code if create_room else "", settings.room_ttl
+                )
+            )
+        except Exception as e:
+            logger.error("Error adding user to room %s: %s", room_code, e)
+            return None
+        if not result:
+            return None
+        status, user_id, snapshot = result
+        return status == 1, user_id, self._to_room(snapshot)
+
+    async def remove_user(self, room_code: str, user_id: str) -> Tuple[bool, Optional[Room]]:
+        """
+        Remove a user, deleting the room if it becomes empty.
+
+        Returns:
+            (removed, room) where room is None if the room was deleted
+        """
+        try:
+            result = await self._remove_user(keys=self.script_keys(room_code), args=self._args(user_id, settings.room_ttl))
+        except Exception as e:
+            logger.error("Error removing user %s from room %s: %s", user_id, room_code, e)
+            return False, None
+        if result[0] == 0:
+            return False, None
+        if result[0] == 2:
+            return True, None
+        return True, self._to_room(result[1])
+
+    async def set_offline(self, room_code: str, user_ids: List[str]) -> Tuple[int, List[str]]:
+        """
+        Mark several users offline in one write.
+
+        Returns:
+            (version, user_ids that were online), or (0, []) if none changed
+        """
+        try:
+            result = await self._set_offline(keys=self.script_keys(room_code), args=self._args(settings.room_ttl, *user_ids))
+        except Exception as e:
+            logger.error("Error marking users offline in room %s: %s", room_code, e)
+            return 0, []
+        return int(result[0]), list(result[1:])
+
+    async def submit_vote(self, room_code: str, user_id: str, vote: str) -> int:
+        """Record a vote; returns -1 if room/user missing, 0 if not voting, else the new version"""
+        try:
+            return await self._submit_vote(keys=self.script_keys(room_code), args=self._args(user_id, vote, settings.room_ttl))
+        except Exception as e:
+            logger.error("Error submitting vote for %s in room %s: %s", user_id, room_code, e)
+            return -1
+
+    async def clear_vote(self, room_code: str, user_id: str) -> int:
+        """Remove a user's vote; returns the new version, or 0 if the user is missing"""
+        try:
+            return await self._clear_vote(keys=self.script_keys(room_code), args=self._args(user_id, settings.room_ttl))
+        except Exception as e:
+            logger.error("Error clearing vote for %s in room %s: %s", user_id, room_code, e)
+            return 0
+
+    async def reveal_votes(
+        self, room_code: str, revealed_at: str
+    ) -> Optional[Tuple[bool, Room, Optional[Dict[str, str]]]]:
+        """
+        Switch the room to revealed, recording the round in the history and totals.
+
+        Returns:
+            (revealed, room, totals) where revealed is False if votes were
+            already revealed and totals is set only if a round was recorded,
+            or None if the room does not exist
+        """
+        try:
+            result = await self._reveal_votes(
+                keys=self.script_keys(room_code), args=self._args(revealed_at, settings.room_ttl)
+            )
+        except Exception as e:
+            logger.error("Error revealing votes in room %s: %s", room_code, e)
+            return None
+        if not result:
+            return None
+        totals = _pairs(result[2]) if len(result) > 2 else None
+        return bool(result[0]), self._to_room(result[1]), totals
+
+    async def get_stats_totals(self, room_code: str) -> Dict[str, str]:
+        """Read a room's running-totals hash"""
+        try:
+            return await redis_service.client.hgetall(self.keys(room_code)[5])
+        except Exception as e:
+            logger.error("Error reading stats for room %s: %s", room_code, e)
+            return {}
+
+    async def reset_round(self, room_code: str) -> Optional[Room]:
+        """Clear all votes and advance to the next round"""
+        try:
+            snapshot = await self._reset_round(keys=self.script_keys(room_code), args=self._args(settings.room_ttl))
+            return self._to_room(snapshot) if snapshot else None
+        except Exception as e:
+            logger.error("Error resetting round in room %s: %s", room_code, e)
+            return None
+
+    async def events_since(self, room_code: str, version: int) -> Optional[List[Tuple[int, str, str]]]:
+        """
+        The changes made to a room after the given version, from its event log.
+
+        Returns:
+            (version, event, JSON data) for every later change, in order, or
+            None if the log no longer holds all of them (or the room is gone)
+        """
+        room_key, _, _, _, _, _, events_key = self.keys(room_code)
+        try:
+            current = await redis_service.client.hget(room_key, "version")
+            if current is None:
+                return None
+            missed = int(current) - version
+            if missed == 0:
+                return []
+            if missed < 0 or missed > settings.room_event_log_size:
+                return None
+            entries = await redis_service.client.xrange(events_key, min=f"{version + 1}-0", count=missed)
+        except Exception as e:
+            logger.error("Error reading event log for room %s: %s", room_code, e)
+            return None
+        # Entries are consecutive versions, so a full set starts right after ours
+        if len(entries) != missed or entries[0][0] != f"{version + 1}-0":
+            return None
+        return [(version + index, fields["event"], fields["data"]) for index, (_, fields) in enumerate(entries, start=1)]
+
+    async def get_history(self, room_code: str, offset: int, limit: int) -> Optional[VoteHistoryPage]:
+        """Read a page of the vote history, newest first"""
+        history_key = self.keys(room_code)[4]
+        try:
+            async with redis_service.pipeline(transaction=False) as pipe:
+                pipe.lrange(history_key, offset, offset + limit - 1)
+                pipe.llen(history_key)
+                entries, total = await pipe.execute()
+        except Exception as e:
+            logger.error("Error reading vote history for room %s: %s", room_code, e)
+            return None
+        return construct(
+            VoteHistoryPage,
+            entries=[self._to_history(entry) for entry in entries],
+            offset=offset,
+            total=total
+        )
+
+    @staticmethod
+    def _to_history(raw: str) -> VoteHistory:
+        """Build a trusted VoteHistory entry from its stored JSON"""
+        data = serializer.loads(raw)
+        if data.get("stats") is not None:
+            data["stats"] = construct(VoteStats, **data["stats"])
+        return construct(VoteHistory, **data)
@@ -1,104 +1,200 @@
-import redis
-import json
+import asyncio
 import logging
-from typing import Optional, Any
+from typing import Any, AsyncIterator, Optional
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from app.config import settings
+from app.utils import serializer
+from app.utils.circuit_breaker import CircuitBreaker, OPEN, HALF_OPEN
+from app.utils.instrumentation import InstrumentedRedis
+from app.utils.metrics import metrics, CallbackMetric
 
 logger = logging.getLogger(__name__)
 
+# Delay before the n-th reconnect of a command: min(cap, base * 2**n) seconds
+RETRY_BACKOFF_BASE = 0.05
+RETRY_BACKOFF_CAP = 1.0
+
+# Pings at startup before the app gives up waiting and starts anyway
+STARTUP_ATTEMPTS = 5
+
 
 class RedisService:
     def __init__(self):
+        self.pool: Optional[redis.ConnectionPool] = None
         self.client: Optional[redis.Redis] = None
-        self._connect()
+        self.breaker = CircuitBreaker(
+            "Redis",
+            failure_threshold=settings.redis_breaker_threshold,
+            reset_timeout=settings.redis_breaker_reset,
+            max_reset_timeout=settings.redis_breaker_max_reset
+        )
+        self._configure()
 
-    def _connect(self):
-        """Connect to Redis with retry logic"""
+    def _configure(self):
+        """
+        Create the connection pool. No connection is opened here: the first
+        one is opened by connect() in the app's startup hook, or by the
+        first command.
+
+        The pool holds at most redis_max_connections; when every connection
+        is busy, callers wait up to redis_pool_timeout seconds for one to be
+        released instead of failing immediately. Connections idle for
+        redis_health_check_interval are pinged before reuse, and a command
+        that hits a dropped connection reconnects up to redis_retries times
+        with exponential backoff.
+        """
+        options = dict(
+            decode_responses=True,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_keepalive=True,
+            health_check_interval=settings.redis_health_check_interval,
+            retry=Retry(ExponentialBackoff(cap=RETRY_BACKOFF_CAP, base=RETRY_BACKOFF_BASE), settings.redis_retries),
+            retry_on_error=[RedisConnectionError, RedisTimeoutError]
+        )
         try:
             # Support both URL format (Render) and host/port format (local)
             if settings.redis_url:
-                self.client = redis.from_url(
-                    settings.redis_url,
-                    decode_responses=True,
-                    socket_connect_timeout=5,
-                    socket_keepalive=True,
-                    retry_on_timeout=True
-                )
-                logger.info(f"Connected to Redis using URL")
+                self.pool = redis.BlockingConnectionPool.from_url(settings.redis_url, **options)
+                logger.info("Configured Redis connection pool using URL")
             else:
-                self.client = redis.Redis(
+                self.pool = redis.BlockingConnectionPool(
                     host=settings.redis_host,
                     port=settings.redis_port,
                     db=settings.redis_db,
-                    decode_responses=True,
-                    socket_connect_timeout=5,
-                    socket_keepalive=True,
-                    retry_on_timeout=True
+                    **options
                 )
-                logger.info(f"Connected to Redis at {settings.redis_host}:{settings.redis_port}")
-            # Test connection
-            self.client.ping()
+                logger.info("Configured Redis connection pool for %s:%s", settings.redis_host, settings.redis_port)
+            self.client = InstrumentedRedis(connection_pool=self.pool)
+            self.client.breaker = self.breaker
         except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
+            logger.error("Failed to configure Redis: %s", e)
             raise
 
-    def get(self, key: str) -> Optional[Any]:
+    async def connect(self) -> bool:
+        """
+        Wait for Redis to answer, pinging with exponential backoff.
+
+        Called from the app's startup hook. Never raises: if Redis is still
+        down the app starts anyway, /ready reports it, and commands connect
+        once Redis is back.
+        """
+        delay = 0.1
+        for attempt in range(1, STARTUP_ATTEMPTS + 1):
+            try:
+                # A blackholed host would otherwise hold startup for every reconnect's timeout
+                healthy = await asyncio.wait_for(self.health_check(), settings.redis_socket_timeout)
+            except asyncio.TimeoutError:
+                healthy = False
+            if healthy:
+                logger.info("Connected to Redis")
+                return True
+            if attempt < STARTUP_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+        logger.error("Redis is unreachable; starting anyway and retrying on demand")
+        return False
+
+    async def close(self):
+        """Close the client and release pooled connections"""
+        if self.client:
+            await self.client.aclose()
+
+    def pipeline(self, transaction: bool = True) -> redis.client.Pipeline:
+        """
+        Batch several commands into one round-trip.
+
+        Use as ``async with redis_service.pipeline() as pipe:``; with
+        transaction=True the batch runs as MULTI/EXEC.
+        """
+        return self.client.pipeline(transaction=transaction)
+
+    async def get(self, key: str) -> Optional[Any]:
         """Get value from Redis"""
         try:
-            value = self.client.get(key)
+            value = await self.client.get(key)
             if value:
-                return json.loads(value)
+                return serializer.loads(value)
             return None
         except Exception as e:
-            logger.error(f"Error getting key {key}: {e}")
+            logger.error("Error getting key %s: %s", key, e)
             return None
 
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """Set value in Redis with optional TTL"""
         try:
-            json_value = json.dumps(value)
+            json_value = serializer.dumps(value)
             if ttl:
-                self.client.setex(key, ttl, json_value)
+                await self.client.setex(key, ttl, json_value)
             else:
-                self.client.set(key, json_value)
+                await self.client.set(key, json_value)
             return True
         except Exception as e:
-            logger.error(f"Error setting key {key}: {e}")
+            logger.error("Error setting key %s: %s", key, e)
             return False
 
-    def delete(self, key: str) -> bool:
+    async def delete(self, key: str) -> bool:
         """Delete key from Redis"""
         try:
-            self.client.delete(key)
+            await self.client.delete(key)
             return True
         except Exception as e:
-            logger.error(f"Error deleting key {key}: {e}")
+            logger.error("Error deleting key %s: %s", key, e)
             return False
 
-    def exists(self, key: str) -> bool:
+    async def exists(self, key: str) -> bool:
         """Check if key exists in Redis"""
         try:
-            return bool(self.client.exists(key))
+            return bool(await self.client.exists(key))
         except Exception as e:
-            logger.error(f"Error checking existence of key {key}: {e}")
+            logger.error("Error checking existence of key %s: %s", key, e)
             return False
 
-    def get_keys(self, pattern: str) -> list:
-        """Get all keys matching pattern"""
+    async def scan_keys(self, pattern: str, count: int = 500, type: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Iterate over the keys matching a pattern using SCAN.
+
+        Unlike KEYS, each SCAN call does a bounded amount of work, so Redis
+        keeps serving other clients while a large keyspace is walked. Keys
+        may be yielded more than once if the keyspace changes meanwhile.
+
+        Args:
+            count: Keys examined per SCAN call
+            type: Only yield keys of this Redis type ("hash", "set", ...)
+        """
+        async for key in self.client.scan_iter(match=pattern, count=count, _type=type):
+            yield key
+
+    async def get_keys(self, pattern: str) -> list:
+        """Get all keys matching pattern, collected with SCAN rather than KEYS"""
         try:
-            return self.client.keys(pattern)
+            return [key async for key in self.scan_keys(pattern)]
         except Exception as e:
-            logger.error(f"Error getting keys with pattern {pattern}: {e}")
+            logger.error("Error getting keys with pattern %s: %s", pattern, e)
             return []
 
-    def health_check(self) -> bool:
+    async def health_check(self) -> bool:
         """Check if Redis is healthy"""
         try:
-            return self.client.ping()
+            return await self.client.ping()
         except Exception as e:
-            logger.error(f"Redis health check failed: {e}")
+            logger.error("Redis health check failed: %s", e)
             return False
 
 
 # Global Redis service instance
 redis_service = RedisService()
+
+metrics.register(CallbackMetric(
+    "redis_circuit_state", "Redis circuit breaker: 0 closed, 1 half-open (probing), 2 open (failing fast)",
+    lambda: {OPEN: 2, HALF_OPEN: 1}.get(redis_service.breaker.state, 0)
+))
+metrics.register(CallbackMetric(
+    "redis_circuit_rejections_total", "Redis calls failed fast while the circuit was open",
+    lambda: redis_service.breaker.rejected, type="counter"
+))
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+from app.models.room import Room
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pub/sub channel carrying "<instance_id> <room key>" for every room mutation
+INVALIDATION_CHANNEL = "room_invalidations"
+
+# Identifies this process so it can ignore its own invalidation messages
+INSTANCE_ID = uuid.uuid4().hex
+
+# Longest wait between attempts to resubscribe to INVALIDATION_CHANNEL
+MAX_RESUBSCRIBE_DELAY = 30.0
+
+
+class RoomCache:
+    """
+    Bounded LRU cache of Room models with a per-entry TTL.
+
+    Cached rooms are shared objects; callers must not mutate them except
+    through the cache's own update helpers.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Room]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, room_code: str) -> Optional[Room]:
+        """Return a cached room, or None on a miss or expired entry"""
+        entry = self._entries.get(room_code)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, room = entry
+        if expires_at < time.monotonic():
+            del self._entries[room_code]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(room_code)
+        self.hits += 1
+        return room
+
+    def put(self, room: Room) -> None:
+        """Insert or replace a room, evicting the least recently used entry if full"""
+        if not self.enabled:
+            return
+        self._entries[room.room_code] = (time.monotonic() + self.ttl, room)
+        self._entries.move_to_end(room.room_code)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, room_code: str) -> Optional[Room]:
+        """Return a cached room without touching counters or LRU order"""
+        entry = self._entries.get(room_code)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def invalidate(self, room_code: str) -> None:
+        """Drop a room from the cache"""
+        if self._entries.pop(room_code, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every cached room"""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries)
+        }
+
+
+room_cache = RoomCache(settings.room_cache_size, settings.room_cache_ttl)
+
+
+async def listen_for_invalidations() -> None:
+    """
+    Drop cached rooms that other workers have modified.
+
+    Runs for the lifetime of the app. After a dropped subscription the whole
+    cache is cleared, since messages may have been missed, and the listener
+    resubscribes with exponential backoff while Redis stays unreachable.
+    """
+    from app.services.redis_service import redis_service
+
+    delay = 1.0
+    while True:
+        pubsub = redis_service.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            delay = 1.0
+            async for message in pubsub.listen():
+                origin, _, room_key = message["data"].partition(" ")
+                if origin != INSTANCE_ID:
+                    room_cache.invalidate(room_key.removeprefix("room:"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Room invalidation listener failed, clearing cache: %s", e)
+            room_cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RESUBSCRIBE_DELAY)
+        finally:
+            await pubsub.aclose()
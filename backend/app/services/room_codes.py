@@ -1,30 +1,43 @@
 import random
-from app.services.redis_service import redis_service
+from app.services.room_store import room_store
 
 # Character set excluding ambiguous characters (0, O, 1, I)
 CHARSET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
 
+# Attempts per code length before moving to a longer code
+ATTEMPTS_PER_LENGTH = 10
 
-def generate_room_code(length: int = 6) -> str:
+# Longest code tried before giving up
+MAX_LENGTH = 10
+
+
+async def allocate_room_code(created_at: str, length: int = 6) -> str:
     """
-    Generate a unique room code.
+    Generate a room code and atomically create an empty room under it.
+
+    Each attempt is a single create-if-absent round-trip, so there is no
+    window between checking a code and claiming it.
 
     Args:
+        created_at: Creation timestamp for the new room
         length: Length of the room code (default 6)
 
     Returns:
-        A unique room code that doesn't exist in Redis
+        The reserved room code
+
+    Raises:
+        RuntimeError: If no code could be reserved (e.g. Redis is unavailable)
     """
-    max_attempts = 10
+    while length <= MAX_LENGTH:
+        for _ in range(ATTEMPTS_PER_LENGTH):
+            code = ''.join(random.choices(CHARSET, k=length))
+            if await room_store.create_room(code, created_at):
+                return code
 
-    for _ in range(max_attempts):
-        code = ''.join(random.choices(CHARSET, k=length))
-        # Check if code already exists
-        if not redis_service.exists(f"room:{code}"):
-            return code
+        # If we still have collisions after ATTEMPTS_PER_LENGTH, increase length
+        length += 1
 
-    # If we still have collisions after max_attempts, increase length
-    return generate_room_code(length + 1)
+    raise RuntimeError("Could not allocate a room code")
 
 
 def validate_room_code(code: str) -> bool:
@@ -1,210 +1,330 @@
+import asyncio
+import math
+import time
 import uuid
 import logging
 from datetime import datetime
-from typing import Optional, Dict
-from app.models.room import Room, VoteHistory
-from app.models.user import User
-from app.services.redis_service import redis_service
-from app.services.room_codes import generate_room_code
+from typing import Dict, List, Optional
 from app.config import settings
+from app.models.room import Room, VoteHistoryPage
+from app.models.registry import RoomListPage, RoomRegistrySummary
+from app.models.stats import VoteStats, RoomStats
+from app.models.user import User
+from app.models.trusted import construct
+from app.services.room_store import room_store
+from app.services.room_cache import room_cache
+from app.services.room_codes import allocate_room_code
+from app.services.vote_stats import compute_round_stats, room_stats_from_totals
+from app.utils import serializer
 
 logger = logging.getLogger(__name__)
 
+# Rooms touched before the bookkeeping is reset; at worst a room is touched again early
+MAX_TRACKED_TOUCHES = 10000
+
+# room_code -> when touch_room last refreshed its TTL
+_last_touch: Dict[str, float] = {}
+
 
 class RoomService:
     @staticmethod
-    def create_room(room_code: Optional[str] = None) -> Room:
-        """Create a new room with a unique room code or use provided code"""
+    def _update_cached_user(room_code: str, user_id: str, version: int, **fields) -> None:
+        """Apply a single-field write to the cached room (write-through for O(1) mutations)"""
+        room = room_cache.peek(room_code)
+        if not room:
+            return
+        user = room.users.get(user_id)
+        # A version jump means another writer got in between; re-read next time
+        if not user or room.version != version - 1:
+            room_cache.invalidate(room_code)
+            return
+        for name, value in fields.items():
+            setattr(user, name, value)
+        room.version = version
+
+    @staticmethod
+    async def create_room(room_code: Optional[str] = None) -> Optional[Room]:
+        """
+        Create a new room with a freshly allocated code, or get-or-create one with the provided code.
+
+        Returns:
+            The room, or None if the provided code was taken but the room
+            expired before it could be read
+        """
+        now = datetime.utcnow().isoformat() + "Z"
+
         if not room_code:
-            room_code = generate_room_code()
-        else:
-            # Check if room with this code already exists
-            existing_room = RoomService.get_room(room_code)
+            room_code = await allocate_room_code(now)
+        elif not await room_store.create_room(room_code, now):
+            # The code is taken (or was just created by a concurrent join)
+            existing_room = await RoomService.get_room(room_code)
             if existing_room:
-                logger.info(f"Room {room_code} already exists, returning existing room")
-                return existing_room
+                logger.debug("Room %s already exists, returning existing room", room_code)
+            else:
+                logger.debug("Room %s was taken but has expired", room_code)
+            return existing_room
 
-        now = datetime.utcnow().isoformat() + "Z"
+        logger.info("Created room %s", room_code, extra={"room_code": room_code})
 
-        room = Room(
+        room = construct(
+            Room,
             room_code=room_code,
             created_at=now,
             state="voting",
             current_round=1,
-            users={},
-            vote_history=[]
+            users={}
         )
-
-        # Save to Redis with TTL
-        redis_service.set(f"room:{room_code}", room.model_dump(), ttl=settings.room_ttl)
-        logger.info(f"Created room: {room_code}")
-
+        room_cache.put(room)
         return room
 
     @staticmethod
-    def get_room(room_code: str) -> Optional[Room]:
-        """Get room by code"""
-        data = redis_service.get(f"room:{room_code}")
-        if data:
-            return Room(**data)
-        return None
+    async def get_room(room_code: str, use_cache: bool = True) -> Optional[Room]:
+        """Get room by code, served from the in-process cache when possible"""
+        if use_cache:
+            room = room_cache.get(room_code)
+            if room:
+                await RoomService.touch_room(room_code)
+                return room
+
+        room = await room_store.load_room(room_code)
+        if room:
+            room_cache.put(room)
+            await RoomService.touch_room(room_code)
+        return room
 
     @staticmethod
-    def save_room(room: Room) -> bool:
-        """Save room to Redis"""
-        return redis_service.set(f"room:{room.room_code}", room.model_dump(), ttl=settings.room_ttl)
+    async def preload_rooms(room_codes: List[str], concurrency: int = 50) -> int:
+        """
+        Load rooms into the cache before their users come back for them.
+
+        Reads go out concurrency at a time and do not touch the rooms.
+
+        Returns:
+            How many of the rooms still existed
+        """
+        if not room_cache.enabled:
+            return 0
+        loaded = 0
+        for start in range(0, len(room_codes), concurrency):
+            batch = room_codes[start:start + concurrency]
+            for room in await asyncio.gather(*(room_store.load_room(code) for code in batch)):
+                if room:
+                    room_cache.put(room)
+                    loaded += 1
+        return loaded
 
     @staticmethod
-    def delete_room(room_code: str) -> bool:
-        """Delete room from Redis"""
-        return redis_service.delete(f"room:{room_code}")
+    async def touch_room(room_code: str) -> bool:
+        """
+        Refresh a room's TTL if it has not been refreshed for room_touch_interval.
+
+        Mutations refresh the TTL themselves; this keeps rooms that are only
+        read, or whose users are connected but idle, from expiring mid-session.
+
+        Returns:
+            True if a touch was sent to Redis
+        """
+        now = time.monotonic()
+        if now - _last_touch.get(room_code, -math.inf) < settings.room_touch_interval:
+            return False
+        if len(_last_touch) >= MAX_TRACKED_TOUCHES:
+            _last_touch.clear()
+        _last_touch[room_code] = now
+        return await room_store.touch(room_code)
 
     @staticmethod
-    def add_user(room_code: str, user_name: str, user_id: Optional[str] = None) -> Optional[tuple[Room, User]]:
-        """Add a user to a room or rejoin if user_id exists"""
-        room = RoomService.get_room(room_code)
-        if not room:
-            return None
-
-        now = datetime.utcnow().isoformat() + "Z"
+    async def reap_expired_rooms(limit: int = 100) -> List[str]:
+        """
+        Clean up rooms that expired since the last sweep.
+
+        Returns:
+            Codes of the rooms that were gone, so callers can drop their own state
+        """
+        reaped = [code for code in await room_store.expired_rooms(limit) if await room_store.reap(code)]
+        for room_code in reaped:
+            room_cache.invalidate(room_code)
+            _last_touch.pop(room_code, None)
+        if reaped:
+            logger.info("Reaped %d expired rooms", len(reaped))
+        return reaped
 
-        logger.info(f"add_user called: room_code={room_code}, user_name={user_name}, user_id={user_id}, current_users={len(room.users)}")
-
-        # Check if user_id provided and exists in room (rejoining)
-        if user_id and user_id in room.users:
-            user = room.users[user_id]
-            user.connected = True
-            user.name = user_name  # Update name in case it changed
-            RoomService.save_room(room)
-            logger.info(f"User {user_name} ({user_id}) rejoined room {room_code}")
-            return room, user
-
-        # New user - generate new ID
-        user_id = str(uuid.uuid4())
+    @staticmethod
+    async def list_rooms(order: str = "recent", offset: int = 0, limit: int = 50) -> RoomListPage:
+        """A page of live rooms, by latest activity ("recent"), longest idle ("oldest") or most changes ("active")"""
+        total, rooms = await room_store.list_rooms(order, offset, limit)
+        return construct(RoomListPage, rooms=rooms, order=order, offset=offset, total=total)
 
-        # First user is facilitator
-        is_facilitator = len(room.users) == 0
+    @staticmethod
+    async def room_registry_summary() -> Optional[RoomRegistrySummary]:
+        """Room count with the most recently active, least recently active and most active rooms"""
+        return await room_store.registry_summary()
 
-        logger.info(f"Creating new user: user_id={user_id}, is_facilitator={is_facilitator}, room has {len(room.users)} users")
+    @staticmethod
+    async def reindex_rooms() -> int:
+        """Register rooms missing from the room registry; returns how many were added"""
+        added = await room_store.reindex()
+        if added:
+            logger.info("Added %d rooms to the registry", added)
+        return added
 
-        user = User(
-            id=user_id,
-            name=user_name,
-            connected=True,
-            is_facilitator=is_facilitator,
-            current_vote=None,
-            joined_at=now
-        )
+    @staticmethod
+    async def add_user(
+        room_code: str, user_name: str, user_id: Optional[str] = None, create_room: bool = False
+    ) -> Optional[tuple[Room, User, bool]]:
+        """
+        Add a user to a room or rejoin if user_id exists.
+
+        Args:
+            create_room: Create the room if it does not exist yet
+
+        Returns:
+            (room, user, rejoined) or None if the room does not exist
+        """
+        now = datetime.utcnow().isoformat() + "Z"
 
-        room.users[user_id] = user
-        RoomService.save_room(room)
+        # First user becomes facilitator; a known user_id rejoins instead of creating a new user
+        result = await room_store.add_user(room_code, user_id, str(uuid.uuid4()), user_name, now, create_room)
+        if not result:
+            return None
 
-        logger.info(f"User {user_name} ({user_id}) joined room {room_code}, now has {len(room.users)} users")
-        return room, user
+        rejoined, user_id, room = result
+        room_cache.put(room)
+        user = room.users[user_id]
+        logger.debug("User %s %s room %s, now has %d users", user_id, "rejoined" if rejoined else "joined",
+                     room_code, len(room.users))
+        return room, user, rejoined
 
     @staticmethod
-    def remove_user(room_code: str, user_id: str) -> Optional[Room]:
+    async def remove_user(room_code: str, user_id: str) -> Optional[Room]:
         """Remove a user from a room"""
-        room = RoomService.get_room(room_code)
-        if not room or user_id not in room.users:
+        removed, room = await room_store.remove_user(room_code, user_id)
+        if not removed:
             return None
 
-        del room.users[user_id]
-
-        # If no users left, delete room
-        if not room.users:
-            RoomService.delete_room(room_code)
-            logger.info(f"Room {room_code} deleted (no users)")
+        # The store deletes the room when the last user leaves
+        if not room:
+            room_cache.invalidate(room_code)
+            logger.info("Room %s deleted (no users)", room_code, extra={"room_code": room_code})
             return None
 
-        # If facilitator left, assign to next user
-        has_facilitator = any(user.is_facilitator for user in room.users.values())
-        if not has_facilitator and room.users:
-            first_user_id = next(iter(room.users.keys()))
-            room.users[first_user_id].is_facilitator = True
-
-        RoomService.save_room(room)
-        logger.info(f"User {user_id} removed from room {room_code}")
+        room_cache.put(room)
+        logger.debug("User %s removed from room %s", user_id, room_code)
         return room
 
     @staticmethod
-    def update_user_connection(room_code: str, user_id: str, connected: bool) -> Optional[Room]:
-        """Update user connection status"""
-        room = RoomService.get_room(room_code)
-        if not room or user_id not in room.users:
+    async def mark_users_offline(room_code: str, user_ids: List[str]) -> Optional[tuple[int, List[str]]]:
+        """
+        Mark several users disconnected with a single version bump.
+
+        Returns:
+            (version, user_ids that were online) or None if none changed
+        """
+        version, changed = await room_store.set_offline(room_code, user_ids)
+        if not version:
             return None
 
-        room.users[user_id].connected = connected
-        RoomService.save_room(room)
-        return room
+        room = room_cache.peek(room_code)
+        if room and room.version == version - 1:
+            for user_id in changed:
+                if user_id in room.users:
+                    room.users[user_id].connected = False
+            room.version = version
+        elif room:
+            room_cache.invalidate(room_code)
+        return version, changed
 
     @staticmethod
-    def submit_vote(room_code: str, user_id: str, vote: str) -> Optional[Room]:
-        """Submit a vote for a user"""
-        room = RoomService.get_room(room_code)
-        if not room or user_id not in room.users:
+    async def submit_vote(room_code: str, user_id: str, vote: str) -> Optional[int]:
+        """Submit a vote for a user; returns the new room version"""
+        version = await room_store.submit_vote(room_code, user_id, vote)
+        if version == 0:
+            logger.debug("Cannot vote in room %s - votes already revealed", room_code)
             return None
-
-        if room.state != "voting":
-            logger.warning(f"Cannot vote in room {room_code} - state is {room.state}")
+        if version < 0:
             return None
 
-        room.users[user_id].current_vote = vote
-        RoomService.save_room(room)
-        logger.info(f"User {user_id} voted in room {room_code}")
-        return room
+        RoomService._update_cached_user(room_code, user_id, version, current_vote=vote)
+        return version
 
     @staticmethod
-    def clear_vote(room_code: str, user_id: str) -> Optional[Room]:
-        """Clear a user's vote"""
-        room = RoomService.get_room(room_code)
-        if not room or user_id not in room.users:
+    async def clear_vote(room_code: str, user_id: str) -> Optional[int]:
+        """Clear a user's vote; returns the new room version"""
+        version = await room_store.clear_vote(room_code, user_id)
+        if not version:
             return None
 
-        room.users[user_id].current_vote = None
-        RoomService.save_room(room)
-        return room
+        RoomService._update_cached_user(room_code, user_id, version, current_vote=None)
+        return version
 
     @staticmethod
-    def reveal_votes(room_code: str) -> Optional[Room]:
-        """Reveal all votes in a room"""
-        room = RoomService.get_room(room_code)
-        if not room:
+    async def reveal_votes(room_code: str) -> Optional[tuple[bool, Room, VoteStats, Optional[RoomStats]]]:
+        """
+        Reveal all votes in a room and compute the round's statistics.
+
+        The store records the round in the history and running totals in
+        the same step as the voting -> revealed transition. A repeated
+        reveal changes nothing and returns revealed=False, the same round
+        stats and no room totals.
+        """
+        result = await room_store.reveal_votes(room_code, datetime.utcnow().isoformat() + "Z")
+        if not result:
+            room_cache.invalidate(room_code)
             return None
 
-        room.state = "revealed"
+        revealed, room, totals = result
+        room_cache.put(room)
 
-        # Add to vote history
         votes = {user_id: user.current_vote for user_id, user in room.users.items() if user.current_vote}
-        if votes:
-            history = VoteHistory(
-                round=room.current_round,
-                votes=votes,
-                revealed_at=datetime.utcnow().isoformat() + "Z"
-            )
-            room.vote_history.append(history)
-
-        RoomService.save_room(room)
-        logger.info(f"Votes revealed in room {room_code}")
-        return room
+        stats = compute_round_stats(votes)
+        room_stats = room_stats_from_totals(totals) if totals is not None else None
+        return revealed, room, stats, room_stats
 
     @staticmethod
-    def reset_round(room_code: str) -> Optional[Room]:
+    async def get_room_stats(room_code: str) -> RoomStats:
+        """Get running statistics across every revealed round of a room"""
+        return room_stats_from_totals(await room_store.get_stats_totals(room_code))
+
+    @staticmethod
+    async def reset_round(room_code: str) -> Optional[Room]:
         """Reset the round (clear all votes and increment round)"""
-        room = RoomService.get_room(room_code)
+        room = await room_store.reset_round(room_code)
         if not room:
+            room_cache.invalidate(room_code)
             return None
 
-        # Clear all votes
-        for user in room.users.values():
-            user.current_vote = None
+        room_cache.put(room)
+        return room
+
+    @staticmethod
+    async def events_since(room_code: str, version: int) -> Optional[List[tuple[str, dict]]]:
+        """
+        The delta events a client at the given room version has missed.
+
+        Returns:
+            (event, data) pairs in version order, or None if they are no
+            longer all in the room's event log and a snapshot is needed
+        """
+        entries = await room_store.events_since(room_code, version)
+        if entries is None:
+            return None
 
-        room.state = "voting"
-        room.current_round += 1
+        events = []
+        for event_version, event, raw in entries:
+            data = serializer.loads(raw)
+            data["version"] = event_version
+            if event == "votes_revealed":
+                # Lua's cjson may encode a reveal without votes as an empty array
+                data["votes"] = data["votes"] or {}
+                # Running totals are only sent live, with the reveal that added to them
+                data["stats"] = compute_round_stats(data["votes"]).model_dump()
+                data["room_stats"] = None
+            events.append((event, data))
+        return events
 
-        RoomService.save_room(room)
-        logger.info(f"Round reset in room {room_code} (now round {room.current_round})")
-        return room
+    @staticmethod
+    async def get_vote_history(room_code: str, offset: int = 0, limit: int = 20) -> Optional[VoteHistoryPage]:
+        """Get a page of revealed rounds, newest first"""
+        return await room_store.get_history(room_code, offset, limit)
 
 
 room_service = RoomService()
@@ -0,0 +1,30 @@
+import logging
+from app.config import settings
+from app.services.room_store_base import RoomStore
+
+logger = logging.getLogger(__name__)
+
+
+def create_room_store() -> RoomStore:
+    """
+    The store selected by settings.room_storage.
+
+    Raises:
+        ValueError: For an unknown engine, or "memory" with multi_node or
+            several workers, as other processes could not see this one's rooms
+    """
+    if settings.room_storage == "redis":
+        from app.services.redis_room_store import RedisRoomStore
+        return RedisRoomStore()
+    if settings.room_storage == "memory":
+        if settings.multi_node:
+            raise ValueError("ROOM_STORAGE=memory keeps rooms in one process and cannot be used with MULTI_NODE")
+        if settings.workers > 1:
+            raise ValueError("ROOM_STORAGE=memory keeps rooms in one process and cannot be used with WORKERS > 1")
+        from app.services.memory_room_store import MemoryRoomStore
+        logger.info("Rooms are kept in memory and will be lost on restart")
+        return MemoryRoomStore()
+    raise ValueError(f"Unknown ROOM_STORAGE {settings.room_storage!r}, expected 'redis' or 'memory'")
+
+
+room_store = create_room_store()
@@ -0,0 +1,171 @@
+from abc import ABC, abstractmethod
+from typing import Optional, Dict, List, Tuple
+from app.models.room import Room, VoteHistoryPage
+from app.models.registry import RoomActivity, RoomRegistrySummary
+
+
+class RoomStore(ABC):
+    """
+    Room persistence used by RoomService.
+
+    Each method is atomic: no other change to the same room can interleave
+    with it. Every change increments the room's version, refreshes its TTL
+    and is logged for replay (see events_since). Rooms returned are fresh
+    objects that the caller may keep, e.g. in the room cache.
+
+    Implementations: RedisRoomStore (redis_room_store.py), shared by every
+    worker, and MemoryRoomStore (memory_room_store.py), private to one
+    process. Pick one with the room_storage setting.
+    """
+
+    # Whether other processes see the same rooms, so cached copies must be
+    # invalidated when another worker changes a room
+    shared: bool = False
+
+    def dump_rooms(self) -> Optional[List[dict]]:
+        """
+        Every live room as plain data, for a snapshot file.
+
+        Returns None if the store keeps rooms across restarts by itself.
+        """
+        return None
+
+    def restore_rooms(self, rooms: List[dict]) -> int:
+        """Load rooms from dump_rooms() into an empty store; returns how many were restored"""
+        return 0
+
+    @abstractmethod
+    async def health_check(self) -> bool:
+        """Whether the store can serve requests"""
+
+    @abstractmethod
+    async def create_room(self, room_code: str, created_at: str) -> bool:
+        """
+        Create an empty room; returns False if the code is already taken.
+
+        Until someone joins, the room expires after empty_room_ttl rather than
+        room_ttl, so rooms created and never used do not pile up.
+        """
+
+    @abstractmethod
+    async def load_room(self, room_code: str) -> Optional[Room]:
+        """Read a consistent snapshot of a room"""
+
+    @abstractmethod
+    async def touch(self, room_code: str) -> bool:
+        """Refresh a room's TTL without writing to it; returns False if the room is gone"""
+
+    @abstractmethod
+    async def expired_rooms(self, limit: int) -> List[str]:
+        """Codes of rooms not written or touched for a full room_ttl, oldest first"""
+
+    @abstractmethod
+    async def reap(self, room_code: str) -> bool:
+        """Clean up after a room listed as expired; returns False if it turned out to be alive"""
+
+    @abstractmethod
+    async def list_rooms(self, order: str, offset: int, limit: int) -> Tuple[int, List[RoomActivity]]:
+        """
+        A page of the room registry.
+
+        Args:
+            order: "recent" (latest activity first), "oldest" (longest idle
+                first) or "active" (most changes first)
+
+        Returns:
+            (rooms in the registry, page of rooms)
+        """
+
+    @abstractmethod
+    async def registry_summary(self, top: int = 5) -> Optional[RoomRegistrySummary]:
+        """Room count, the most and least recently active rooms and the most active ones"""
+
+    @abstractmethod
+    async def reindex(self) -> int:
+        """Add rooms missing from the registry; returns how many were added"""
+
+    @abstractmethod
+    async def add_user(
+        self,
+        room_code: str,
+        rejoin_user_id: Optional[str],
+        new_user_id: str,
+        user_name: str,
+        joined_at: str,
+        create_room: bool = False
+    ) -> Optional[Tuple[bool, str, Room]]:
+        """
+        Add a user, or mark an existing user as rejoined.
+
+        With create_room=True a missing room is created first.
+
+        Returns:
+            (rejoined, user_id, room) or None if the room does not exist
+        """
+
+    @abstractmethod
+    async def remove_user(self, room_code: str, user_id: str) -> Tuple[bool, Optional[Room]]:
+        """
+        Remove a user, deleting the room if it becomes empty.
+
+        Returns:
+            (removed, room) where room is None if the room was deleted
+        """
+
+    @abstractmethod
+    async def set_offline(self, room_code: str, user_ids: List[str]) -> Tuple[int, List[str]]:
+        """
+        Mark several users offline in one change.
+
+        Returns:
+            (version, user_ids that were online), or (0, []) if none changed
+        """
+
+    @abstractmethod
+    async def submit_vote(self, room_code: str, user_id: str, vote: str) -> int:
+        """Record a vote; returns -1 if room/user missing, 0 if not voting, else the new version"""
+
+    @abstractmethod
+    async def clear_vote(self, room_code: str, user_id: str) -> int:
+        """Remove a user's vote; returns the new version, or 0 if the user is missing"""
+
+    @abstractmethod
+    async def reveal_votes(
+        self, room_code: str, revealed_at: str
+    ) -> Optional[Tuple[bool, Room, Optional[Dict[str, str]]]]:
+        """
+        Switch the room to revealed, recording the round in the history and totals.
+
+        Only the voting -> revealed transition changes the room: a round with
+        votes is pushed onto the history and added to the running totals in
+        the same atomic step, and the version is bumped. A repeated reveal
+        changes nothing and logs no event.
+
+        Returns:
+            (revealed, room, totals) where revealed is False if votes were
+            already revealed and totals, the updated running totals as strings
+            (see room_stats_from_totals), is set only if a round was recorded;
+            None if the room does not exist
+        """
+
+    @abstractmethod
+    async def get_stats_totals(self, room_code: str) -> Dict[str, str]:
+        """Read a room's running totals"""
+
+    @abstractmethod
+    async def reset_round(self, room_code: str) -> Optional[Room]:
+        """Clear all votes and advance to the next round"""
+
+    @abstractmethod
+    async def events_since(self, room_code: str, version: int) -> Optional[List[Tuple[int, str, str]]]:
+        """
+        The changes made to a room after the given version, from its event log.
+
+        Returns:
+            (version, event, JSON data) for every later change, in order, or
+            None if the log no longer holds all of them (or the room is gone)
+        """
+
+    @abstractmethod
+    async def get_history(self, room_code: str, offset: int, limit: int) -> Optional[VoteHistoryPage]:
+        """Read a page of the vote history, newest first"""
@@ -0,0 +1,87 @@
+from collections import Counter
+from statistics import median
+from typing import Dict, Optional
+from app.models.stats import VoteStats, RoomStats
+from app.models.trusted import construct
+
+# Planning poker deck, in display order
+CARD_DECK = ("0", "0.5", "1", "2", "3", "5", "8", "13", "?", "☕")
+
+# Cards that express uncertainty or a break rather than an estimate
+NON_NUMERIC_CARDS = {"?", "☕"}
+
+
+def compute_round_stats(votes: Dict[str, str]) -> VoteStats:
+    """
+    Compute statistics for one revealed round.
+
+    Args:
+        votes: user_id -> card
+
+    Returns:
+        VoteStats; numeric fields are None when nobody picked a numeric card
+    """
+    counts = Counter(votes.values())
+    distribution = {card: counts.get(card, 0) for card in CARD_DECK}
+
+    numeric = sorted(float(vote) for vote in votes.values() if vote not in NON_NUMERIC_CARDS)
+
+    mode = []
+    if counts:
+        top = max(counts.values())
+        mode = [card for card in CARD_DECK if counts.get(card) == top]
+
+    stats = construct(
+        VoteStats,
+        vote_count=len(votes),
+        numeric_count=len(numeric),
+        mode=mode,
+        distribution=distribution
+    )
+    if numeric:
+        stats.average = round(sum(numeric) / len(numeric), 2)
+        stats.median = median(numeric)
+        stats.min = numeric[0]
+        stats.max = numeric[-1]
+        stats.spread = numeric[-1] - numeric[0]
+        stats.consensus = numeric[0] == numeric[-1]
+    return stats
+
+
+def stats_increments(stats: VoteStats) -> Dict[str, float]:
+    """
+    Field increments that fold one round into a room's running totals.
+
+    The totals are stored as a flat hash so each reveal updates them with
+    HINCRBY/HINCRBYFLOAT instead of rescanning the history.
+    """
+    increments = {
+        "rounds": 1,
+        "consensus_rounds": int(stats.consensus),
+        "vote_count": stats.vote_count,
+        "numeric_count": stats.numeric_count,
+        "numeric_sum": sum(
+            float(card) * count for card, count in stats.distribution.items() if card not in NON_NUMERIC_CARDS
+        ),
+    }
+    for card, count in stats.distribution.items():
+        if count:
+            increments[f"dist:{card}"] = count
+    return increments
+
+
+def room_stats_from_totals(totals: Dict[str, str]) -> RoomStats:
+    """Build RoomStats from the running-totals hash"""
+    numeric_count = int(totals.get("numeric_count", 0))
+    average: Optional[float] = None
+    if numeric_count:
+        average = round(float(totals.get("numeric_sum", 0)) / numeric_count, 2)
+    return construct(
+        RoomStats,
+        rounds=int(totals.get("rounds", 0)),
+        consensus_rounds=int(totals.get("consensus_rounds", 0)),
+        vote_count=int(totals.get("vote_count", 0)),
+        numeric_count=numeric_count,
+        average=average,
+        distribution={card: int(totals.get(f"dist:{card}", 0)) for card in CARD_DECK}
+    )
@@ -0,0 +1,274 @@
+"""
+Run the backend in several worker processes, with each room's sockets on
+one worker.
+
+    python -m app.supervisor --host 0.0.0.0 --port 8000 --workers 4
+
+uvicorn --workers spreads connections at random, so each process ends up
+caching and batching for every room. Instead the supervisor accepts each
+connection itself and peeks at its request line without consuming it. The
+room query parameter, which the frontend puts on its Socket.IO URL, is
+hashed onto a HashRing of workers, and the connection is passed to that
+worker (app.worker). From then on the worker serves it directly; the
+supervisor never handles any of the traffic. Requests without a room are
+hashed by client address.
+
+Routing by room is only a matter of locality. Workers run with MULTI_NODE,
+so broadcasts, sessions and kicks go through Redis, and a room whose
+sockets end up on two workers still works. That happens to clients that do
+not name their room, and to a crashed worker's rooms: they go to the next
+worker on the ring until it is restarted, and connections made meanwhile
+stay where they are.
+
+Only the first request line of a connection is routed: later requests on
+it, such as a proxy reusing a keep-alive connection, go to the same worker.
+That is harmless for plain HTTP requests and for WebSocket, where a session
+is one connection, but not for Engine.IO long-polling, whose requests must
+all reach the worker holding the session. With several workers the
+Socket.IO server therefore only accepts the websocket transport.
+
+TLS must be terminated in front of the supervisor, as it reads the plain
+request line. With one worker this runs the app in-process, under uvicorn.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+from typing import List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+import uvicorn
+from app.config import settings
+from app.utils.hash_ring import HashRing
+from app.worker import Server, server_config
+
+logger = logging.getLogger("app.supervisor")
+
+# A request line that has not arrived by then, or is longer, is dropped
+REQUEST_LINE_TIMEOUT = 5.0
+MAX_REQUEST_LINE = 8192
+
+# Seconds to wait for every worker to start before taking connections anyway
+STARTUP_TIMEOUT = 30.0
+
+# A crashing worker is restarted after RESTART_DELAY seconds, doubling up to MAX_RESTART_DELAY
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+
+# Seconds workers get to close their connections on shutdown
+SHUTDOWN_TIMEOUT = 30.0
+
+
+def routing_key(request_line: bytes, address: Tuple) -> str:
+    """The room in the request's query string, or else the client address"""
+    parts = request_line.split(b" ")
+    if len(parts) == 3:
+        rooms = parse_qs(urlsplit(parts[1].decode("latin-1")).query).get("room")
+        if rooms and rooms[0]:
+            # join_room upper-cases codes, so "abc123" and "ABC123" are one room
+            return "room:" + rooms[0].upper()
+    return f"client:{address[0]}"
+
+
+async def _wait_for(sock: socket.socket, writable: bool = False) -> None:
+    """Wait until a non-blocking socket is readable (or writable)"""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    add, remove = (loop.add_writer, loop.remove_writer) if writable else (loop.add_reader, loop.remove_reader)
+    add(sock.fileno(), lambda: ready.done() or ready.set_result(None))
+    try:
+        await ready
+    finally:
+        remove(sock.fileno())
+
+
+async def peek_request_line(conn: socket.socket) -> bytes:
+    """Read the request line, leaving it in the socket for the worker"""
+    while True:
+        await _wait_for(conn)
+        data = conn.recv(MAX_REQUEST_LINE, socket.MSG_PEEK)
+        if not data:
+            raise ConnectionError("client closed the connection")
+        end = data.find(b"\r\n")
+        if end >= 0:
+            return data[:end]
+        if len(data) >= MAX_REQUEST_LINE:
+            raise ConnectionError("request line too long")
+        # The rest of the line is still on its way and the socket stays readable meanwhile
+        await asyncio.sleep(0.01)
+
+
+class Worker:
+    """One worker process and the Unix socket its connections are passed over"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[subprocess.Popen] = None
+        self.channel: Optional[socket.socket] = None
+        self.restart_delay = RESTART_DELAY
+
+
+class Supervisor:
+    def __init__(self, host: str, port: int, workers: int, log_level: str):
+        self.host = host
+        self.port = port
+        self.log_level = log_level
+        self.ring = HashRing(workers)
+        self.workers = [Worker(index) for index in range(workers)]
+        self.alive: Set[int] = set()
+        self.stopping = False
+        self._all_ready = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def start_worker(self, worker: Worker) -> None:
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        # Sockets of one room can still land on different workers, so they share rooms through Redis
+        env = dict(os.environ, WORKERS=str(len(self.workers)), WORKER_INDEX=str(worker.index), MULTI_NODE="true")
+        worker.process = subprocess.Popen(
+            [sys.executable, "-m", "app.worker", str(child.fileno()), "--log-level", self.log_level],
+            env=env, pass_fds=[child.fileno()]
+        )
+        child.close()
+        parent.setblocking(False)
+        worker.channel = parent
+        asyncio.get_running_loop().add_reader(parent.fileno(), self._on_message, worker)
+        logger.info("Started worker %d (pid %d)", worker.index, worker.process.pid)
+
+    def _on_message(self, worker: Worker) -> None:
+        try:
+            message = worker.channel.recv(16)
+        except BlockingIOError:
+            return
+        except OSError:
+            message = b""
+        if message == b"ready":
+            self.alive.add(worker.index)
+            worker.restart_delay = RESTART_DELAY
+            logger.info("Worker %d is ready", worker.index)
+            if len(self.alive) == len(self.workers):
+                self._all_ready.set()
+        elif not message:
+            # The worker's end of the channel closed: it exited
+            asyncio.get_running_loop().remove_reader(worker.channel.fileno())
+            worker.channel.close()
+            self.alive.discard(worker.index)
+            self._spawn(self._restart(worker))
+
+    async def _restart(self, worker: Worker) -> None:
+        code = await asyncio.to_thread(worker.process.wait)
+        if self.stopping:
+            return
+        logger.error("Worker %d exited with code %s, restarting in %.0fs", worker.index, code, worker.restart_delay)
+        await asyncio.sleep(worker.restart_delay)
+        worker.restart_delay = min(worker.restart_delay * 2, MAX_RESTART_DELAY)
+        if not self.stopping:
+            self.start_worker(worker)
+
+    async def _hand_over(self, worker: Worker, conn: socket.socket) -> None:
+        while True:
+            try:
+                socket.send_fds(worker.channel, [b"c"], [conn.fileno()])
+                return
+            except BlockingIOError:
+                await _wait_for(worker.channel, writable=True)
+
+    async def route(self, conn: socket.socket, address: Tuple) -> None:
+        """Pass a new connection to the worker that owns its room"""
+        try:
+            request_line = await asyncio.wait_for(peek_request_line(conn), REQUEST_LINE_TIMEOUT)
+            index = self.ring.node_for(routing_key(request_line, address), self.alive)
+            if index is None:
+                raise ConnectionError("no worker is running")
+            await self._hand_over(self.workers[index], conn)
+        except (asyncio.TimeoutError, OSError) as e:
+            logger.debug("Dropped a connection from %s: %s", address[0], e)
+        finally:
+            # The worker holds its own copy of the socket now
+            conn.close()
+
+    def stop(self) -> None:
+        if self.stopping:
+            return
+        logger.info("Shutting down %d workers", len(self.workers))
+        self.stopping = True
+        for worker in self.workers:
+            if worker.process and worker.process.poll() is None:
+                worker.process.terminate()
+
+    async def serve(self) -> None:
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+
+        listener = socket.create_server((self.host, self.port), backlog=2048)
+        listener.setblocking(False)
+        for worker in self.workers:
+            self.start_worker(worker)
+        try:
+            await asyncio.wait_for(self._all_ready.wait(), STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error("Only %d of %d workers started", len(self.alive), len(self.workers))
+        logger.info("Supervisor routing connections on http://%s:%d to %d workers by room",
+                    self.host, self.port, len(self.workers))
+
+        accepting = loop.create_task(self._accept(listener))
+        while not self.stopping:
+            await asyncio.sleep(0.5)
+        accepting.cancel()
+        listener.close()
+        await asyncio.gather(accepting, return_exceptions=True)
+        await asyncio.to_thread(self._wait_for_workers)
+
+    async def _accept(self, listener: socket.socket) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            conn, address = await loop.sock_accept(listener)
+            conn.setblocking(False)
+            self._spawn(self.route(conn, address))
+
+    def _wait_for_workers(self) -> None:
+        for worker in self.workers:
+            if not worker.process:
+                continue
+            try:
+                worker.process.wait(timeout=SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                logger.error("Worker %d did not stop in time, killing it", worker.index)
+                worker.process.kill()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="worker processes (default: the WORKERS setting)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--reload", action="store_true", help="restart on code changes (one worker only)")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and settings.room_storage == "memory":
+        parser.error("ROOM_STORAGE=memory keeps rooms in one process and cannot be used with several workers")
+    if args.workers > 1 and args.reload:
+        parser.error("--reload needs a single worker")
+
+    if args.reload:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, log_level=args.log_level, reload=True,
+                    forwarded_allow_ips=settings.forwarded_allow_ips)
+        return
+    if args.workers <= 1:
+        Server(server_config(host=args.host, port=args.port, log_level=args.log_level)).run()
+        return
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(Supervisor(args.host, args.port, args.workers, args.log_level).serve())
+
+
+if __name__ == "__main__":
+    main()
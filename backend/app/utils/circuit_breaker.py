@@ -0,0 +1,78 @@
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling a dependency that is known to be down"""
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a dependency is down, instead of letting each one
+    wait for its own timeout and pile up behind the others.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are rejected for `reset_timeout` seconds. Then a single call is let
+    through as a probe (half-open): success closes the circuit, failure
+    opens it again for twice as long, up to `max_reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, max_reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._timeout = reset_timeout
+        self._retry_at = 0.0
+
+    def before_call(self) -> None:
+        """
+        Raise CircuitOpenError unless a call may go ahead.
+
+        Every call let through must be followed by record_success() or
+        record_failure().
+        """
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        # A probe that never reported back (e.g. cancelled) does not block the next one
+        if now >= self._retry_at:
+            self.state = HALF_OPEN
+            self._retry_at = now + self._timeout
+            return
+        self.rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("%s is reachable again, closing the circuit", self.name)
+        self.state = CLOSED
+        self.failures = 0
+        self._timeout = self.reset_timeout
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            # The probe failed: back off further
+            self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened += 1
+        self._retry_at = time.monotonic() + self._timeout
+        logger.error("%s failed %d times in a row, failing fast for %.1fs", self.name, self.failures, self._timeout)
+
+    def stats(self) -> Dict[str, object]:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected, "opened": self.opened}
@@ -0,0 +1,33 @@
+import bisect
+import hashlib
+from typing import Collection, List, Optional
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto nodes 0..nodes-1.
+
+    Each node owns `replicas` points on the ring, so keys spread evenly, and
+    a key belongs to the first point after its hash. When a node is down its
+    keys move to the next live node on the ring and nowhere else, and they
+    come back once it is up again.
+    """
+
+    def __init__(self, nodes: int, replicas: int = 64):
+        points = sorted((_hash(f"{node}:{replica}"), node) for node in range(nodes) for replica in range(replicas))
+        self.nodes = nodes
+        self._hashes: List[int] = [point for point, _ in points]
+        self._nodes: List[int] = [node for _, node in points]
+
+    def node_for(self, key: str, alive: Optional[Collection[int]] = None) -> Optional[int]:
+        """The node a key belongs to, skipping nodes not in `alive`; None if none is alive"""
+        start = bisect.bisect(self._hashes, _hash(key))
+        for offset in range(len(self._nodes)):
+            node = self._nodes[(start + offset) % len(self._nodes)]
+            if alive is None or node in alive:
+                return node
+        return None
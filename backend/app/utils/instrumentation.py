@@ -0,0 +1,146 @@
+import asyncio
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError, NoScriptError, TimeoutError as RedisTimeoutError
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.metrics import metrics, CallbackMetric, event_duration, event_errors, redis_duration, redis_errors
+
+# Name of the Socket.IO event being handled in the current task
+current_event: ContextVar[str] = ContextVar("current_event", default="background")
+
+
+class RoundTripStats:
+    """Counts handled events and the Redis round-trips each event type caused"""
+
+    def __init__(self):
+        self.events: Dict[str, int] = {}
+        self.round_trips: Dict[str, int] = {}
+
+    def record_event(self, event: str) -> None:
+        self.events[event] = self.events.get(event, 0) + 1
+
+    def record_round_trip(self) -> None:
+        event = current_event.get()
+        self.round_trips[event] = self.round_trips.get(event, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per event type: events handled, total round-trips and round-trips per event"""
+        result = {}
+        for event in sorted(self.events.keys() | self.round_trips.keys()):
+            events = self.events.get(event, 0)
+            round_trips = self.round_trips.get(event, 0)
+            result[event] = {
+                "events": events,
+                "round_trips": round_trips,
+                "round_trips_per_event": round(round_trips / events, 2) if events else 0.0
+            }
+        return result
+
+
+round_trip_stats = RoundTripStats()
+
+metrics.register(CallbackMetric(
+    "redis_round_trips_total", "Redis round-trips per Socket.IO event type",
+    lambda: round_trip_stats.round_trips, type="counter", labelname="event"
+))
+
+
+def instrumented(handler):
+    """
+    Tag a Socket.IO handler so Redis round-trips made while it runs are
+    attributed to it, and record its latency.
+    """
+    event = handler.__name__
+    max_args = len(inspect.signature(handler).parameters)
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        # python-socketio probes connect/disconnect with optional extra
+        # arguments and retries on TypeError; fail before recording anything
+        if len(args) > max_args:
+            raise TypeError(f"{event}() takes {max_args} positional arguments")
+        current_event.set(event)
+        round_trip_stats.record_event(event)
+        start = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            event_errors.inc(event)
+            raise
+        finally:
+            event_duration.observe(time.perf_counter() - start, event)
+
+    return wrapper
+
+
+# Errors meaning Redis could not be reached in time, as opposed to an error reply
+CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)
+
+
+async def _timed(command: str, breaker: Optional[CircuitBreaker], call: Callable[[], Awaitable]):
+    """Count and time a Redis round-trip and report its outcome to the circuit breaker, which may reject it up front"""
+    if breaker:
+        breaker.before_call()
+    round_trip_stats.record_round_trip()
+    start = time.perf_counter()
+    try:
+        result = await call()
+    except NoScriptError:
+        # Expected on a script's first call; redis-py loads it and retries
+        if breaker:
+            breaker.record_success()
+        raise
+    except CONNECTION_ERRORS:
+        redis_errors.inc(command)
+        if breaker:
+            breaker.record_failure()
+        raise
+    except Exception:
+        # Redis answered, with an error
+        redis_errors.inc(command)
+        if breaker:
+            breaker.record_success()
+        raise
+    finally:
+        redis_duration.observe(time.perf_counter() - start, command)
+    if breaker:
+        breaker.record_success()
+    return result
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    """Pipeline that counts and times each execute() as a single round-trip"""
+
+    breaker: Optional[CircuitBreaker] = None
+
+    async def execute(self, raise_on_error: bool = True):
+        return await _timed("PIPELINE", self.breaker, lambda: super(InstrumentedPipeline, self).execute(raise_on_error))
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Redis client that counts round-trips for the current event and times
+    every command.
+
+    Counting happens per command rather than per connection write, so
+    connection handshakes are not attributed to handlers; a NOSCRIPT
+    retry (SCRIPT LOAD + EVALSHA) counts as the extra round-trips it is.
+
+    With a circuit breaker set, commands and pipelines fail fast with
+    CircuitOpenError while Redis is known to be unreachable.
+    """
+
+    breaker: Optional[CircuitBreaker] = None
+
+    async def execute_command(self, *args, **options):
+        return await _timed(str(args[0]).upper(), self.breaker,
+                            lambda: super(InstrumentedRedis, self).execute_command(*args, **options))
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedPipeline:
+        pipe = InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
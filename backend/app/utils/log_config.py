@@ -0,0 +1,158 @@
+import logging
+import logging.handlers
+import math
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils import serializer
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Templates tracked by SamplingFilter before its state is reset; messages
+# built with f-strings make every record its own template
+MAX_TRACKED_TEMPLATES = 1024
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line.
+
+    Fields passed with extra= (room_code, user_id, ...) become top-level keys.
+    Encoded with the app's serializer (orjson); a value it cannot encode is
+    logged as its str().
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        try:
+            return serializer.dumps(entry)
+        except TypeError:
+            return serializer.dumps({
+                key: value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+                for key, value in entry.items()
+            })
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Sample and rate-limit records per message template.
+
+    Records below WARNING are sampled: with sample_rate=0.1 one in ten
+    records of each template is kept. Records of every level are capped at
+    rate_limit per second per template (0 disables the cap); the next
+    record let through carries a "suppressed" count of what was dropped.
+
+    Templates are the unformatted messages, so only %-style calls
+    (logger.info("... %s", value)) share a template.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_limit: int = 0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        # (logger, template) -> records seen, for sampling
+        self._seen: Dict[Tuple[str, str], int] = {}
+        # (logger, template) -> [window start, records in window, suppressed]
+        self._windows: Dict[Tuple[str, str], List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        if len(self._seen) > MAX_TRACKED_TEMPLATES:
+            self._seen.clear()
+        if len(self._windows) > MAX_TRACKED_TEMPLATES:
+            self._windows.clear()
+
+        if self.sample_rate < 1.0 and record.levelno < logging.WARNING:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+            # Keep the first record and then one whenever the expected sample count ticks over
+            if math.ceil((seen + 1) * self.sample_rate) == math.ceil(seen * self.sample_rate):
+                return False
+
+        if self.rate_limit:
+            now = time.monotonic()
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                suppressed = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if window[1] >= self.rate_limit:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records without formatting them.
+
+    The stock QueueHandler formats every message on the calling thread;
+    here %-style arguments are left for the listener thread, so a
+    logger.debug("... %s", room_code) that survives filtering costs the
+    event loop one queue put. Only tracebacks are rendered up front,
+    because they reference live frames.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> None:
+    """
+    Configure the root logger from settings.
+
+    log_format selects "text" or "json" output and log_async moves writing
+    to stderr onto a background thread. Sampling and rate limiting are
+    applied before a record is queued.
+    """
+    global _listener
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if settings.log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    handler: logging.Handler = stream_handler
+    if settings.log_async:
+        handler = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+    handler.addFilter(SamplingFilter(settings.log_sample_rate, settings.log_rate_limit))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, settings.log_level.upper()))
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
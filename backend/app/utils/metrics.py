@@ -0,0 +1,141 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple, Union
+
+# Latency buckets in seconds, from sub-millisecond Redis calls to slow handlers
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+PREFIX = "planning_poker_"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, optionally split by labels.
+
+    observe() is a bisect and two additions; buckets are only made
+    cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Gauge or counter whose value is read from a callback at scrape time.
+
+    Used to export numbers that are already tracked elsewhere (socket
+    counts, cache counters) without touching the hot path. With a
+    labelname, the callback returns a {label value: number} dict.
+    """
+
+    def __init__(self, name: str, help: str, callback: Callable[[], Union[float, Dict[str, float]]],
+                 type: str = "gauge", labelname: str = ""):
+        self.name = PREFIX + name
+        self.help = help
+        self.callback = callback
+        self.type = type
+        self.labelname = labelname
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        if not self.labelname:
+            return [f"{self.name} {_number(value)}"]
+        return [f"{self.name}{_labels((self.labelname,), (label,))} {_number(number)}"
+                for label, number in sorted(value.items())]
+
+
+class MetricsRegistry:
+    """Metrics exported in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+event_errors = metrics.register(Counter(
+    "socketio_event_exceptions_total", "Socket.IO handlers that raised", ("event",)
+))
+event_duration = metrics.register(Histogram(
+    "socketio_event_duration_seconds", "Socket.IO handler latency", ("event",)
+))
+redis_duration = metrics.register(Histogram(
+    "redis_command_duration_seconds", "Redis command and pipeline latency", ("command",)
+))
+redis_errors = metrics.register(Counter(
+    "redis_command_errors_total", "Redis commands that failed", ("command",)
+))
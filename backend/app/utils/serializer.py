@@ -0,0 +1,64 @@
+from typing import Any, Union
+import orjson
+from pydantic import BaseModel
+from app.config import settings
+
+
+class Encoded(str):
+    """
+    A payload that is already JSON.
+
+    Emitting one skips building a dict just to serialize it again: the
+    Socket.IO JSON module below splices it into the packet as-is. Being a
+    str, it survives the pickling done by the multi-node Redis manager.
+    """
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON text"""
+    if isinstance(obj, Encoded):
+        return obj
+    return orjson.dumps(obj, default=_default).decode()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    return orjson.loads(data)
+
+
+def payload(model: BaseModel) -> Union[Encoded, dict]:
+    """
+    Socket.IO payload for a model, encoded straight to JSON by pydantic-core.
+
+    With the msgpack wire format the packet is not JSON, so a dict is
+    returned instead.
+    """
+    if settings.socketio_serializer == "msgpack":
+        return model.model_dump(mode="json")
+    return Encoded(model.model_dump_json())
+
+
+class SocketIOJSON:
+    """
+    JSON module for python-socketio / python-engineio.
+
+    Packets are lists like [event, payload]; Encoded elements are joined
+    in verbatim and everything else goes through orjson.
+    """
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs) -> str:
+        if isinstance(obj, list) and any(isinstance(item, Encoded) for item in obj):
+            return "[" + ",".join(dumps(item) for item in obj) + "]"
+        return dumps(obj)
+
+    @staticmethod
+    def loads(data: Union[str, bytes], **kwargs) -> Any:
+        return orjson.loads(data)
@@ -1,59 +1,123 @@
 import logging
-from typing import Dict
+from typing import Optional
+from app.config import settings
 from app.websocket.manager import sio
 from app.websocket.schemas import (
     JoinRoomData,
     SubmitVoteData,
+    VoteHistoryRequest,
+    ConnectSuccessData,
     RoomJoinedData,
     UserData,
-    VoteSubmittedData,
+    UserJoinedData,
+    UserUpdatedData,
+    UserLeftData,
     VotesRevealedData,
     RoundResetData,
     ErrorData,
     KickUserData,
     UserKickedData
 )
+from app.websocket.sessions import session_store
+from app.websocket.rate_limit import rate_limited, rate_limiter
+from app.websocket.vote_batcher import vote_batcher
+from app.websocket.presence import presence
 from app.services.room_service import room_service
+from app.services.vote_stats import CARD_DECK
+from app.utils.instrumentation import instrumented
+from app.utils.metrics import metrics, Counter
+from app.utils.serializer import payload
+from app.models.room import Room
+from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
-# Store session data (socket_id -> {room_code, user_id})
-sessions: Dict[str, Dict[str, str]] = {}
-
 # Valid vote options
-VALID_VOTES = {"0", "0.5", "1", "2", "3", "5", "8", "13", "?", "☕"}
+VALID_VOTES = set(CARD_DECK)
+
+room_resyncs = metrics.register(Counter(
+    "room_resyncs_total", "Rejoining clients sent their missed events or, failing that, the full room", ("method",)
+))
+
+
+async def _broadcast(event: str, data, room_code: str, skip_sid: Optional[str] = None) -> None:
+    """Emit to a room after any votes still batched for it, so clients get deltas in version order"""
+    await vote_batcher.flush(room_code)
+    await sio.emit(event, data, room=room_code, skip_sid=skip_sid)
+
+
+async def _enter(sid: str, room: Room, user: User, last_version: Optional[int] = None) -> None:
+    """
+    Attach a socket to its user in the room and send it the room.
+
+    A client that still holds the room at last_version is sent just the
+    events it missed, if the room's event log has them all.
+    """
+    # Store session data
+    await session_store.join(sid, room.room_code, user.id)
+
+    # Join Socket.IO room
+    await sio.enter_room(sid, room.room_code)
+
+    # Send confirmation to user
+    await sio.emit('room_joined', RoomJoinedData(
+        room_code=room.room_code,
+        user_id=user.id,
+        is_facilitator=user.is_facilitator
+    ), to=sid)
+
+    if last_version is not None:
+        events = await room_service.events_since(room.room_code, last_version)
+        if events is not None:
+            for event, data in events:
+                await sio.emit(event, data, to=sid)
+            room_resyncs.inc("replay")
+            return
+        room_resyncs.inc("snapshot")
+
+    # Send full room state to user
+    await sio.emit('room_state', payload(room), to=sid)
+
+
+def _user_left(room: Room, user_id: str) -> UserLeftData:
+    """user_left delta, including who holds the facilitator role afterwards"""
+    facilitator_id = next((user.id for user in room.users.values() if user.is_facilitator), None)
+    return UserLeftData(user_id=user_id, version=room.version, facilitator_id=facilitator_id)
 
 
 @sio.event
+@instrumented
 async def connect(sid, environ):
     """Handle client connection"""
-    logger.info(f"Client connected: {sid}")
-    sessions[sid] = {}
-    await sio.emit('connect_success', to=sid)
+    logger.debug("Client connected: %s", sid)
+    await session_store.open(sid)
+    await sio.emit('connect_success', ConnectSuccessData(room_routing=settings.workers > 1), to=sid)
 
 
 @sio.event
+@instrumented
 async def disconnect(sid):
     """Handle client disconnection"""
-    logger.info(f"Client disconnected: {sid}")
+    logger.debug("Client disconnected: %s", sid)
 
     # Get session data
-    session = sessions.get(sid, {})
+    session = await session_store.get(sid)
     room_code = session.get('room_code')
     user_id = session.get('user_id')
 
-    if room_code and user_id:
-        # Update user as disconnected
-        room = room_service.update_user_connection(room_code, user_id, False)
-        if room:
-            await sio.emit('user_disconnected', {'user_id': user_id}, room=room_code, skip_sid=sid)
-
     # Clean up session
-    if sid in sessions:
-        del sessions[sid]
+    remaining = await session_store.close(sid)
+    rate_limiter.forget(sid)
+
+    # Only mark the user disconnected once their last tab has gone, after
+    # the grace period in case they are just reconnecting
+    if room_code and user_id and not remaining:
+        await presence.user_disconnected(room_code, user_id)
 
 
 @sio.event
+@rate_limited
+@instrumented
 async def join_room(sid, data):
     """Handle user joining a room"""
     try:
@@ -62,63 +126,53 @@ async def join_room(sid, data):
         user_name = join_data.user_name.strip()
 
         if not user_name:
-            await sio.emit('error', ErrorData(message="User name is required").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="User name is required"), to=sid)
             return
 
-        # Check if room exists, if not create it with the provided code
-        room = room_service.get_room(room_code)
-        if not room:
-            room = room_service.create_room(room_code)
-
-        # Check if this is a rejoin (user_id exists in room)
-        is_rejoining = join_data.user_id and room and join_data.user_id in room.users
-
-        # Add user to room (or rejoin if user_id provided and exists)
-        result = room_service.add_user(room_code, user_name, join_data.user_id)
+        # Back within the disconnect grace period: the user was never marked
+        # offline, so unless they changed their name there is nothing to write
+        if join_data.user_id and presence.cancel(room_code, join_data.user_id):
+            room = await room_service.get_room(room_code)
+            user = room.users.get(join_data.user_id) if room else None
+            if user and user.name == user_name:
+                await _enter(sid, room, user, join_data.last_version)
+                logger.debug("User %s reconnected to room %s", user.id, room_code)
+                return
+
+        # Add user to room, creating the room if needed (or rejoin if user_id provided and exists)
+        result = await room_service.add_user(room_code, user_name, join_data.user_id, create_room=True)
         if not result:
-            await sio.emit('error', ErrorData(message="Failed to join room").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Failed to join room"), to=sid)
             return
 
-        room, user = result
-
-        # Store session data
-        sessions[sid] = {
-            'room_code': room_code,
-            'user_id': user.id
-        }
-
-        # Join Socket.IO room
-        await sio.enter_room(sid, room_code)
-
-        # Send confirmation to user
-        await sio.emit('room_joined', RoomJoinedData(
-            room_code=room_code,
-            user_id=user.id,
-            is_facilitator=user.is_facilitator
-        ).model_dump(), to=sid)
-
-        # Send full room state to user
-        await sio.emit('room_state', room.model_dump(), to=sid)
+        room, user, is_rejoining = result
+        await _enter(sid, room, user, join_data.last_version)
 
-        # Only notify other users if this is a new join (not a rejoin)
+        # Notify other users: a new member, or an existing one back online
         if not is_rejoining:
-            await sio.emit('user_joined', {
-                'user': user.model_dump()
-            }, room=room_code, skip_sid=sid)
-            logger.info(f"User {user_name} joined room {room_code}")
+            await _broadcast('user_joined', UserJoinedData(
+                user=user.model_dump(),
+                version=room.version
+            ), room_code, skip_sid=sid)
+            logger.info("User %s joined room %s", user.id, room_code, extra={"room_code": room_code, "user_id": user.id})
         else:
-            logger.info(f"User {user_name} rejoined room {room_code}")
+            await _broadcast('user_updated', UserUpdatedData(
+                user=user.model_dump(),
+                version=room.version
+            ), room_code, skip_sid=sid)
+            logger.debug("User %s rejoined room %s", user.id, room_code)
 
     except Exception as e:
-        logger.error(f"Error in join_room: {e}")
-        await sio.emit('error', ErrorData(message=str(e)).model_dump(), to=sid)
+        logger.error("Error in join_room: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
 
 
 @sio.event
+@instrumented
 async def leave_room(sid):
     """Handle user leaving a room"""
     try:
-        session = sessions.get(sid, {})
+        session = await session_store.get(sid)
         room_code = session.get('room_code')
         user_id = session.get('user_id')
 
@@ -126,209 +180,298 @@ async def leave_room(sid):
             return
 
         # Remove user from room
-        room = room_service.remove_user(room_code, user_id)
+        presence.cancel(room_code, user_id)
+        room = await room_service.remove_user(room_code, user_id)
 
         # Leave Socket.IO room
         await sio.leave_room(sid, room_code)
 
         # Notify other users
         if room:
-            await sio.emit('user_left', {'user_id': user_id}, room=room_code)
-            # Send updated room state
-            await sio.emit('room_state', room.model_dump(), room=room_code)
+            await _broadcast('user_left', _user_left(room, user_id), room_code)
 
         # Clear session
-        sessions[sid] = {}
+        await session_store.leave(sid)
 
-        logger.info(f"User {user_id} left room {room_code}")
+        logger.info("User %s left room %s", user_id, room_code, extra={"room_code": room_code, "user_id": user_id})
 
     except Exception as e:
-        logger.error(f"Error in leave_room: {e}")
+        logger.error("Error in leave_room: %s", e)
 
 
 @sio.event
+@rate_limited
+@instrumented
 async def submit_vote(sid, data):
     """Handle vote submission"""
     try:
         vote_data = SubmitVoteData(**data)
-        session = sessions.get(sid, {})
+        session = await session_store.get(sid)
         room_code = session.get('room_code')
         user_id = session.get('user_id')
 
         if not room_code or not user_id:
-            await sio.emit('error', ErrorData(message="Not in a room").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
             return
 
         # Validate vote
         if vote_data.vote not in VALID_VOTES:
-            await sio.emit('error', ErrorData(message="Invalid vote value " + vote_data.vote).model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Invalid vote value " + vote_data.vote), to=sid)
             return
 
         # Submit vote
-        room = room_service.submit_vote(room_code, user_id, vote_data.vote)
-        if not room:
-            await sio.emit('error', ErrorData(message="Failed to submit vote").model_dump(), to=sid)
+        version = await room_service.submit_vote(room_code, user_id, vote_data.vote)
+        if not version:
+            await sio.emit('error', ErrorData(message="Failed to submit vote"), to=sid)
             return
 
         # Broadcast to room (without revealing the vote value)
-        await sio.emit('vote_submitted', VoteSubmittedData(user_id=user_id).model_dump(), room=room_code)
+        await vote_batcher.add(room_code, user_id, True, version)
 
-        logger.info(f"User {user_id} voted in room {room_code}")
+        logger.debug("User %s voted in room %s", user_id, room_code)
 
     except Exception as e:
-        logger.error(f"Error in submit_vote: {e}")
-        await sio.emit('error', ErrorData(message=str(e)).model_dump(), to=sid)
+        logger.error("Error in submit_vote: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
 
 
 @sio.event
+@rate_limited
+@instrumented
 async def clear_vote(sid):
     """Handle clearing a vote"""
     try:
-        session = sessions.get(sid, {})
+        session = await session_store.get(sid)
         room_code = session.get('room_code')
         user_id = session.get('user_id')
 
         if not room_code or not user_id:
             return
 
-        room = room_service.clear_vote(room_code, user_id)
-        if room:
-            await sio.emit('vote_cleared', {'user_id': user_id}, room=room_code)
+        version = await room_service.clear_vote(room_code, user_id)
+        if version:
+            await vote_batcher.add(room_code, user_id, False, version)
 
     except Exception as e:
-        logger.error(f"Error in clear_vote: {e}")
+        logger.error("Error in clear_vote: %s", e)
 
 
 @sio.event
+@rate_limited
+@instrumented
 async def reveal_votes(sid):
     """Handle revealing votes"""
     try:
-        session = sessions.get(sid, {})
+        session = await session_store.get(sid)
         room_code = session.get('room_code')
         user_id = session.get('user_id')
 
         if not room_code or not user_id:
-            await sio.emit('error', ErrorData(message="Not in a room").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
             return
 
         # Check if user is facilitator
-        room = room_service.get_room(room_code)
+        room = await room_service.get_room(room_code)
         if not room or user_id not in room.users or not room.users[user_id].is_facilitator:
-            await sio.emit('error', ErrorData(message="Only facilitator can reveal votes").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Only facilitator can reveal votes"), to=sid)
             return
 
         # Reveal votes
-        room = room_service.reveal_votes(room_code)
-        if not room:
-            await sio.emit('error', ErrorData(message="Failed to reveal votes").model_dump(), to=sid)
+        result = await room_service.reveal_votes(room_code)
+        if not result:
+            await sio.emit('error', ErrorData(message="Failed to reveal votes"), to=sid)
             return
 
-        # Get votes and broadcast
+        # Votes were already revealed: nothing changed, so there is nothing to send
+        revealed, room, stats, room_stats = result
+        if not revealed:
+            return
+
+        # Get votes and broadcast them with the round statistics
         votes = {user_id: user.current_vote for user_id, user in room.users.items() if user.current_vote}
-        await sio.emit('votes_revealed', VotesRevealedData(votes=votes).model_dump(), room=room_code)
+        await _broadcast('votes_revealed', VotesRevealedData(
+            votes=votes,
+            stats=stats.model_dump(),
+            room_stats=room_stats.model_dump() if room_stats else None,
+            version=room.version
+        ), room_code)
 
-        logger.info(f"Votes revealed in room {room_code}")
+        logger.info("Votes revealed in room %s", room_code, extra={"room_code": room_code, "round": room.current_round})
 
     except Exception as e:
-        logger.error(f"Error in reveal_votes: {e}")
-        await sio.emit('error', ErrorData(message=str(e)).model_dump(), to=sid)
+        logger.error("Error in reveal_votes: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
 
 
 @sio.event
+@rate_limited
+@instrumented
 async def reset_round(sid):
     """Handle resetting the round"""
     try:
-        session = sessions.get(sid, {})
+        session = await session_store.get(sid)
         room_code = session.get('room_code')
         user_id = session.get('user_id')
 
         if not room_code or not user_id:
-            await sio.emit('error', ErrorData(message="Not in a room").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
             return
 
         # Check if user is facilitator
-        room = room_service.get_room(room_code)
+        room = await room_service.get_room(room_code)
         if not room or user_id not in room.users or not room.users[user_id].is_facilitator:
-            await sio.emit('error', ErrorData(message="Only facilitator can reset round").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Only facilitator can reset round"), to=sid)
             return
 
         # Reset round
-        room = room_service.reset_round(room_code)
+        room = await room_service.reset_round(room_code)
         if not room:
-            await sio.emit('error', ErrorData(message="Failed to reset round").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Failed to reset round"), to=sid)
             return
 
         # Broadcast reset
-        await sio.emit('round_reset', RoundResetData(round=room.current_round).model_dump(), room=room_code)
+        await _broadcast('round_reset', RoundResetData(
+            round=room.current_round,
+            version=room.version
+        ), room_code)
 
-        logger.info(f"Round reset in room {room_code} (now round {room.current_round})")
+        logger.info("Round reset in room %s (now round %d)", room_code, room.current_round,
+                    extra={"room_code": room_code, "round": room.current_round})
 
     except Exception as e:
-        logger.error(f"Error in reset_round: {e}")
-        await sio.emit('error', ErrorData(message=str(e)).model_dump(), to=sid)
+        logger.error("Error in reset_round: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
 
 
 @sio.event
+@rate_limited
+@instrumented
 async def kick_user(sid, data):
     """Handle kicking a user from the room (facilitator only)"""
     try:
         kick_data = KickUserData(**data)
-        session = sessions.get(sid, {})
+        session = await session_store.get(sid)
         room_code = session.get('room_code')
         kicker_id = session.get('user_id')
 
         if not room_code or not kicker_id:
-            await sio.emit('error', ErrorData(message="Not in a room").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
             return
 
         # Check if user is facilitator
-        room = room_service.get_room(room_code)
+        room = await room_service.get_room(room_code)
         if not room or kicker_id not in room.users or not room.users[kicker_id].is_facilitator:
-            await sio.emit('error', ErrorData(message="Only facilitator can remove users").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="Only facilitator can remove users"), to=sid)
             return
 
         # Can't kick yourself
         if kick_data.user_id == kicker_id:
-            await sio.emit('error', ErrorData(message="You cannot remove yourself").model_dump(), to=sid)
+            await sio.emit('error', ErrorData(message="You cannot remove yourself"), to=sid)
             return
 
-        # Check if user exists in room
+        # Check if user exists in room. One who just joined through another
+        # node can be missing from our cached copy until its invalidation
+        # arrives, so check the stored room before giving up.
         if kick_data.user_id not in room.users:
-            await sio.emit('error', ErrorData(message="User not found in room").model_dump(), to=sid)
+            room = await room_service.get_room(room_code, use_cache=False)
+        if not room or kick_data.user_id not in room.users:
+            await sio.emit('error', ErrorData(message="User not found in room"), to=sid)
             return
 
-        # Find the socket_id of the user to kick
-        kicked_socket_id = None
-        for socket_id, sess_data in sessions.items():
-            if sess_data.get('user_id') == kick_data.user_id and sess_data.get('room_code') == room_code:
-                kicked_socket_id = socket_id
-                break
+        # Detach every socket (tab) of the user to kick
+        kicked_socket_ids = await session_store.evict_user(room_code, kick_data.user_id)
 
         # Remove user from room
-        room = room_service.remove_user(room_code, kick_data.user_id)
+        presence.cancel(room_code, kick_data.user_id)
+        room = await room_service.remove_user(room_code, kick_data.user_id)
 
         # Notify the kicked user
-        if kicked_socket_id:
+        for kicked_socket_id in kicked_socket_ids:
             await sio.emit('user_kicked', UserKickedData(
                 user_id=kick_data.user_id,
                 kicked_by=kicker_id
-            ).model_dump(), to=kicked_socket_id)
+            ), to=kicked_socket_id)
 
             # Leave Socket.IO room
             await sio.leave_room(kicked_socket_id, room_code)
 
-            # Clear session
-            if kicked_socket_id in sessions:
-                sessions[kicked_socket_id] = {}
-
         # Broadcast to room that user was removed
         if room:
-            await sio.emit('user_left', {'user_id': kick_data.user_id}, room=room_code)
-            # Send updated room state
-            await sio.emit('room_state', room.model_dump(), room=room_code)
+            await _broadcast('user_left', _user_left(room, kick_data.user_id), room_code)
+
+        logger.info("User %s was kicked from room %s by %s", kick_data.user_id, room_code, kicker_id,
+                    extra={"room_code": room_code, "user_id": kick_data.user_id})
+
+    except Exception as e:
+        logger.error("Error in kick_user: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
+
+
+@sio.event
+@rate_limited
+@instrumented
+async def request_sync(sid):
+    """Send the full room state to a client that detected a version gap"""
+    try:
+        session = await session_store.get(sid)
+        room_code = session.get('room_code')
+
+        if not room_code:
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
+            return
+
+        # Bypass the cache: the client has already seen a newer version than it may hold
+        room = await room_service.get_room(room_code, use_cache=False)
+        if room:
+            await sio.emit('room_state', payload(room), to=sid)
+
+    except Exception as e:
+        logger.error("Error in request_sync: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
+
+
+@sio.event
+@rate_limited
+@instrumented
+async def get_vote_history(sid, data=None):
+    """Send a page of the room's revealed rounds, newest first"""
+    try:
+        history_request = VoteHistoryRequest(**(data or {}))
+        session = await session_store.get(sid)
+        room_code = session.get('room_code')
+
+        if not room_code:
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
+            return
+
+        page = await room_service.get_vote_history(room_code, history_request.offset, history_request.limit)
+        if page is None:
+            await sio.emit('error', ErrorData(message="Failed to load vote history"), to=sid)
+            return
+
+        await sio.emit('vote_history', payload(page), to=sid)
+
+    except Exception as e:
+        logger.error("Error in get_vote_history: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
+
+
+@sio.event
+@rate_limited
+@instrumented
+async def get_room_stats(sid):
+    """Send running statistics across every revealed round of the room"""
+    try:
+        session = await session_store.get(sid)
+        room_code = session.get('room_code')
+
+        if not room_code:
+            await sio.emit('error', ErrorData(message="Not in a room"), to=sid)
+            return
 
-        logger.info(f"User {kick_data.user_id} was kicked from room {room_code} by {kicker_id}")
+        room_stats = await room_service.get_room_stats(room_code)
+        await sio.emit('room_stats', payload(room_stats), to=sid)
 
     except Exception as e:
-        logger.error(f"Error in kick_user: {e}")
-        await sio.emit('error', ErrorData(message=str(e)).model_dump(), to=sid)
+        logger.error("Error in get_room_stats: %s", e)
+        await sio.emit('error', ErrorData(message=str(e)), to=sid)
@@ -1,12 +1,34 @@
 import socketio
 import logging
 from app.config import settings
+from app.utils.serializer import SocketIOJSON
 
 logger = logging.getLogger(__name__)
 
+# In multi-node mode, broadcasts and room membership changes are relayed to
+# every node through Redis pub/sub
+client_manager = None
+if settings.workers > 1 and not settings.multi_node:
+    raise ValueError("WORKERS > 1 needs MULTI_NODE=true, so a room split across workers still gets every broadcast")
+if settings.multi_node:
+    client_manager = socketio.AsyncRedisManager(
+        settings.redis_connection_url,
+        channel=settings.socketio_channel
+    )
+
+# Engine.IO long-polling sends each request of a session on its own HTTP
+# request. The supervisor routes whole TCP connections, so with several
+# workers those requests could reach a worker that does not hold the session;
+# only WebSocket, one connection per session, is offered then
+TRANSPORTS = ['websocket'] if settings.workers > 1 else ['polling', 'websocket']
+
 # Create Socket.IO server with CORS
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=client_manager,
+    transports=TRANSPORTS,
+    serializer='msgpack' if settings.socketio_serializer == "msgpack" else 'default',
+    json=SocketIOJSON,
     cors_allowed_origins=settings.cors_origins_list,
     logger=settings.environment == "development",
     engineio_logger=settings.environment == "development"
@@ -18,4 +40,4 @@ socket_app = socketio.ASGIApp(
     socketio_path='socket.io'
 )
 
-logger.info("Socket.IO server initialized")
+logger.info("Socket.IO server initialized (%s)", 'multi-node' if settings.multi_node else 'single-node')
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from app.config import settings
+from app.services.room_service import room_service
+from app.utils.metrics import metrics, Counter
+from app.websocket.manager import sio
+from app.websocket.schemas import UserDisconnectedData, UsersDisconnectedData
+from app.websocket.sessions import session_store
+from app.websocket.vote_batcher import vote_batcher
+
+logger = logging.getLogger(__name__)
+
+presence_updates = metrics.register(Counter(
+    "presence_updates_total", "Disconnects deferred, cancelled by a rejoin and written", ("action",)
+))
+
+
+class PresenceTracker:
+    """
+    Defers marking users offline for a grace period after their last socket
+    disconnects.
+
+    A user who rejoins within the grace period (a page reload, a flaky
+    mobile connection) cancels the pending change, so neither the offline
+    write nor the user_disconnected broadcast happens. Expired grace periods
+    are flushed every flush_interval seconds, one write and one broadcast
+    per room however many users went offline in it.
+
+    Pending changes live on the node that saw the disconnect. Before
+    flushing, users who have a socket again (possibly on another node) are
+    skipped.
+    """
+
+    def __init__(self, grace_period: float, flush_interval: float):
+        self.grace_period = grace_period
+        self.flush_interval = flush_interval
+        # room_code -> {user_id: deadline}
+        self._pending: Dict[str, Dict[str, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def user_disconnected(self, room_code: str, user_id: str) -> None:
+        """The user's last socket in the room has gone"""
+        if self.grace_period <= 0:
+            await self._flush_room(room_code, [user_id], check_sockets=False)
+            return
+        self._pending.setdefault(room_code, {})[user_id] = time.monotonic() + self.grace_period
+        presence_updates.inc("deferred")
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self, room_code: str, user_id: str) -> bool:
+        """Drop a pending disconnect; returns True if there was one"""
+        room = self._pending.get(room_code)
+        if not room or room.pop(user_id, None) is None:
+            return False
+        if not room:
+            del self._pending[room_code]
+        presence_updates.inc("cancelled")
+        return True
+
+    def forget_room(self, room_code: str) -> None:
+        """Drop pending disconnects for a room that no longer exists"""
+        self._pending.pop(room_code, None)
+
+    async def flush_all(self) -> None:
+        """Write every pending disconnect now, e.g. on shutdown"""
+        if self._task:
+            self._task.cancel()
+        pending, self._pending = self._pending, {}
+        for room_code, users in pending.items():
+            await self._flush_room(room_code, list(users))
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # Take every expired entry before awaiting anything: cancel() and
+                # forget_room() can change _pending while a room is being flushed
+                now = time.monotonic()
+                due: Dict[str, List[str]] = {}
+                for room_code, users in list(self._pending.items()):
+                    expired = [user_id for user_id, deadline in users.items() if deadline <= now]
+                    for user_id in expired:
+                        del users[user_id]
+                    if not users:
+                        del self._pending[room_code]
+                    if expired:
+                        due[room_code] = expired
+                for room_code, expired in due.items():
+                    try:
+                        await self._flush_room(room_code, expired)
+                    except Exception as e:
+                        logger.error("Error flushing presence for room %s: %s", room_code, e)
+            except Exception as e:
+                logger.error("Error flushing presence: %s", e)
+
+    @staticmethod
+    async def _flush_room(room_code: str, user_ids: List[str], check_sockets: bool = True) -> None:
+        if check_sockets:
+            user_ids = [user_id for user_id in user_ids if not await session_store.find_sids(room_code, user_id)]
+            if not user_ids:
+                return
+        result = await room_service.mark_users_offline(room_code, user_ids)
+        if not result:
+            return
+        version, changed = result
+        presence_updates.inc("written", amount=len(changed))
+
+        # Pending votes first, so clients get deltas in version order
+        await vote_batcher.flush(room_code)
+        if len(changed) == 1:
+            await sio.emit('user_disconnected', UserDisconnectedData(
+                user_id=changed[0],
+                version=version
+            ), room=room_code)
+        else:
+            await sio.emit('users_disconnected', UsersDisconnectedData(
+                user_ids=changed,
+                version=version
+            ), room=room_code)
+
+
+presence = PresenceTracker(settings.disconnect_grace_period, settings.presence_flush_interval)
@@ -0,0 +1,209 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.redis_service import redis_service
+from app.utils.metrics import metrics, Counter
+from app.websocket.manager import sio
+from app.websocket.schemas import ErrorData
+from app.websocket.sessions import session_store
+
+logger = logging.getLogger(__name__)
+
+# Events where only the latest call matters, by the slot they share: a
+# throttled vote is held back and replaced by newer ones instead of being
+# dropped, and so are a request_sync, which a client would otherwise wait
+# on, and a join_room, which a client only sends once per (re)connect
+COALESCED_EVENTS = {
+    "submit_vote": "vote", "clear_vote": "vote", "request_sync": "request_sync", "join_room": "join_room"
+}
+
+# Seconds between rate_limited errors sent to one socket
+ERROR_INTERVAL = 1.0
+
+# Buckets tracked before idle (and therefore full) ones are pruned
+MAX_BUCKETS = 10000
+
+rate_limited_events = metrics.register(Counter(
+    "socketio_events_rate_limited_total", "Socket.IO events throttled by the rate limiter", ("event", "action")
+))
+
+
+class TokenBuckets:
+    """
+    Token buckets held in this process, one per key.
+
+    Each bucket holds up to burst tokens and refills at rate tokens per
+    second; an event takes one token. A bucket left idle long enough to
+    refill is indistinguishable from a new one, so such buckets are dropped
+    whenever more than MAX_BUCKETS are tracked.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        # key -> [tokens, last refill]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """Take a token; returns 0 if one was available, else seconds until there is one"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._prune(now)
+            bucket = self._buckets[key] = [self.burst, now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def forget(self, key: str) -> None:
+        self._buckets.pop(key, None)
+
+    def _prune(self, now: float) -> None:
+        refill_time = self.burst / self.rate
+        for key in [key for key, (_, last) in self._buckets.items() if now - last >= refill_time]:
+            del self._buckets[key]
+
+
+# KEYS[1] is ratelimit:room:{code}; ARGV: rate, burst, now (ms)
+# Returns 0 if a token was taken, else milliseconds until one is available
+_TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local last = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimiter:
+    """
+    Per-socket and per-room token buckets.
+
+    Socket buckets always live in this process, since a socket is only
+    ever handled by the node it is connected to. Room buckets are local
+    too, unless rate_limit_shared is set: then they are kept in Redis so
+    the room limit holds across every node, at the cost of one round-trip
+    per event. If Redis fails, the room check lets the event through.
+    """
+
+    def __init__(self):
+        self.sockets = TokenBuckets(settings.rate_limit_socket_rate, settings.rate_limit_socket_burst)
+        self.rooms = TokenBuckets(settings.rate_limit_room_rate, settings.rate_limit_room_burst)
+        self._take_token = None
+        if settings.rate_limit_shared:
+            self._take_token = redis_service.client.register_script(_TAKE_TOKEN)
+        # sid -> slot -> (handler, args) of the latest held-back event
+        self._pending: Dict[str, Dict[str, Tuple]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        # sid -> when the last rate_limited error was sent
+        self._last_error: Dict[str, float] = {}
+
+    async def acquire(self, sid: str, room_code: Optional[str]) -> float:
+        """Take a token from the socket's and the room's bucket; returns seconds to wait, or 0"""
+        wait = self.sockets.acquire(sid)
+        if wait or not room_code:
+            return wait
+        if self._take_token is None:
+            return self.rooms.acquire(room_code)
+        try:
+            wait_ms = await self._take_token(
+                keys=[f"ratelimit:room:{room_code}"],
+                args=[settings.rate_limit_room_rate, settings.rate_limit_room_burst, int(time.time() * 1000)]
+            )
+            return int(wait_ms) / 1000
+        except Exception as e:
+            logger.error("Error checking room rate limit for %s: %s", room_code, e)
+            return 0.0
+
+    def hold(self, sid: str, slot: str, handler, args: tuple, wait: float) -> None:
+        """Keep only the latest throttled event per slot and replay it once a token is free"""
+        self._pending.setdefault(sid, {})[slot] = (handler, args)
+        if sid not in self._timers:
+            self._timers[sid] = asyncio.create_task(self._replay(sid, wait))
+
+    async def _replay(self, sid: str, wait: float) -> None:
+        await asyncio.sleep(wait)
+        self._timers.pop(sid, None)
+        for handler, args in self._pending.pop(sid, {}).values():
+            await handler(sid, *args)
+
+    async def reject(self, sid: str) -> None:
+        """Tell the client it is being throttled, at most once per ERROR_INTERVAL"""
+        now = time.monotonic()
+        if now - self._last_error.get(sid, 0.0) < ERROR_INTERVAL:
+            return
+        self._last_error[sid] = now
+        await sio.emit('error', ErrorData(
+            message="Too many requests, please slow down",
+            code="rate_limited"
+        ), to=sid)
+
+    def forget(self, sid: str) -> None:
+        """Drop a disconnected socket's bucket and any held-back events"""
+        self.sockets.forget(sid)
+        self._pending.pop(sid, None)
+        self._last_error.pop(sid, None)
+        timer = self._timers.pop(sid, None)
+        if timer:
+            timer.cancel()
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limited(handler):
+    """
+    Apply the socket and room rate limits to a Socket.IO handler.
+
+    Excess submit_vote/clear_vote, request_sync and join_room calls are
+    coalesced: the latest one is replayed when the socket has a token again.
+    Other excess events are dropped. Either way the client gets a
+    rate_limited error.
+
+    Apply it outside @instrumented, so an event replayed later is measured
+    like any other and a throttled one is only counted as rate limited.
+    """
+    if not settings.rate_limit_enabled:
+        return handler
+
+    event = handler.__name__
+    slot = COALESCED_EVENTS.get(event)
+
+    @functools.wraps(handler)
+    async def wrapper(sid, *args):
+        if event == "join_room":
+            data = args[0] if args else None
+            room_code = str(data.get("room_code", "")).upper() if isinstance(data, dict) else None
+        else:
+            room_code = (await session_store.get(sid)).get('room_code')
+
+        wait = await rate_limiter.acquire(sid, room_code)
+        if not wait:
+            return await handler(sid, *args)
+
+        if slot:
+            rate_limiter.hold(sid, slot, wrapper, args, wait)
+        rate_limited_events.inc(event, "coalesced" if slot else "dropped")
+        logger.debug("Rate limited %s from %s", event, sid, extra={"room_code": room_code})
+        await rate_limiter.reject(sid)
+
+    return wrapper
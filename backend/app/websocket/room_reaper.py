@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from app.config import settings
+from app.services.room_service import room_service
+from app.websocket.manager import sio
+from app.websocket.presence import presence
+from app.websocket.rate_limit import rate_limiter
+from app.websocket.schemas import ErrorData
+from app.websocket.sessions import session_store
+from app.websocket.vote_batcher import vote_batcher
+
+logger = logging.getLogger(__name__)
+
+
+async def close_expired_room(room_code: str) -> None:
+    """Tell a reaped room's sockets it is gone and drop every trace of it in this process"""
+    await sio.emit('error', ErrorData(message="This room has expired", code="room_expired"), room=room_code)
+    await sio.close_room(room_code)
+    await session_store.forget_room(room_code)
+    presence.forget_room(room_code)
+    vote_batcher.discard(room_code)
+    rate_limiter.rooms.forget(room_code)
+
+
+async def maintain_rooms() -> None:
+    """
+    Background task run every room_reap_interval seconds.
+
+    Rooms with a socket on this node get a (throttled) TTL touch, so
+    connected users who are idle do not lose their room. Rooms that
+    expired anyway are found through rooms:active rather than KEYS and
+    closed. With several nodes each one runs this loop; a room is reaped
+    once and the Socket.IO room is closed on every node through the
+    message queue.
+    """
+    while True:
+        await asyncio.sleep(settings.room_reap_interval)
+        try:
+            for room_code in session_store.local_rooms():
+                if await room_service.touch_room(room_code):
+                    await session_store.touch_room(room_code)
+            for room_code in await room_service.reap_expired_rooms():
+                await close_expired_room(room_code)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error maintaining rooms: %s", e)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import zlib
+from typing import List, Optional
+from app.config import settings
+from app.services.room_service import room_service
+from app.services.room_store import room_store
+from app.utils import serializer
+from app.websocket.manager import sio
+from app.websocket.schemas import ServerRestartingData
+from app.websocket.sessions import session_store
+
+logger = logging.getLogger(__name__)
+
+# Snapshot files start with this line, followed by zlib-compressed JSON
+SNAPSHOT_HEADER = b"PPSNAP1\n"
+
+# Seconds given to server_restarting messages to reach clients before their sockets are closed
+RESTART_NOTICE_TIME = 0.5
+
+# Rooms with a socket here at the last periodic snapshot. Sockets are closed
+# before the shutdown hook runs, so the final snapshot reuses this list.
+_hot_rooms: List[str] = []
+
+
+def snapshot_file() -> str:
+    """This process's snapshot file; with several workers each has its own, as rooms hash to the same worker"""
+    if settings.workers > 1:
+        return f"{settings.snapshot_path}.{settings.worker_index}"
+    return settings.snapshot_path
+
+
+def _write(path: str, snapshot: dict) -> int:
+    """Encode and write a snapshot, replacing the old file atomically; returns its size"""
+    data = SNAPSHOT_HEADER + zlib.compress(serializer.dumps(snapshot).encode(), 6)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def _read(path: str) -> Optional[dict]:
+    """Read and decode a snapshot file; None if there is none"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if not data.startswith(SNAPSHOT_HEADER):
+        raise ValueError("not a room snapshot")
+    return serializer.loads(zlib.decompress(data[len(SNAPSHOT_HEADER):]))
+
+
+async def save_snapshot() -> bool:
+    """
+    Write the rooms with connected users, and with the memory store every
+    room, to the snapshot file.
+
+    The rooms are read in one go on the event loop, so the snapshot is
+    consistent; encoding and writing happen in a thread.
+    """
+    local_rooms = session_store.local_rooms()
+    if local_rooms:
+        _hot_rooms[:] = local_rooms
+    path = snapshot_file()
+    snapshot = {"taken_at": time.time(), "hot_rooms": list(_hot_rooms), "rooms": room_store.dump_rooms()}
+    try:
+        size = await asyncio.to_thread(_write, path, snapshot)
+    except Exception as e:
+        logger.error("Error writing room snapshot to %s: %s", path, e)
+        return False
+    logger.debug("Wrote room snapshot of %d bytes, %d hot rooms", size, len(_hot_rooms))
+    return True
+
+
+async def warm_start() -> int:
+    """
+    Restore the last snapshot before the server takes connections.
+
+    With the memory store its rooms are restored first. The rooms that had
+    connected users are then preloaded into the room cache, so the wave of
+    clients reconnecting after a restart is served from memory instead of
+    each one loading its room.
+
+    Returns:
+        How many rooms were preloaded
+    """
+    path = snapshot_file()
+    try:
+        snapshot = await asyncio.to_thread(_read, path)
+    except Exception as e:
+        logger.error("Error reading room snapshot %s: %s", path, e)
+        return 0
+    if not snapshot:
+        logger.info("No room snapshot at %s, starting cold", path)
+        return 0
+
+    if snapshot["rooms"] is not None:
+        restored = room_store.restore_rooms(snapshot["rooms"])
+        logger.info("Restored %d rooms from %s", restored, path)
+
+    _hot_rooms[:] = snapshot["hot_rooms"]
+    limit = min(settings.warm_start_rooms, settings.room_cache_size)
+    preloaded = await room_service.preload_rooms(_hot_rooms[:limit])
+    logger.info("Preloaded %d of %d active rooms from a snapshot taken %.0fs ago",
+                preloaded, len(_hot_rooms), time.time() - snapshot["taken_at"])
+    return preloaded
+
+
+async def maintain_snapshots() -> None:
+    """Background task writing a snapshot every snapshot_interval seconds"""
+    while True:
+        await asyncio.sleep(settings.snapshot_interval)
+        try:
+            await save_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error taking room snapshot: %s", e)
+
+
+async def announce_restart() -> int:
+    """
+    Tell every socket on this process that the server is going down, each
+    with its own random delay of 1..reconnect_stagger seconds, so the
+    clients come back spread out instead of all at once. Sent only on
+    shutdown: ordinary reconnects keep the client's default delay.
+
+    Returns:
+        How many sockets were told
+    """
+    sids = session_store.local_sids()
+    stagger = max(settings.reconnect_stagger, 1.0)
+    for sid in sids:
+        # Local sockets only, so there is no need to go through Redis with MULTI_NODE
+        await sio.emit('server_restarting', ServerRestartingData(
+            reconnect_after=int(random.uniform(1.0, stagger) * 1000)
+        ), to=sid, ignore_queue=True)
+    if sids:
+        await asyncio.sleep(RESTART_NOTICE_TIME)
+    logger.info("Told %d sockets to reconnect within %.0fs", len(sids), stagger)
+    return len(sids)
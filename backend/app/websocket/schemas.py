@@ -1,49 +1,119 @@
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List, TypedDict, NotRequired
+
+# Incoming event data is validated with pydantic models; it comes from clients.
 
 
 class JoinRoomData(BaseModel):
     room_code: str
     user_name: str
     user_id: Optional[str] = None
+    # Room version the client last saw, when reconnecting with its state intact
+    last_version: Optional[int] = Field(None, ge=0)
 
 
 class SubmitVoteData(BaseModel):
     vote: str
 
 
-class ErrorData(BaseModel):
+class VoteHistoryRequest(BaseModel):
+    offset: int = Field(0, ge=0)
+    limit: int = Field(20, ge=1, le=50)
+
+
+class KickUserData(BaseModel):
+    user_id: str
+
+
+# Outgoing event data is built by the server from trusted values, so it is
+# described with TypedDicts: plain dicts that skip validation entirely.
+
+class ErrorData(TypedDict):
     message: str
-    code: Optional[str] = None
+    code: NotRequired[str]
+
 
+class ConnectSuccessData(TypedDict):
+    # Connections are routed to workers by their room query parameter (see app.supervisor)
+    room_routing: bool
 
-class RoomJoinedData(BaseModel):
+
+class ServerRestartingData(TypedDict):
+    reconnect_after: int  # Milliseconds to wait before reconnecting
+
+
+class RoomJoinedData(TypedDict):
     room_code: str
     user_id: str
     is_facilitator: bool
 
 
-class UserData(BaseModel):
+class UserData(TypedDict):
     user_id: str
     user_name: str
 
 
-class VoteSubmittedData(BaseModel):
+# Delta events carry the room version produced by the mutation; a client
+# that sees a version other than its own + 1 sends request_sync.
+
+class UserJoinedData(TypedDict):
+    user: dict  # User.model_dump()
+    version: int
+
+
+class UserUpdatedData(TypedDict):
+    user: dict  # User.model_dump()
+    version: int
+
+
+class UserLeftData(TypedDict):
     user_id: str
+    version: int
+    facilitator_id: Optional[str]
 
 
-class VotesRevealedData(BaseModel):
-    votes: Dict[str, str]
+class UserDisconnectedData(TypedDict):
+    user_id: str
+    version: int
 
 
-class RoundResetData(BaseModel):
-    round: int
+class UsersDisconnectedData(TypedDict):
+    user_ids: List[str]  # Marked offline together, by one change
+    version: int
 
 
-class KickUserData(BaseModel):
+class VoteSubmittedData(TypedDict):
+    user_id: str
+    version: int
+
+
+class VoteClearedData(TypedDict):
+    user_id: str
+    version: int
+
+
+class VoteBatchEntry(TypedDict):
     user_id: str
+    voted: bool  # False for a cleared vote
+    version: int
+
+
+class VotesBatchedData(TypedDict):
+    votes: List[VoteBatchEntry]  # In version order
+
+
+class VotesRevealedData(TypedDict):
+    votes: Dict[str, str]
+    stats: dict  # VoteStats.model_dump()
+    room_stats: Optional[dict]  # RoomStats.model_dump() when this reveal added a round to the totals
+    version: int
+
+
+class RoundResetData(TypedDict):
+    round: int
+    version: int
 
 
-class UserKickedData(BaseModel):
+class UserKickedData(TypedDict):
     user_id: str
     kicked_by: str
@@ -0,0 +1,312 @@
+import logging
+from typing import Dict, List, Set, Tuple
+from app.services.redis_service import redis_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSessionStore:
+    """
+    Socket sessions (sid -> {room_code, user_id}) held in this process.
+
+    Reverse indexes from (room_code, user_id) and room_code to sids are kept
+    in step with the sessions, so presence lookups never scan every socket.
+    A user with several tabs open has one sid per tab.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, str]] = {}
+        self._user_sids: Dict[Tuple[str, str], Set[str]] = {}
+        self._room_sids: Dict[str, Set[str]] = {}
+
+    def _unindex(self, sid: str) -> int:
+        """Drop a sid from the indexes; returns how many sockets its user still has in the room"""
+        session = self._sessions.get(sid)
+        if not session:
+            return 0
+        room_code, user_id = session['room_code'], session['user_id']
+        remaining = 0
+        user_sids = self._user_sids.get((room_code, user_id))
+        if user_sids is not None:
+            user_sids.discard(sid)
+            remaining = len(user_sids)
+            if not user_sids:
+                del self._user_sids[(room_code, user_id)]
+        room_sids = self._room_sids.get(room_code)
+        if room_sids is not None:
+            room_sids.discard(sid)
+            if not room_sids:
+                del self._room_sids[room_code]
+        return remaining
+
+    async def get(self, sid: str) -> Dict[str, str]:
+        """Session data for a socket, empty if it is not in a room"""
+        return self._sessions.get(sid, {})
+
+    async def open(self, sid: str) -> None:
+        """Register a newly connected socket"""
+        self._sessions[sid] = {}
+
+    async def join(self, sid: str, room_code: str, user_id: str) -> None:
+        """Record that a socket joined a room as a user"""
+        self._unindex(sid)
+        self._sessions[sid] = {'room_code': room_code, 'user_id': user_id}
+        self._user_sids.setdefault((room_code, user_id), set()).add(sid)
+        self._room_sids.setdefault(room_code, set()).add(sid)
+
+    async def leave(self, sid: str) -> int:
+        """
+        Record that a socket left its room but is still connected.
+
+        Returns:
+            How many sockets the user still has in the room
+        """
+        remaining = self._unindex(sid)
+        if sid in self._sessions:
+            self._sessions[sid] = {}
+        return remaining
+
+    async def close(self, sid: str) -> int:
+        """
+        Forget a disconnected socket.
+
+        Returns:
+            How many sockets the user still has in the room
+        """
+        remaining = self._unindex(sid)
+        self._sessions.pop(sid, None)
+        return remaining
+
+    async def evict_user(self, room_code: str, user_id: str) -> Set[str]:
+        """Detach every socket of a user from a room; returns their sids"""
+        sids = self._user_sids.get((room_code, user_id), set()).copy()
+        for sid in sids:
+            await self.leave(sid)
+        return sids
+
+    async def find_sids(self, room_code: str, user_id: str) -> Set[str]:
+        """All sockets joined to a room as the given user"""
+        return set(self._user_sids.get((room_code, user_id), ()))
+
+    async def room_sids(self, room_code: str) -> Set[str]:
+        """All sockets joined to a room"""
+        return set(self._room_sids.get(room_code, ()))
+
+    async def touch_room(self, room_code: str) -> None:
+        """Refresh the TTL of a room's session keys (nothing to do in-process)"""
+
+    async def forget_room(self, room_code: str) -> Set[str]:
+        """Detach this process's sockets from a room that no longer exists; returns their sids"""
+        sids = await self.room_sids(room_code)
+        for sid in sids:
+            await self.leave(sid)
+        return sids
+
+    def local_rooms(self) -> Set[str]:
+        """Rooms with at least one socket on this process"""
+        return set(self._room_sids)
+
+    def local_sids(self) -> List[str]:
+        """Sockets connected to this process"""
+        return list(self._sessions)
+
+    def socket_count(self) -> int:
+        """Sockets connected to this process"""
+        return len(self._sessions)
+
+    def room_count(self) -> int:
+        """Rooms with at least one socket on this process"""
+        return len(self._room_sids)
+
+
+# Redis session scripts. KEYS[1] is session:{sid}; the room index keys are
+# derived from the session so each operation is one round-trip. They cannot
+# be declared in KEYS, as they are only known once the session is read, so
+# like the room store this needs a single Redis rather than Redis Cluster.
+_SESSION_PRELUDE = """
+local function unindex(sid, raw)
+    if not raw then
+        return nil
+    end
+    local session = cjson.decode(raw)
+    local base = 'room:' .. session['room_code']
+    local user_sockets = base .. ':user:' .. session['user_id'] .. ':sockets'
+    redis.call('HDEL', base .. ':sockets', sid)
+    redis.call('SREM', user_sockets, sid)
+    return redis.call('SCARD', user_sockets)
+end
+"""
+
+# ARGV: sid, room_code, user_id, ttl
+_JOIN_SESSION = _SESSION_PRELUDE + """
+unindex(ARGV[1], redis.call('GET', KEYS[1]))
+local base = 'room:' .. ARGV[2]
+local user_sockets = base .. ':user:' .. ARGV[3] .. ':sockets'
+redis.call('SET', KEYS[1], cjson.encode({room_code = ARGV[2], user_id = ARGV[3]}), 'EX', ARGV[4])
+redis.call('HSET', base .. ':sockets', ARGV[1], ARGV[3])
+redis.call('SADD', user_sockets, ARGV[1])
+redis.call('EXPIRE', base .. ':sockets', ARGV[4])
+redis.call('EXPIRE', user_sockets, ARGV[4])
+return 1
+"""
+
+# ARGV: sid
+# Returns how many sockets the session's user still has in the room
+_LEAVE_SESSION = _SESSION_PRELUDE + """
+local remaining = unindex(ARGV[1], redis.call('GET', KEYS[1]))
+redis.call('DEL', KEYS[1])
+return remaining or 0
+"""
+
+# KEYS[1] is room:{code}:user:{user_id}:sockets; ARGV: room_code
+# Drops every session of the user in the room and returns their sids
+_EVICT_USER = """
+local sids = redis.call('SMEMBERS', KEYS[1])
+for _, sid in ipairs(sids) do
+    redis.call('DEL', 'session:' .. sid)
+    redis.call('HDEL', 'room:' .. ARGV[1] .. ':sockets', sid)
+end
+redis.call('DEL', KEYS[1])
+return sids
+"""
+
+# KEYS[1] is room:{code}:sockets; ARGV: room_code, ttl
+# Refreshes the TTL of the room's socket index and of every session in it
+_TOUCH_ROOM = """
+local entries = redis.call('HGETALL', KEYS[1])
+if #entries == 0 then
+    return 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+for i = 1, #entries, 2 do
+    redis.call('EXPIRE', 'session:' .. entries[i], ARGV[2])
+    redis.call('EXPIRE', 'room:' .. ARGV[1] .. ':user:' .. entries[i + 1] .. ':sockets', ARGV[2])
+end
+return 1
+"""
+
+
+class RedisSessionStore:
+    """
+    Socket sessions shared by every node through Redis.
+
+    session:{sid} holds the session JSON, room:{code}:sockets maps the sids
+    in a room to their user ids and room:{code}:user:{user_id}:sockets holds
+    one user's sids, so any node can find and kick a socket connected to
+    another node without scanning.
+
+    Handlers only ever read sessions of sockets connected to this node, so
+    reads are served from a local mirror and cost no round-trip. A socket
+    kicked from another node keeps a stale mirror entry until it rejoins,
+    which is harmless: the room scripts reject writes for removed users.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, Dict[str, str]] = {}
+        client = redis_service.client
+        self._join = client.register_script(_JOIN_SESSION)
+        self._leave = client.register_script(_LEAVE_SESSION)
+        self._evict_user = client.register_script(_EVICT_USER)
+        self._touch_room = client.register_script(_TOUCH_ROOM)
+
+    @staticmethod
+    def _session_key(sid: str) -> str:
+        return f"session:{sid}"
+
+    @staticmethod
+    def _sockets_key(room_code: str) -> str:
+        return f"room:{room_code}:sockets"
+
+    @staticmethod
+    def _user_sockets_key(room_code: str, user_id: str) -> str:
+        return f"room:{room_code}:user:{user_id}:sockets"
+
+    async def get(self, sid: str) -> Dict[str, str]:
+        if sid in self._local:
+            return self._local[sid]
+        return await redis_service.get(self._session_key(sid)) or {}
+
+    async def open(self, sid: str) -> None:
+        # Nothing is stored in Redis until the socket joins a room
+        self._local[sid] = {}
+
+    async def join(self, sid: str, room_code: str, user_id: str) -> None:
+        self._local[sid] = {'room_code': room_code, 'user_id': user_id}
+        try:
+            await self._join(keys=[self._session_key(sid)], args=[sid, room_code, user_id, settings.room_ttl])
+        except Exception as e:
+            logger.error("Error saving session %s: %s", sid, e)
+
+    async def leave(self, sid: str) -> int:
+        if sid in self._local:
+            self._local[sid] = {}
+        try:
+            return await self._leave(keys=[self._session_key(sid)], args=[sid])
+        except Exception as e:
+            logger.error("Error clearing session %s: %s", sid, e)
+            return 0
+
+    async def close(self, sid: str) -> int:
+        self._local.pop(sid, None)
+        try:
+            return await self._leave(keys=[self._session_key(sid)], args=[sid])
+        except Exception as e:
+            logger.error("Error clearing session %s: %s", sid, e)
+            return 0
+
+    async def evict_user(self, room_code: str, user_id: str) -> Set[str]:
+        try:
+            sids = set(await self._evict_user(keys=[self._user_sockets_key(room_code, user_id)], args=[room_code]))
+        except Exception as e:
+            logger.error("Error evicting %s from room %s: %s", user_id, room_code, e)
+            return set()
+        for sid in sids & self._local.keys():
+            self._local[sid] = {}
+        return sids
+
+    async def find_sids(self, room_code: str, user_id: str) -> Set[str]:
+        try:
+            return await redis_service.client.smembers(self._user_sockets_key(room_code, user_id))
+        except Exception as e:
+            logger.error("Error looking up sockets for %s in room %s: %s", user_id, room_code, e)
+            return set()
+
+    async def room_sids(self, room_code: str) -> Set[str]:
+        try:
+            return set(await redis_service.client.hkeys(self._sockets_key(room_code)))
+        except Exception as e:
+            logger.error("Error looking up sockets in room %s: %s", room_code, e)
+            return set()
+
+    async def touch_room(self, room_code: str) -> None:
+        try:
+            await self._touch_room(keys=[self._sockets_key(room_code)], args=[room_code, settings.room_ttl])
+        except Exception as e:
+            logger.error("Error refreshing sessions of room %s: %s", room_code, e)
+
+    async def forget_room(self, room_code: str) -> Set[str]:
+        # Only this node's sockets: the room's index in Redis has expired with it
+        sids = {sid for sid, session in self._local.items() if session.get('room_code') == room_code}
+        for sid in sids:
+            await self.leave(sid)
+        return sids
+
+    def local_rooms(self) -> Set[str]:
+        """Rooms with at least one socket on this node"""
+        return {session['room_code'] for session in self._local.values() if session}
+
+    def local_sids(self) -> List[str]:
+        """Sockets connected to this node"""
+        return list(self._local)
+
+    def socket_count(self) -> int:
+        """Sockets connected to this node"""
+        return len(self._local)
+
+    def room_count(self) -> int:
+        """Rooms with at least one socket on this node"""
+        return len(self.local_rooms())
+
+
+session_store = RedisSessionStore() if settings.multi_node else LocalSessionStore()
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Dict, List
+from app.config import settings
+from app.websocket.manager import sio
+from app.websocket.schemas import VoteBatchEntry, VoteClearedData, VoteSubmittedData, VotesBatchedData
+
+logger = logging.getLogger(__name__)
+
+
+class VoteBatcher:
+    """
+    Collects vote_submitted/vote_cleared notifications per room.
+
+    When everyone in a room of N votes within a second, each vote is a
+    broadcast to N sockets: N² messages. With a window set, the first vote
+    in a room starts a timer and every vote arriving before it fires goes
+    out together as one votes_batched event, so a vote is delayed by at
+    most `window` seconds. A batch reaching `max_size` is sent at once.
+
+    Votes are queued as their handlers finish, which is not always the
+    order the store applied them in, so a batch is sorted by version when
+    it is sent. A batch holding a single vote is sent as the plain event.
+    Every other broadcast to the room must call flush() first, so deltas
+    still reach clients in version order.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self._pending: Dict[str, List[VoteBatchEntry]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+
+    async def add(self, room_code: str, user_id: str, voted: bool, version: int) -> None:
+        """Queue a vote (voted=True) or cleared vote for the room"""
+        entry = VoteBatchEntry(user_id=user_id, voted=voted, version=version)
+        if self.window <= 0:
+            await self._send(room_code, [entry])
+            return
+
+        batch = self._pending.setdefault(room_code, [])
+        batch.append(entry)
+        if len(batch) >= self.max_size:
+            await self.flush(room_code)
+        elif room_code not in self._timers:
+            self._timers[room_code] = asyncio.create_task(self._flush_later(room_code))
+
+    async def flush(self, room_code: str) -> None:
+        """Send the room's pending votes now"""
+        batch = self._pending.pop(room_code, None)
+        timer = self._timers.pop(room_code, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+        if batch:
+            batch.sort(key=lambda entry: entry['version'])
+            await self._send(room_code, batch)
+
+    def discard(self, room_code: str) -> None:
+        """Drop a room's pending votes without sending them"""
+        self._pending.pop(room_code, None)
+        timer = self._timers.pop(room_code, None)
+        if timer:
+            timer.cancel()
+
+    async def _flush_later(self, room_code: str) -> None:
+        await asyncio.sleep(self.window)
+        try:
+            await self.flush(room_code)
+        except Exception as e:
+            logger.error("Error flushing votes for room %s: %s", room_code, e)
+
+    @staticmethod
+    async def _send(room_code: str, batch: List[VoteBatchEntry]) -> None:
+        if len(batch) > 1:
+            await sio.emit('votes_batched', VotesBatchedData(votes=batch), room=room_code)
+            return
+        entry = batch[0]
+        if entry['voted']:
+            await sio.emit('vote_submitted', VoteSubmittedData(
+                user_id=entry['user_id'],
+                version=entry['version']
+            ), room=room_code)
+        else:
+            await sio.emit('vote_cleared', VoteClearedData(
+                user_id=entry['user_id'],
+                version=entry['version']
+            ), room=room_code)
+
+
+vote_batcher = VoteBatcher(settings.vote_batch_window, settings.vote_batch_max_size)
@@ -0,0 +1,104 @@
+"""
+A worker process started by app.supervisor.
+
+Serves app.main:app under uvicorn, but instead of listening on a port it
+serves the connections the supervisor accepted and passed over a Unix
+socket (SCM_RIGHTS), so every connection for one room reaches this process.
+
+Usage (by the supervisor):
+    python -m app.worker CHANNEL_FD [--log-level info]
+"""
+import argparse
+import asyncio
+import logging
+import socket
+from typing import Callable, List, Optional, Set
+import uvicorn
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Connections the supervisor may pass in one message
+MAX_FDS = 16
+
+
+def server_config(app: str = "app.main:app", **kwargs) -> uvicorn.Config:
+    """uvicorn settings shared by every way the app is served"""
+    return uvicorn.Config(app, forwarded_allow_ips=settings.forwarded_allow_ips, **kwargs)
+
+
+class Server(uvicorn.Server):
+    """uvicorn's server, telling clients about the restart before it closes their sockets"""
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        # Imported here, as the app is loaded by uvicorn and not by importing this module
+        from app.websocket.room_snapshots import announce_restart
+        try:
+            await announce_restart()
+        except Exception as e:
+            logger.error("Error announcing the restart to clients: %s", e)
+        await super().shutdown(sockets=sockets)
+
+
+async def _serve_connection(protocol_factory: Callable[[], asyncio.Protocol], sock: socket.socket) -> None:
+    try:
+        await asyncio.get_running_loop().connect_accepted_socket(protocol_factory, sock)
+    except Exception as e:
+        logger.error("Error serving a connection from the supervisor: %s", e)
+        sock.close()
+
+
+async def serve(channel: socket.socket, log_level: str) -> None:
+    """Run the app and serve connections from the channel until shut down"""
+    loop = asyncio.get_running_loop()
+    server = Server(server_config(log_level=log_level))
+    # No listening sockets: the startup hooks run as usual, then connections arrive over the channel
+    serving = asyncio.create_task(server.serve(sockets=[]))
+    while not server.started:
+        if serving.done():
+            return await serving
+        await asyncio.sleep(0.05)
+
+    config = server.config
+
+    def protocol_factory() -> asyncio.Protocol:
+        # As uvicorn builds protocols for its own listeners, so connections are tracked for graceful shutdown
+        return config.http_protocol_class(config=config, server_state=server.server_state,
+                                          app_state=server.lifespan.state)
+
+    pending: Set[asyncio.Task] = set()
+
+    def receive() -> None:
+        while True:
+            try:
+                message, fds, _, _ = socket.recv_fds(channel, 1, MAX_FDS)
+            except BlockingIOError:
+                return
+            if not message:
+                logger.error("Supervisor went away, shutting down")
+                loop.remove_reader(channel.fileno())
+                server.should_exit = True
+                return
+            for fd in fds:
+                sock = socket.socket(fileno=fd)
+                sock.setblocking(False)
+                task = loop.create_task(_serve_connection(protocol_factory, sock))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+    channel.setblocking(False)
+    loop.add_reader(channel.fileno(), receive)
+    channel.send(b"ready")
+    await serving
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("channel_fd", type=int)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    asyncio.run(serve(socket.socket(fileno=args.channel_fd), args.log_level))
+
+
+if __name__ == "__main__":
+    main()
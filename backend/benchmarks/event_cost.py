@@ -0,0 +1,150 @@
+"""
+Per-event CPU cost of building models and payloads, before and after
+trusted construction.
+
+"validated" reproduces the previous code: Room/User/VoteStats built with
+full pydantic validation and outgoing events built as pydantic schema
+models and encoded with model_dump_json. "trusted" is the current code:
+app.models.trusted.construct for data read back from Redis and TypedDict
+payloads.
+
+Usage (from backend/):
+    python -m benchmarks.event_cost [--sizes 5 50 500] [--output event_cost.json]
+"""
+import argparse
+import json
+import sys
+from typing import Callable, Dict, List, Optional
+from pydantic import BaseModel
+from app.models.room import Room
+from app.models.stats import VoteStats
+from app.models.user import User
+from app.services.redis_room_store import RedisRoomStore
+from app.services.vote_stats import compute_round_stats
+from app.utils.serializer import SocketIOJSON, payload
+from app.websocket.schemas import UserJoinedData, VoteSubmittedData, VotesRevealedData
+from benchmarks.serialization import time_per_call
+
+VOTES = ("1", "2", "3", "5", "8", "13", None)
+
+
+class ValidatedVoteSubmitted(BaseModel):
+    user_id: str
+    version: int
+
+
+class ValidatedUserJoined(BaseModel):
+    user: User
+    version: int
+
+
+class ValidatedVotesRevealed(BaseModel):
+    votes: Dict[str, str]
+    stats: VoteStats
+    room_stats: Optional[dict] = None
+    version: int
+
+
+def make_snapshot(users: int) -> list:
+    """A reply shaped like the room store's Lua snapshot"""
+    room = ["room_code", "BENCH1", "created_at", "2024-01-01T00:00:00Z", "state", "voting",
+            "current_round", "3", "facilitator", "user-0000", "version", "42"]
+    entries, online, votes = [], [], []
+    for n in range(users):
+        user_id = f"user-{n:04d}"
+        entries += [user_id, json.dumps({"id": user_id, "name": f"Participant {n}",
+                                         "joined_at": f"2024-01-01T00:{n // 60 % 60:02d}:{n % 60:02d}Z"})]
+        if n % 5:
+            online.append(user_id)
+        if VOTES[n % len(VOTES)]:
+            votes += [user_id, VOTES[n % len(VOTES)]]
+    return [room, entries, online, votes]
+
+
+def validated_room(snapshot: list) -> Room:
+    """The previous RedisRoomStore._to_room, validating every field"""
+    room_fields, user_entries, online, votes = snapshot
+    room_fields = dict(zip(room_fields[::2], room_fields[1::2]))
+    votes = dict(zip(votes[::2], votes[1::2]))
+    facilitator = room_fields.get("facilitator")
+    users = []
+    for user_id, raw in zip(user_entries[::2], user_entries[1::2]):
+        data = json.loads(raw)
+        users.append(User(id=user_id, name=data["name"], connected=user_id in online,
+                          is_facilitator=user_id == facilitator, current_vote=votes.get(user_id),
+                          joined_at=data["joined_at"]))
+    users.sort(key=lambda user: user.joined_at)
+    return Room(room_code=room_fields["room_code"], created_at=room_fields["created_at"],
+                state=room_fields["state"], current_round=int(room_fields["current_round"]),
+                version=int(room_fields["version"]), users={user.id: user for user in users})
+
+
+def validated_stats(votes: Dict[str, str]) -> VoteStats:
+    """compute_round_stats, re-validated as the previous VoteStats(...) call did"""
+    return VoteStats(**compute_round_stats(votes).model_dump())
+
+
+def packet(data) -> str:
+    return SocketIOJSON.dumps(["event", data])
+
+
+def cases(users: int) -> Dict[str, Dict[str, Callable[[], object]]]:
+    snapshot = make_snapshot(users)
+    room = RedisRoomStore._to_room(snapshot)
+    user = next(iter(room.users.values()))
+    votes = {user_id: member.current_vote for user_id, member in room.users.items() if member.current_vote}
+    return {
+        "load room (snapshot -> Room)": {
+            "validated": lambda: validated_room(snapshot),
+            "trusted": lambda: RedisRoomStore._to_room(snapshot),
+        },
+        "submit_vote payload": {
+            "validated": lambda: packet(payload(ValidatedVoteSubmitted(user_id=user.id, version=43))),
+            "trusted": lambda: packet(VoteSubmittedData(user_id=user.id, version=43)),
+        },
+        "user_joined payload": {
+            "validated": lambda: packet(payload(ValidatedUserJoined(user=user, version=43))),
+            "trusted": lambda: packet(UserJoinedData(user=user.model_dump(), version=43)),
+        },
+        "reveal stats + votes_revealed payload": {
+            "validated": lambda: packet(payload(ValidatedVotesRevealed(
+                votes=votes, stats=validated_stats(votes), version=43
+            ))),
+            "trusted": lambda: packet(VotesRevealedData(
+                votes=votes, stats=compute_round_stats(votes).model_dump(), room_stats=None, version=43
+            )),
+        },
+    }
+
+
+def run(room_sizes: List[int], min_seconds: float) -> dict:
+    return {
+        str(users): {
+            case: {name: round(time_per_call(func, min_seconds), 2) for name, func in variants.items()}
+            for case, variants in cases(users).items()
+        }
+        for users in room_sizes
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-event model/payload CPU cost")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500], help="users per room")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="minimum time per measurement")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.min_seconds)
+    for users, result in results.items():
+        print(f"room with {users} users")
+        for case, timings in result.items():
+            print(f"  {case:<40} validated {timings['validated']:>9.2f} us   trusted {timings['trusted']:>9.2f} us"
+                  f"   {timings['validated'] / timings['trusted']:>5.1f}x")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
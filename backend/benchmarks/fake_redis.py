@@ -0,0 +1,74 @@
+"""
+In-memory Redis server for running benchmarks offline.
+
+With --latency, every reply is held back that many milliseconds, as if
+Redis were across a network: a proxy on the given port forwards to
+fakeredis on another one.
+
+Usage: python -m benchmarks.fake_redis [port] [--latency MS]
+"""
+import argparse
+import asyncio
+import socket
+import threading
+from fakeredis import TcpFakeServer
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float) -> None:
+    """Copy reader to writer, each chunk `delay` seconds after it arrived, in order"""
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+
+    async def send() -> None:
+        while True:
+            due, data = await chunks.get()
+            if data is None:
+                break
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    sender = asyncio.create_task(send())
+    try:
+        while data := await reader.read(65536):
+            chunks.put_nowait((loop.time() + delay, data))
+    except ConnectionError:
+        pass
+    chunks.put_nowait((0.0, None))
+    await asyncio.gather(sender, return_exceptions=True)
+
+
+async def serve_with_latency(port: int, upstream_port: int, latency_ms: float) -> None:
+    async def handle(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", upstream_port)
+        await asyncio.gather(
+            _pipe(client_reader, server_writer, 0.0),
+            _pipe(server_reader, client_writer, latency_ms / 1000),
+            return_exceptions=True
+        )
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis server for benchmarks")
+    parser.add_argument("port", type=int, nargs="?", default=6390)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every reply")
+    args = parser.parse_args()
+
+    if not args.latency:
+        TcpFakeServer(("127.0.0.1", args.port), server_type="redis").serve_forever()
+        return
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        upstream_port = probe.getsockname()[1]
+    server = TcpFakeServer(("127.0.0.1", upstream_port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    asyncio.run(serve_with_latency(args.port, upstream_port, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+Load test for the Socket.IO backend.
+
+Starts app.main:app under uvicorn against a local Redis (an in-memory
+fakeredis server unless --redis-url is given), connects rooms x users
+python-socketio clients and plays rounds of vote / reveal / reset in every
+room at once. Reports events/sec, p50/p95/p99 latency per event and server
+memory per connection, tagged with the git commit so runs can be compared.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --rooms 100 --users 10 --rounds 5 --output before.json
+    python -m benchmarks.load_test --rooms 100 --users 10 --rounds 5 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import string
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import aiohttp
+import socketio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Numeric cards picked by simulated voters
+VOTES = ("1", "2", "3", "5", "8", "13")
+
+# Server events the simulated clients listen for
+SERVER_EVENTS = (
+    "connect_success", "room_joined", "room_state", "user_joined", "user_updated",
+    "user_left", "user_disconnected", "vote_submitted", "vote_cleared", "votes_batched",
+    "votes_revealed", "round_reset", "error"
+)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Latency samples and failures per event"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, event: str, seconds: float) -> None:
+        self.samples.setdefault(event, []).append(seconds)
+
+    def fail(self, event: str) -> None:
+        self.errors[event] = self.errors.get(event, 0) + 1
+
+    async def measure(self, event: str, operation) -> Optional[float]:
+        """Await an operation returning a latency and record it, counting failures"""
+        try:
+            seconds = await operation
+        except Exception:
+            self.fail(event)
+            return None
+        self.record(event, seconds)
+        return seconds
+
+    def summary(self) -> Dict[str, dict]:
+        result = {}
+        for event in sorted(self.samples.keys() | self.errors.keys()):
+            values = sorted(self.samples.get(event, []))
+            result[event] = {
+                "count": len(values),
+                "errors": self.errors.get(event, 0),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3) if values else 0.0
+            }
+        return result
+
+
+class BenchClient:
+    """A simulated browser tab: one Socket.IO connection that awaits specific server events"""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.user_id: Optional[str] = None
+        self.received = 0
+        self._waiters: List[tuple] = []
+        for event in SERVER_EVENTS:
+            self.sio.on(event, self._handler(event))
+
+    def _handler(self, event: str):
+        async def handle(data=None):
+            now = time.perf_counter()
+            self.received += 1
+            if event == "room_joined":
+                self.user_id = data["user_id"]
+            if event == "votes_batched":
+                # Resolve waiters as if each vote had arrived on its own
+                for entry in data["votes"]:
+                    self._resolve("vote_submitted" if entry["voted"] else "vote_cleared", entry, now)
+            else:
+                self._resolve(event, data, now)
+        return handle
+
+    def _resolve(self, event: str, data: Optional[dict], now: float) -> None:
+        for waiter in list(self._waiters):
+            expected, predicate, future = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+            elif event == "error":
+                future.set_exception(BenchmarkError(data.get("message") if data else "error"))
+                self._waiters.remove(waiter)
+            elif event == expected and predicate(data):
+                future.set_result(now)
+                self._waiters.remove(waiter)
+
+    def expect(self, event: str, predicate: Callable[[dict], bool] = lambda data: True) -> asyncio.Future:
+        """Future resolving to the arrival time of the next matching event"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((event, predicate, future))
+        return future
+
+    async def wait(self, future: asyncio.Future) -> float:
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._waiters = [waiter for waiter in self._waiters if waiter[2] is not future]
+
+    async def connect(self, room_code: Optional[str] = None) -> float:
+        """Connect, naming the room to join in the URL as the frontend does, so app.supervisor can route it"""
+        url = f"{self.url}?room={room_code}" if room_code else self.url
+        start = time.perf_counter()
+        await self.sio.connect(url, transports=["websocket"], wait_timeout=self.timeout)
+        return time.perf_counter() - start
+
+    async def call(self, event: str, data: Optional[dict], reply: str,
+                   predicate: Callable[[dict], bool] = lambda data: True) -> float:
+        """Emit an event and return the time until the matching reply arrives"""
+        future = self.expect(reply, predicate)
+        start = time.perf_counter()
+        if data is None:
+            await self.sio.emit(event)
+        else:
+            await self.sio.emit(event, data)
+        return await self.wait(future) - start
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace, url: str):
+        self.args = args
+        self.url = url
+        self.recorder = Recorder()
+        self.rooms: List[List[BenchClient]] = []
+        self.emitted = 0
+
+    async def _create_room(self, session: aiohttp.ClientSession) -> str:
+        start = time.perf_counter()
+        async with session.post(f"{self.url}/rooms") as response:
+            if response.status == 404:
+                # An app from before POST /rooms (see --app-dir): join_room creates the room
+                return "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
+            if response.status != 201:
+                self.recorder.fail("create_room")
+                raise BenchmarkError(f"POST /rooms returned {response.status}")
+            body = await response.json()
+        self.recorder.record("create_room", time.perf_counter() - start)
+        return body["room_code"]
+
+    async def _join(self, client: BenchClient, room_code: str, user_name: str) -> None:
+        future = client.expect("room_joined")
+        start = time.perf_counter()
+        self.emitted += 1
+        await client.sio.emit("join_room", {"room_code": room_code, "user_name": user_name})
+        try:
+            await client.wait(future)
+        except Exception:
+            self.recorder.fail("join_room")
+            return
+        self.recorder.record("join_room", future.result() - start)
+
+    async def setup(self) -> None:
+        """Create every room, connect its clients and join them (facilitator first)"""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def connect(client: BenchClient, room_code: str) -> None:
+            async with semaphore:
+                await self.recorder.measure("connect", client.connect(room_code))
+
+        async def fill_room(session: aiohttp.ClientSession, index: int) -> List[BenchClient]:
+            async with semaphore:
+                room_code = await self._create_room(session)
+            clients = [BenchClient(self.url, self.args.timeout) for _ in range(self.args.users)]
+            await asyncio.gather(*(connect(client, room_code) for client in clients))
+            clients = [client for client in clients if client.sio.connected]
+            if not clients:
+                return []
+            # The first user to join becomes the facilitator
+            await self._join(clients[0], room_code, f"room{index}-user0")
+            await asyncio.gather(*(
+                self._join(client, room_code, f"room{index}-user{n}")
+                for n, client in enumerate(clients[1:], start=1)
+            ))
+            return clients
+
+        async with aiohttp.ClientSession() as session:
+            rooms = await asyncio.gather(
+                *(fill_room(session, index) for index in range(self.args.rooms)),
+                return_exceptions=True
+            )
+        self.rooms = [room for room in rooms if isinstance(room, list) and room]
+
+    async def _broadcast(self, sender: BenchClient, room: List[BenchClient], event: str, reply: str,
+                         predicate: Callable[[dict], bool] = lambda data: True) -> None:
+        """
+        Emit a room-wide action and record two latencies: until the sender
+        sees the broadcast and until the last member of the room sees it.
+        """
+        futures = [client.expect(reply, predicate) for client in room]
+        start = time.perf_counter()
+        self.emitted += 1
+        await sender.sio.emit(event)
+        arrivals = await asyncio.gather(*(client.wait(future) for client, future in zip(room, futures)),
+                                        return_exceptions=True)
+        sender_arrival = arrivals[room.index(sender)]
+        if isinstance(sender_arrival, BaseException):
+            self.recorder.fail(event)
+        else:
+            self.recorder.record(event, sender_arrival - start)
+        if any(isinstance(arrival, BaseException) for arrival in arrivals):
+            self.recorder.fail(f"{event}_fanout")
+        else:
+            self.recorder.record(f"{event}_fanout", max(arrivals) - start)
+
+    async def _vote(self, client: BenchClient) -> None:
+        self.emitted += 1
+        user_id = client.user_id
+        await self.recorder.measure("submit_vote", client.call(
+            "submit_vote", {"vote": random.choice(VOTES)}, "vote_submitted",
+            lambda data: data.get("user_id") == user_id
+        ))
+
+    async def play_round(self, room: List[BenchClient]) -> None:
+        facilitator = room[0]
+        await asyncio.gather(*(self._vote(client) for client in room))
+        await self._broadcast(facilitator, room, "reveal_votes", "votes_revealed")
+        await self._broadcast(facilitator, room, "reset_round", "round_reset")
+
+    async def run_rounds(self) -> float:
+        start = time.perf_counter()
+        for _ in range(self.args.rounds):
+            await asyncio.gather(*(self.play_round(room) for room in self.rooms))
+        return time.perf_counter() - start
+
+    async def teardown(self) -> None:
+        await asyncio.gather(
+            *(client.sio.disconnect() for room in self.rooms for client in room),
+            return_exceptions=True
+        )
+
+    @property
+    def clients(self) -> int:
+        return sum(len(room) for room in self.rooms)
+
+    @property
+    def received(self) -> int:
+        return sum(client.received for room in self.rooms for client in room)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def git_revision(app_dir: str = BACKEND_DIR) -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=app_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=app_dir,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def raise_fd_limit() -> None:
+    """Thousands of sockets need more than the usual 1024 file descriptors"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise BenchmarkError(f"Nothing listening on port {port}")
+            await asyncio.sleep(0.1)
+
+
+async def fetch_health(url: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/health") as response:
+            return await response.json()
+
+
+def start_processes(args: argparse.Namespace) -> tuple:
+    """
+    Start the Redis server (unless one was given, or rooms are kept in
+    memory) and the app, under app.supervisor with args.workers > 1.
+
+    Returns:
+        (processes, app url, app port, app pid)
+    """
+    processes = []
+    redis_url = args.redis_url
+    if not redis_url and args.storage == "redis":
+        redis_port = free_port()
+        latency = getattr(args, "redis_latency", 0.0)
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_redis", str(redis_port), "--latency", str(latency)],
+            cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        redis_url = f"redis://127.0.0.1:{redis_port}/0"
+        asyncio.run(wait_for_port(redis_port, 10))
+
+    # Every simulated client creates its rooms from the same address
+    env = dict(os.environ, ROOM_STORAGE=args.storage, LOG_LEVEL="WARNING", ENVIRONMENT="benchmark",
+               ROOM_CREATE_BURST="1000000")
+    if redis_url:
+        env["REDIS_URL"] = redis_url
+    for override in args.env:
+        key, _, value = override.partition("=")
+        env[key] = value
+    app_port = free_port()
+    workers = getattr(args, "workers", 1)
+    if workers > 1:
+        command = ["app.supervisor", "--workers", str(workers)]
+    else:
+        command = ["uvicorn", "app.main:app"]
+    server = subprocess.Popen(
+        [sys.executable, "-m", *command, "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning"],
+        cwd=getattr(args, "app_dir", None) or BACKEND_DIR, env=env
+    )
+    processes.append(server)
+    return processes, f"http://127.0.0.1:{app_port}", app_port, server.pid
+
+
+async def run(args: argparse.Namespace, url: str, app_port: int, server_pid: int) -> dict:
+    await wait_for_port(app_port, 20)
+    await fetch_health(url)
+    rss_before = rss_bytes(server_pid)
+
+    benchmark = Benchmark(args, url)
+    setup_start = time.perf_counter()
+    await benchmark.setup()
+    setup_seconds = time.perf_counter() - setup_start
+    rss_connected = rss_bytes(server_pid)
+    joins = benchmark.emitted
+
+    rounds_seconds = await benchmark.run_rounds()
+    round_events = benchmark.emitted - joins
+    received = benchmark.received
+    health = await fetch_health(url)
+    await benchmark.teardown()
+
+    memory = {"rss_before_bytes": rss_before, "rss_connected_bytes": rss_connected, "per_connection_bytes": None}
+    if rss_before is not None and rss_connected is not None and benchmark.clients:
+        memory["per_connection_bytes"] = (rss_connected - rss_before) // benchmark.clients
+
+    return {
+        "revision": git_revision(args.app_dir or BACKEND_DIR),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "params": {
+            "rooms": args.rooms,
+            "users": args.users,
+            "rounds": args.rounds,
+            "concurrency": args.concurrency,
+            "redis": "none" if args.storage == "memory" else "external" if args.redis_url else "fakeredis",
+            "redis_latency_ms": args.redis_latency,
+            "env": args.env
+        },
+        "clients": benchmark.clients,
+        "throughput": {
+            "setup_seconds": round(setup_seconds, 3),
+            "joins_per_sec": round(joins / setup_seconds, 1) if setup_seconds else 0.0,
+            "round_seconds": round(rounds_seconds, 3),
+            "events": round_events,
+            "events_per_sec": round(round_events / rounds_seconds, 1) if rounds_seconds else 0.0,
+            "messages_received": received,
+            "messages_received_per_sec": round(received / (setup_seconds + rounds_seconds), 1)
+        },
+        "latency": benchmark.recorder.summary(),
+        "memory": memory,
+        "redis_round_trips": health.get("redis_round_trips", {})
+    }
+
+
+def print_report(result: dict, baseline: Optional[dict] = None) -> None:
+    def delta(current: float, previous: Optional[float]) -> str:
+        if not previous:
+            return ""
+        return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+    revision = result["revision"]
+    print(f"commit {revision['commit']}{' (dirty)' if revision['dirty'] else ''}: "
+          f"{result['clients']} clients in {result['params']['rooms']} rooms, "
+          f"{result['params']['rounds']} rounds")
+    throughput = result["throughput"]
+    previous = baseline["throughput"] if baseline else {}
+    print(f"  events/sec: {throughput['events_per_sec']}{delta(throughput['events_per_sec'], previous.get('events_per_sec'))}")
+    print(f"  joins/sec:  {throughput['joins_per_sec']}{delta(throughput['joins_per_sec'], previous.get('joins_per_sec'))}")
+    per_connection = result["memory"]["per_connection_bytes"]
+    if per_connection is not None:
+        previous_memory = baseline["memory"]["per_connection_bytes"] if baseline else None
+        print(f"  memory/connection: {per_connection / 1024:.1f} KiB{delta(per_connection, previous_memory)}")
+    print(f"  {'event':<20} {'count':>7} {'errors':>6} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for event, stats in result["latency"].items():
+        old = baseline["latency"].get(event, {}) if baseline else {}
+        columns = [f"{stats[key]:.2f}{delta(stats[key], old.get(key))}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"  {event:<20} {stats['count']:>7} {stats['errors']:>6} " + " ".join(f"{column:>16}" for column in columns))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the planning poker Socket.IO backend")
+    parser.add_argument("--rooms", type=int, default=50, help="rooms to create")
+    parser.add_argument("--users", type=int, default=8, help="clients per room")
+    parser.add_argument("--rounds", type=int, default=5, help="vote/reveal/reset rounds per room")
+    parser.add_argument("--concurrency", type=int, default=200, help="max concurrent connection attempts")
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds to wait for each reply")
+    parser.add_argument("--redis-url", help="benchmark against this Redis instead of an in-memory fakeredis")
+    parser.add_argument("--redis-latency", type=float, default=0.0, metavar="MS",
+                        help="milliseconds the fakeredis server adds to every reply, as over a network")
+    parser.add_argument("--storage", choices=("redis", "memory"), default="redis",
+                        help="ROOM_STORAGE for the app server; memory runs without any Redis")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="run the app under app.supervisor with this many worker processes"
+                             " (memory figures then cover the supervisor only)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app server, e.g. --env ROOM_CACHE_SIZE=0")
+    parser.add_argument("--app-dir", metavar="DIR",
+                        help="run the app from this backend directory, e.g. a git worktree of an older commit")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for vote values")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    raise_fd_limit()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    processes, url, app_port, server_pid = start_processes(args)
+    try:
+        result = asyncio.run(run(args, url, app_port, server_pid))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+    errors = sum(stats["errors"] for stats in result["latency"].values())
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
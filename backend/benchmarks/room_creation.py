@@ -0,0 +1,127 @@
+"""
+Room creation throughput as the code space fills up.
+
+Room codes are drawn at random and claimed with one create-if-absent call
+each, moving to a longer code after ATTEMPTS_PER_LENGTH collisions. This
+fills the store with rooms under --length character codes until the given
+share of that code space is taken, then times allocate_room_code and
+reports rooms/sec, create attempts per room and how many rooms ended up
+with a longer code. A short --length keeps the prefill small: 3 characters
+are 32^3 = 32768 codes.
+
+Usage (from backend/):
+    python -m benchmarks.room_creation [--store memory|fakeredis] [--redis-url URL]
+                                       [--length 3] [--occupancy 0 50 90 99] [--rooms 200]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from typing import List
+from app.services import room_codes
+from app.services.room_codes import CHARSET, allocate_room_code
+from app.services.room_store_base import RoomStore
+
+CREATED_AT = "2024-01-01T00:00:00Z"
+
+
+def make_store(kind: str, redis_url: str = None) -> RoomStore:
+    if kind == "memory":
+        from app.services.memory_room_store import MemoryRoomStore
+        return MemoryRoomStore()
+    from app.services.redis_service import redis_service
+    if redis_url:
+        import redis.asyncio as redis
+        redis_service.client = redis.from_url(redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis_service.client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    from app.services.redis_room_store import RedisRoomStore
+    return RedisRoomStore()
+
+
+class CountingStore:
+    """Passes create_room through to a store, counting the calls"""
+
+    def __init__(self, store: RoomStore):
+        self.store = store
+        self.attempts = 0
+
+    async def create_room(self, room_code: str, created_at: str) -> bool:
+        self.attempts += 1
+        return await self.store.create_room(room_code, created_at)
+
+
+async def prefill(store: RoomStore, codes: List[str], occupied: int, count: int) -> int:
+    """Claim codes from `codes` until `count` codes are taken; returns how many are"""
+    while occupied < count and codes:
+        occupied += await store.create_room(codes.pop(), CREATED_AT)
+    return occupied
+
+
+async def measure(store: RoomStore, length: int, rooms: int) -> dict:
+    counting = CountingStore(store)
+    room_codes.room_store = counting
+    longer = 0
+    start = time.perf_counter()
+    for _ in range(rooms):
+        code = await allocate_room_code(CREATED_AT, length)
+        longer += len(code) > length
+    elapsed = time.perf_counter() - start
+    return {
+        "rooms_per_sec": round(rooms / elapsed, 1),
+        "attempts_per_room": round(counting.attempts / rooms, 2),
+        "longer_codes": longer,
+    }
+
+
+async def run(kind: str, redis_url: str, length: int, occupancies: List[float], rooms: int) -> dict:
+    store = make_store(kind, redis_url)
+    if redis_url:
+        from app.services.redis_service import redis_service
+        await redis_service.client.flushdb()
+    codes = [''.join(code) for code in itertools.product(CHARSET, repeat=length)]
+    random.shuffle(codes)
+    space = len(codes)
+    occupied = 0
+    results = {}
+    # Levels are filled in increasing order on the same store; rooms created
+    # while measuring one level count towards the next
+    for occupancy in sorted(occupancies):
+        occupied = await prefill(store, codes, occupied, int(space * occupancy / 100))
+        result = await measure(store, length, rooms)
+        results[str(occupancy)] = {"occupied": round(100 * occupied / space, 1), **result}
+        occupied += rooms - result["longer_codes"]
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Room creation throughput at high code space occupancy")
+    parser.add_argument("--store", choices=["memory", "fakeredis"], default="memory")
+    parser.add_argument("--redis-url", help="use this Redis instead (its database is flushed)")
+    parser.add_argument("--length", type=int, default=3, help="code length to fill")
+    parser.add_argument("--occupancy", type=float, nargs="+", default=[0, 50, 90, 99],
+                        help="percent of the code space taken before measuring")
+    parser.add_argument("--rooms", type=int, default=200, help="rooms created per measurement")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    kind = "redis" if args.redis_url else args.store
+    results = asyncio.run(run(kind, args.redis_url, args.length, args.occupancy, args.rooms))
+    print(f"{kind} store, {len(CHARSET) ** args.length} codes of length {args.length}, {args.rooms} rooms each")
+    print(f"  {'occupied %':>10} {'rooms/sec':>10} {'attempts':>9} {'longer':>7}")
+    for result in results.values():
+        print(f"  {result['occupied']:>10} {result['rooms_per_sec']:>10} "
+              f"{result['attempts_per_room']:>9} {result['longer_codes']:>7}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"store": kind, "length": args.length, "rooms": args.rooms, "results": results},
+                      output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
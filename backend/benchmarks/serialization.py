@@ -0,0 +1,138 @@
+"""
+Micro-benchmark of room encode/decode costs.
+
+Compares the stdlib json path the backend used to take (model_dump +
+json.dumps, json.loads + Room(**data)) with orjson, pydantic-core's direct
+model_dump_json / model_validate_json and, when installed, msgpack, for
+rooms of 5, 50 and 500 users. Also times building a room_state Socket.IO
+packet both ways.
+
+Usage (from backend/):
+    python -m benchmarks.serialization [--sizes 5 50 500] [--output serialization.json]
+"""
+import argparse
+import json
+import sys
+import timeit
+from typing import Callable, Dict, List
+import orjson
+from app.models.room import Room
+from app.models.user import User
+from app.utils.serializer import Encoded, SocketIOJSON
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+VOTES = ("1", "2", "3", "5", "8", "13", None)
+
+
+def make_room(users: int) -> Room:
+    return Room(
+        room_code="BENCH1",
+        created_at="2024-01-01T00:00:00Z",
+        state="voting",
+        current_round=3,
+        version=42,
+        users={
+            f"user-{n:04d}": User(
+                id=f"user-{n:04d}",
+                name=f"Participant {n}",
+                connected=n % 5 != 0,
+                is_facilitator=n == 0,
+                current_vote=VOTES[n % len(VOTES)],
+                joined_at="2024-01-01T00:00:00Z"
+            )
+            for n in range(users)
+        }
+    )
+
+
+def time_per_call(func: Callable[[], object], min_seconds: float) -> float:
+    """Best-of-five microseconds per call"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def cases(room: Room) -> Dict[str, Dict[str, Callable[[], object]]]:
+    as_json = room.model_dump_json()
+    as_dict = room.model_dump()
+    result = {
+        "encode": {
+            "json.dumps(model_dump())": lambda: json.dumps(room.model_dump()),
+            "orjson.dumps(model_dump())": lambda: orjson.dumps(room.model_dump()),
+            "model_dump_json()": lambda: room.model_dump_json(),
+        },
+        "decode": {
+            "Room(**json.loads())": lambda: Room(**json.loads(as_json)),
+            "Room(**orjson.loads())": lambda: Room(**orjson.loads(as_json)),
+            "Room.model_validate_json()": lambda: Room.model_validate_json(as_json),
+        },
+        "room_state packet": {
+            "json.dumps([event, model_dump()])": lambda: json.dumps(
+                ["room_state", room.model_dump()], separators=(",", ":")
+            ),
+            "SocketIOJSON.dumps([event, Encoded])": lambda: SocketIOJSON.dumps(
+                ["room_state", Encoded(room.model_dump_json())]
+            ),
+        }
+    }
+    if msgpack:
+        packed = msgpack.packb(as_dict)
+        result["encode"]["msgpack.packb(model_dump())"] = lambda: msgpack.packb(room.model_dump())
+        result["decode"]["Room(**msgpack.unpackb())"] = lambda: Room(**msgpack.unpackb(packed))
+    return result
+
+
+def sizes(room: Room) -> Dict[str, int]:
+    result = {
+        "json": len(json.dumps(room.model_dump()).encode()),
+        "json (compact)": len(room.model_dump_json().encode()),
+    }
+    if msgpack:
+        result["msgpack"] = len(msgpack.packb(room.model_dump()))
+    return result
+
+
+def run(room_sizes: List[int], min_seconds: float) -> dict:
+    results = {}
+    for users in room_sizes:
+        room = make_room(users)
+        timings = {
+            group: {name: round(time_per_call(func, min_seconds), 2) for name, func in funcs.items()}
+            for group, funcs in cases(room).items()
+        }
+        results[str(users)] = {"microseconds": timings, "bytes": sizes(room)}
+    return results
+
+
+def print_report(results: dict) -> None:
+    for users, result in results.items():
+        print(f"room with {users} users ({', '.join(f'{k}: {v} B' for k, v in result['bytes'].items())})")
+        for group, timings in result["microseconds"].items():
+            baseline = next(iter(timings.values()))
+            print(f"  {group}")
+            for name, micros in timings.items():
+                print(f"    {name:<40} {micros:>10.2f} us  {baseline / micros:>5.1f}x")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Room serialization micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500], help="users per room")
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="minimum time per measurement")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.min_seconds)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
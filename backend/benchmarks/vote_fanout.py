@@ -0,0 +1,147 @@
+"""
+Vote broadcast fan-out with and without batching.
+
+For each VOTE_BATCH_WINDOW, starts the backend (as load_test does) and,
+for each room size, fills one room and has every participant vote at
+once. Reports the Socket.IO packets clients received for those votes and
+the time until every client had seen every vote.
+
+Usage (from backend/):
+    python -m benchmarks.vote_fanout [--users 25 100 200] [--windows 0 0.025 0.05] [--output fanout.json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from typing import List, Optional
+from benchmarks.load_test import VOTES, BenchClient, git_revision, raise_fd_limit, start_processes, wait_for_port
+
+
+class FanoutClient(BenchClient):
+    """A client that counts the vote packets it receives and the voters they cover"""
+
+    def __init__(self, url: str, timeout: float):
+        super().__init__(url, timeout)
+        self.vote_packets = 0
+        self.voters = set()
+        self.expected_voters = 0
+        self.all_seen = asyncio.Event()
+        self.sio.on("vote_submitted", self._on_vote)
+        self.sio.on("votes_batched", self._on_batch)
+
+    def _seen(self, user_id: str) -> None:
+        self.voters.add(user_id)
+        if len(self.voters) >= self.expected_voters:
+            self.all_seen.set()
+
+    async def _on_vote(self, data: dict) -> None:
+        self.vote_packets += 1
+        self._seen(data["user_id"])
+
+    async def _on_batch(self, data: dict) -> None:
+        self.vote_packets += 1
+        for entry in data["votes"]:
+            self._seen(entry["user_id"])
+
+
+async def measure_room(url: str, users: int, timeout: float) -> dict:
+    clients = [FanoutClient(url, timeout) for _ in range(users)]
+    room_code = f"FAN{users:03d}"[:6]
+    semaphore = asyncio.Semaphore(100)
+
+    async def connect(client: FanoutClient) -> None:
+        async with semaphore:
+            await client.connect(room_code)
+
+    async def join(client: FanoutClient, room_code: str, n: int) -> None:
+        async with semaphore:
+            await client.call("join_room", {"room_code": room_code, "user_name": f"user{n}"}, "room_joined")
+
+    await asyncio.gather(*(connect(client) for client in clients))
+    await join(clients[0], room_code, 0)
+    await asyncio.gather(*(join(client, room_code, n) for n, client in enumerate(clients[1:], start=1)))
+    # Let the join broadcasts drain before counting
+    await asyncio.sleep(0.5)
+
+    for client in clients:
+        client.expected_voters = users
+    start = time.perf_counter()
+    await asyncio.gather(*(client.sio.emit("submit_vote", {"vote": random.choice(VOTES)}) for client in clients))
+    await asyncio.wait_for(asyncio.gather(*(client.all_seen.wait() for client in clients)), timeout)
+    fanout_seconds = time.perf_counter() - start
+
+    packets = sum(client.vote_packets for client in clients)
+    await asyncio.gather(*(client.sio.disconnect() for client in clients), return_exceptions=True)
+    return {
+        "vote_packets": packets,
+        "packets_per_vote": round(packets / users, 1),
+        "fanout_ms": round(fanout_seconds * 1000, 1)
+    }
+
+
+async def run_window(url: str, app_port: int, sizes: List[int], timeout: float) -> dict:
+    await wait_for_port(app_port, 20)
+    # Warm-up: the first room pays for loading the Lua scripts and opening connections
+    await measure_room(url, 2, timeout)
+    return {str(users): await measure_room(url, users, timeout) for users in sizes}
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = {}
+    for window in args.windows:
+        server_args = argparse.Namespace(
+            redis_url=args.redis_url,
+            storage=args.storage,
+            env=[f"VOTE_BATCH_WINDOW={window}", "RATE_LIMIT_ENABLED=false"] + args.env
+        )
+        processes, url, app_port, _ = start_processes(server_args)
+        try:
+            results[str(window)] = asyncio.run(run_window(url, app_port, args.users, args.timeout))
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+    return results
+
+
+def print_report(results: dict) -> None:
+    baseline: Optional[dict] = next(iter(results.values()), None)
+    for window, rooms in results.items():
+        print(f"VOTE_BATCH_WINDOW={window}")
+        for users, result in rooms.items():
+            reduction = baseline[users]["vote_packets"] / result["vote_packets"]
+            print(f"  {users:>5} users: {result['vote_packets']:>7} packets ({result['packets_per_vote']:>6} per vote,"
+                  f" {reduction:>5.1f}x fewer)   all votes seen after {result['fanout_ms']:>8.1f} ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vote broadcast fan-out with and without batching")
+    parser.add_argument("--users", type=int, nargs="+", default=[25, 100, 200], help="participants per room")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 0.025, 0.05],
+                        help="VOTE_BATCH_WINDOW values to compare; the first is the baseline")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for every vote to arrive")
+    parser.add_argument("--redis-url", help="benchmark against this Redis instead of an in-memory fakeredis")
+    parser.add_argument("--storage", choices=("redis", "memory"), default="redis",
+                        help="ROOM_STORAGE for the app server; memory runs without any Redis")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app server")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    raise_fd_limit()
+    results = run(args)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"revision": git_revision(), "results": results}, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
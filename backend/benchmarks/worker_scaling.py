@@ -0,0 +1,165 @@
+"""
+Throughput of the backend with 1, 2, 4... worker processes.
+
+For each worker count, starts the app under app.supervisor (as load_test
+does, against a fakeredis server unless --redis-url is given) and drives it
+from --client-processes processes. Every room keeps one vote in flight at a
+time: a random member votes and the next vote goes out once every member has
+seen it. Reports votes/sec, vote events delivered/sec and the time for a vote
+to reach the whole room, with the speedup over one worker.
+
+Each client connects with its room in the URL, so all of a room's sockets
+reach one worker. Scaling is only meaningful with a core per worker, plus
+cores for the clients, and with a real Redis (--redis-url): fakeredis is a
+single Python process and soon becomes the bottleneck.
+
+Usage (from backend/):
+    python -m benchmarks.worker_scaling --workers 1 2 4 --rooms 64 --users 10 --duration 10 --redis-url redis://...
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import List
+from benchmarks.load_test import (
+    VOTES, BenchClient, git_revision, percentile, raise_fd_limit, start_processes, wait_for_port
+)
+
+
+async def drive_rooms(url: str, room_codes: List[str], args: argparse.Namespace, barrier) -> dict:
+    """Fill the rooms, wait for every client process, then vote for args.duration seconds"""
+    semaphore = asyncio.Semaphore(100)
+
+    async def fill(room_code: str) -> List[BenchClient]:
+        clients = [BenchClient(url, args.timeout) for _ in range(args.users)]
+        for n, client in enumerate(clients):
+            async with semaphore:
+                await client.connect(room_code)
+                await client.call("join_room", {"room_code": room_code, "user_name": f"user{n}"}, "room_joined")
+        return clients
+
+    rooms = await asyncio.gather(*(fill(room_code) for room_code in room_codes))
+    # Let the join broadcasts drain before measuring
+    await asyncio.sleep(1)
+    await asyncio.to_thread(barrier.wait)
+
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def play(room: List[BenchClient]) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            voter = random.choice(room)
+            user_id = voter.user_id
+            futures = [client.expect("vote_submitted", lambda data: data.get("user_id") == user_id)
+                       for client in room]
+            start = time.perf_counter()
+            await voter.sio.emit("submit_vote", {"vote": random.choice(VOTES)})
+            try:
+                arrivals = await asyncio.gather(*(client.wait(future) for client, future in zip(room, futures)))
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(max(arrivals) - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play(room) for room in rooms))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*(client.sio.disconnect() for room in rooms for client in room), return_exceptions=True)
+    return {"votes": len(latencies), "errors": errors, "seconds": elapsed, "latencies": latencies}
+
+
+def client_process(url: str, room_codes: List[str], args: argparse.Namespace, barrier, results) -> None:
+    raise_fd_limit()
+    results.put(asyncio.run(drive_rooms(url, room_codes, args, barrier)))
+
+
+def measure(args: argparse.Namespace, workers: int) -> dict:
+    server_args = argparse.Namespace(
+        redis_url=args.redis_url,
+        storage="redis",
+        workers=workers,
+        env=["RATE_LIMIT_ENABLED=false"] + args.env
+    )
+    processes, url, app_port, _ = start_processes(server_args)
+    try:
+        asyncio.run(wait_for_port(app_port, 30))
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(args.client_processes)
+        results = context.Queue()
+        room_codes = [f"W{workers}R{index:04d}" for index in range(args.rooms)]
+        clients = [
+            context.Process(target=client_process,
+                            args=(url, room_codes[index::args.client_processes], args, barrier, results))
+            for index in range(args.client_processes)
+        ]
+        for client in clients:
+            client.start()
+        runs = [results.get(timeout=args.duration + 300) for _ in clients]
+        for client in clients:
+            client.join()
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    seconds = max(run["seconds"] for run in runs)
+    votes = sum(run["votes"] for run in runs)
+    latencies = sorted(latency for run in runs for latency in run["latencies"])
+    return {
+        "votes": votes,
+        "errors": sum(run["errors"] for run in runs),
+        "votes_per_sec": round(votes / seconds, 1),
+        "deliveries_per_sec": round(votes * args.users / seconds, 1),
+        "fanout_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "fanout_p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+
+
+def print_report(results: dict) -> None:
+    baseline = next(iter(results.values()))
+    base_workers = int(next(iter(results)))
+    for workers, result in results.items():
+        speedup = result["votes_per_sec"] / baseline["votes_per_sec"] if baseline["votes_per_sec"] else 0.0
+        efficiency = speedup / (int(workers) / base_workers)
+        print(f"{workers:>3} workers: {result['votes_per_sec']:>9} votes/s {result['deliveries_per_sec']:>10} events/s"
+              f"   fan-out p50 {result['fanout_p50_ms']:>7} ms p99 {result['fanout_p99_ms']:>7} ms"
+              f"   {speedup:>4.2f}x ({efficiency:.0%} of linear)   {result['errors']} errors")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backend throughput by number of worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="worker counts to compare; the first is the baseline")
+    parser.add_argument("--rooms", type=int, default=64, help="rooms, each with one vote in flight at a time")
+    parser.add_argument("--users", type=int, default=10, help="clients per room")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to vote for, per worker count")
+    parser.add_argument("--client-processes", type=int, default=os.cpu_count() or 1,
+                        help="processes the simulated clients are spread over")
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds to wait for each reply")
+    parser.add_argument("--redis-url", help="benchmark against this Redis instead of an in-memory fakeredis")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app server")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    raise_fd_limit()
+    results = {str(workers): measure(args, workers) for workers in args.workers}
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"revision": git_revision(), "cpus": os.cpu_count(), "results": results}, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
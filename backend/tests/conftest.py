@@ -0,0 +1,25 @@
+import fakeredis.aioredis
+import pytest
+from app.services.memory_room_store import MemoryRoomStore
+from app.services.redis_room_store import RedisRoomStore
+from app.services.redis_service import redis_service
+
+
+@pytest.fixture
+async def redis_store(monkeypatch):
+    """A RedisRoomStore on an in-process fakeredis, with its Lua scripts"""
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_service, "client", client)
+    yield RedisRoomStore()
+    await client.aclose()
+
+
+@pytest.fixture
+def memory_store():
+    return MemoryRoomStore()
+
+
+@pytest.fixture(params=["redis", "memory"])
+def store(request):
+    """Each test using this runs against both engines"""
+    return request.getfixturevalue(f"{request.param}_store")
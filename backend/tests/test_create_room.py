@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app import main
+from app.config import settings
+from app.websocket.rate_limit import TokenBuckets
+
+
+def request_from(host: str) -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/rooms", "headers": [], "client": (host, 40000)})
+
+
+@pytest.fixture(autouse=True)
+def rooms(monkeypatch):
+    """Room creation that never touches a store, and a fresh limit of 3 rooms per address"""
+    created = []
+
+    async def create_room():
+        created.append(f"ROOM{len(created) + 1:02d}")
+        return SimpleNamespace(room_code=created[-1])
+
+    monkeypatch.setattr(main.room_service, "create_room", create_room)
+    monkeypatch.setattr(main, "room_creations", TokenBuckets(rate=0.1, burst=3))
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    return created
+
+
+async def test_room_creation_is_limited_per_address(rooms):
+    for _ in range(3):
+        await main.create_room(request_from("10.0.0.1"))
+
+    with pytest.raises(HTTPException) as error:
+        await main.create_room(request_from("10.0.0.1"))
+    assert error.value.status_code == 429
+    assert error.value.headers["Retry-After"] == "10"
+
+    # Other addresses have their own allowance
+    assert await main.create_room(request_from("10.0.0.2")) == {"room_code": "ROOM04"}
+    assert len(rooms) == 4
+
+
+async def test_limit_can_be_turned_off(rooms, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    for _ in range(5):
+        await main.create_room(request_from("10.0.0.1"))
+    assert len(rooms) == 5
+
+
+async def post_rooms(asgi_app, peer: str, forwarded_for: str) -> int:
+    """POST /rooms through an ASGI app from `peer`, returning the status code"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/rooms", "raw_path": b"/rooms", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"poker.example"), (b"x-forwarded-for", forwarded_for.encode())],
+        "client": (peer, 40000), "server": ("10.0.0.100", 8000),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi_app(scope, receive, send)
+    return next(message["status"] for message in messages if message["type"] == "http.response.start")
+
+
+async def test_limit_uses_the_address_a_trusted_proxy_forwards(rooms, monkeypatch):
+    from app.worker import server_config
+    monkeypatch.setattr(settings, "forwarded_allow_ips", "10.0.0.9")
+    config = server_config(main.app, log_config=None)
+    config.load()
+
+    # Every request comes from the proxy, but each client has its own allowance
+    assert [await post_rooms(config.loaded_app, "10.0.0.9", "203.0.113.1") for _ in range(4)] == [201] * 3 + [429]
+    assert await post_rooms(config.loaded_app, "10.0.0.9", "203.0.113.2") == 201
+    # An untrusted peer cannot pick its address with the header
+    assert await post_rooms(config.loaded_app, "198.51.100.7", "203.0.113.3") == 201
+    assert set(main.room_creations._buckets) == {"203.0.113.1", "203.0.113.2", "198.51.100.7"}
@@ -0,0 +1,28 @@
+import logging
+from app.utils import serializer
+from app.utils.log_config import JsonFormatter
+
+
+def make_record(**extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "Joined room %s", ("ROOM01",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_line_has_extra_fields_as_keys():
+    line = JsonFormatter().format(make_record(room_code="ROOM01", user_id="u1", round=3))
+
+    entry = serializer.loads(line)
+    assert entry["message"] == "Joined room ROOM01" and entry["level"] == "INFO"
+    assert (entry["room_code"], entry["user_id"], entry["round"]) == ("ROOM01", "u1", 3)
+    assert "\n" not in line
+
+
+def test_value_the_serializer_cannot_encode_is_logged_as_text():
+    class Opaque:
+        def __str__(self):
+            return "opaque"
+
+    entry = serializer.loads(JsonFormatter().format(make_record(thing=Opaque(), count=2)))
+
+    assert entry["thing"] == "opaque" and entry["count"] == 2
@@ -0,0 +1,149 @@
+"""
+Two backend processes sharing one Redis (MULTI_NODE), with a client on each.
+
+Needs a Redis server: TEST_REDIS_URL, by default redis://127.0.0.1:6379/15.
+Skipped when none answers. Rooms get random codes, so the database is not
+cleared.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+import pytest
+import redis
+import socketio
+
+REDIS_URL = os.environ.get("TEST_REDIS_URL", "redis://127.0.0.1:6379/15")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT = 5.0
+
+
+def redis_available() -> bool:
+    try:
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not redis_available(), reason=f"no Redis at {REDIS_URL}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+@pytest.fixture(scope="module")
+def nodes():
+    """URLs of two app processes on the same Redis"""
+    env = dict(os.environ, REDIS_URL=REDIS_URL, MULTI_NODE="true", ROOM_STORAGE="redis",
+               RATE_LIMIT_ENABLED="false", LOG_LEVEL="WARNING", ENVIRONMENT="test")
+    ports = [free_port(), free_port()]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env
+        )
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            wait_for_port(port)
+        yield [f"http://127.0.0.1:{port}" for port in ports]
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+class Client:
+    """A Socket.IO client recording every event it receives"""
+
+    def __init__(self):
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.events = []
+        self._arrived = asyncio.Event()
+
+        @self.sio.on("*")
+        async def record(event, data=None):
+            self.events.append((event, data))
+            self._arrived.set()
+
+    async def wait_for(self, event: str, predicate=lambda data: True):
+        """The data of the first `event` matching predicate, waiting for it if need be"""
+        deadline = asyncio.get_running_loop().time() + TIMEOUT
+        while True:
+            for name, data in self.events:
+                if name == event and predicate(data):
+                    return data
+            self._arrived.clear()
+            await asyncio.wait_for(self._arrived.wait(), deadline - asyncio.get_running_loop().time())
+
+    async def join(self, url: str, room_code: str, user_name: str) -> str:
+        """Connect and join a room; returns the user id"""
+        await self.sio.connect(url, transports=["websocket"])
+        await self.sio.emit("join_room", {"room_code": room_code, "user_name": user_name})
+        return (await self.wait_for("room_joined"))["user_id"]
+
+
+@pytest.fixture
+async def room(nodes):
+    """A facilitator on the first node and a member on the second, in a new room"""
+    room_code = "T" + uuid.uuid4().hex[:7].upper()
+    facilitator, member = Client(), Client()
+    facilitator_id = await facilitator.join(nodes[0], room_code, "Alice")
+    member_id = await member.join(nodes[1], room_code, "Bob")
+    yield facilitator, facilitator_id, member, member_id
+    for client in (facilitator, member):
+        await client.sio.disconnect()
+
+
+async def test_broadcasts_reach_the_other_node(room):
+    facilitator, facilitator_id, member, member_id = room
+
+    joined = await facilitator.wait_for("user_joined", lambda data: data["user"]["id"] == member_id)
+    assert joined["user"]["name"] == "Bob"
+
+    await member.sio.emit("submit_vote", {"vote": "8"})
+    await facilitator.wait_for("vote_submitted", lambda data: data["user_id"] == member_id)
+
+    await facilitator.sio.emit("reveal_votes")
+    revealed = await member.wait_for("votes_revealed")
+    assert revealed["votes"][member_id] == "8"
+
+
+async def test_kick_reaches_a_user_on_the_other_node(room):
+    facilitator, facilitator_id, member, member_id = room
+
+    await facilitator.sio.emit("kick_user", {"user_id": member_id})
+
+    kicked = await member.wait_for("user_kicked")
+    assert kicked == {"user_id": member_id, "kicked_by": facilitator_id}
+    await facilitator.wait_for("user_left", lambda data: data["user_id"] == member_id)
+
+    # The kicked socket no longer gets the room's broadcasts, and its votes are rejected
+    member.events.clear()
+    await member.sio.emit("submit_vote", {"vote": "3"})
+    await member.wait_for("error")
+    await facilitator.sio.emit("reset_round")
+    await facilitator.wait_for("round_reset")
+    await asyncio.sleep(0.5)
+    assert [name for name, _ in member.events] == ["error"]
@@ -0,0 +1,162 @@
+import asyncio
+import pytest
+from app.websocket import rate_limit
+from app.utils.instrumentation import instrumented
+from app.utils.metrics import event_duration
+from app.websocket.rate_limit import RateLimiter, TokenBuckets, rate_limited
+
+
+def test_bucket_allows_a_burst_then_refills():
+    buckets = TokenBuckets(rate=2.0, burst=3)
+
+    assert [buckets.acquire("a", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.acquire("a", now=0.0) == pytest.approx(0.5)
+    # Other keys have their own bucket
+    assert buckets.acquire("b", now=0.0) == 0.0
+
+    # Half a second buys one token back, and a long pause never more than the burst
+    assert buckets.acquire("a", now=0.5) == 0.0
+    assert buckets.acquire("a", now=0.5) > 0
+    assert [buckets.acquire("a", now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.acquire("a", now=100.0) > 0
+
+
+def test_forgotten_bucket_starts_full():
+    buckets = TokenBuckets(rate=1.0, burst=1)
+    buckets.acquire("a", now=0.0)
+    assert buckets.acquire("a", now=0.0) > 0
+
+    buckets.forget("a")
+
+    assert buckets.acquire("a", now=0.0) == 0.0
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """A fresh limiter allowing two events per socket, with errors captured instead of sent"""
+    limiter = RateLimiter()
+    limiter.sockets = TokenBuckets(rate=10.0, burst=2)
+    errors = []
+
+    async def emit(event, data, to=None):
+        errors.append((event, to))
+
+    monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+    monkeypatch.setattr(rate_limit.sio, "emit", emit)
+    limiter.errors = errors
+    yield limiter
+    for timer in list(limiter._timers.values()):
+        timer.cancel()
+
+
+async def test_excess_events_are_dropped(limiter):
+    calls = []
+
+    @rate_limited
+    async def reveal_votes(sid):
+        calls.append(sid)
+
+    for _ in range(4):
+        await reveal_votes("sid1")
+    await asyncio.sleep(0.3)
+
+    assert calls == ["sid1", "sid1"]
+    # One error per ERROR_INTERVAL however many events were dropped
+    assert limiter.errors == [("error", "sid1")]
+
+
+async def test_excess_votes_are_coalesced_to_the_latest(limiter):
+    votes = []
+
+    @rate_limited
+    async def submit_vote(sid, data):
+        votes.append(data["vote"])
+
+    for vote in ["1", "2", "3", "5", "8"]:
+        await submit_vote("sid1", {"vote": vote})
+    assert votes == ["1", "2"]
+
+    await asyncio.sleep(0.3)
+
+    assert votes == ["1", "2", "8"]
+
+
+async def test_request_sync_is_not_lost(limiter):
+    syncs = []
+
+    @rate_limited
+    async def submit_vote(sid, data):
+        pass
+
+    @rate_limited
+    async def request_sync(sid):
+        syncs.append(sid)
+
+    await submit_vote("sid1", {"vote": "1"})
+    await submit_vote("sid1", {"vote": "2"})
+    # Throttled behind the votes, and held in its own slot next to a held vote
+    await submit_vote("sid1", {"vote": "3"})
+    await request_sync("sid1")
+    await request_sync("sid1")
+    assert syncs == []
+
+    await asyncio.sleep(0.5)
+
+    assert syncs == ["sid1"]
+
+
+async def test_throttled_join_is_replayed_with_the_latest_data(limiter):
+    joins = []
+
+    @rate_limited
+    async def join_room(sid, data):
+        joins.append(data["room_code"])
+
+    for room_code in ["ROOM01", "ROOM02", "ROOM03", "ROOM04"]:
+        await join_room("sid1", {"room_code": room_code, "user_name": "Alice"})
+    assert joins == ["ROOM01", "ROOM02"]
+
+    await asyncio.sleep(0.3)
+
+    # A reconnecting client sends its join once, so it must not be dropped
+    assert joins == ["ROOM01", "ROOM02", "ROOM04"]
+
+
+async def test_replayed_event_is_instrumented(limiter):
+    def observed():
+        series = event_duration._series.get(("submit_vote",))
+        return sum(series[0]) if series else 0
+
+    @rate_limited
+    @instrumented
+    async def submit_vote(sid, data):
+        pass
+
+    before = observed()
+    for vote in ["1", "2", "3"]:
+        await submit_vote("sid1", {"vote": vote})
+    assert observed() == before + 2
+
+    await asyncio.sleep(0.3)
+
+    assert observed() == before + 3
+
+
+async def test_forget_drops_the_socket_state(limiter):
+    calls = []
+
+    @rate_limited
+    async def submit_vote(sid, data):
+        calls.append(data["vote"])
+
+    for vote in ["1", "2", "3"]:
+        await submit_vote("sid1", {"vote": vote})
+    timer = limiter._timers["sid1"]
+
+    limiter.forget("sid1")
+    await asyncio.sleep(0.3)
+
+    assert calls == ["1", "2"]
+    assert timer.cancelled()
+    assert "sid1" not in limiter._pending and "sid1" not in limiter._last_error
+    assert "sid1" not in limiter.sockets._buckets
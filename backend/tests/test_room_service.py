@@ -0,0 +1,72 @@
+import pytest
+from app.config import settings
+from app.services import room_codes, room_service as room_service_module
+from app.services.memory_room_store import MemoryRoomStore
+from app.services.redis_service import redis_service
+from app.services.room_cache import room_cache
+from app.services.room_service import room_service
+from app.services.room_store import create_room_store
+
+
+@pytest.fixture(autouse=True)
+def memory_rooms(monkeypatch, memory_store):
+    """Route the room service to a MemoryRoomStore, with no Redis client at all"""
+    monkeypatch.setattr(room_service_module, "room_store", memory_store)
+    monkeypatch.setattr(room_codes, "room_store", memory_store)
+    monkeypatch.setattr(redis_service, "client", None)
+    room_cache.clear()
+    yield memory_store
+    room_cache.clear()
+
+
+async def test_round_without_redis():
+    room = await room_service.create_room()
+    room_code = room.room_code
+    _, alice, _ = await room_service.add_user(room_code, "Alice")
+    _, bob, _ = await room_service.add_user(room_code, "Bob")
+    assert alice.is_facilitator and not bob.is_facilitator
+
+    await room_service.submit_vote(room_code, alice.id, "3")
+    await room_service.submit_vote(room_code, bob.id, "5")
+    revealed, room, stats, room_stats = await room_service.reveal_votes(room_code)
+
+    assert revealed and room.state == "revealed"
+    assert stats.average == 4 and room_stats.rounds == 1
+    assert (await room_service.get_vote_history(room_code)).total == 1
+
+    room = await room_service.reset_round(room_code)
+    assert room.current_round == 2 and not any(user.current_vote for user in room.users.values())
+    # A client that saw the first join catches up from the event log
+    events = await room_service.events_since(room_code, 1)
+    assert [event for event, _ in events] == [
+        "user_joined", "vote_submitted", "vote_submitted", "votes_revealed", "round_reset"
+    ]
+
+
+async def test_create_room_with_a_code_that_expires_meanwhile(memory_rooms, monkeypatch):
+    async def taken(room_code, created_at):
+        return False
+
+    # The code is taken, but the room is gone by the time it is read
+    monkeypatch.setattr(memory_rooms, "create_room", taken)
+
+    assert await room_service.create_room("GONE01") is None
+    assert room_cache.get("GONE01") is None
+    assert await memory_rooms.load_room("GONE01") is None
+
+
+async def test_create_room_with_a_taken_code_returns_the_room(memory_rooms):
+    _, alice, _ = await room_service.add_user("TAKEN1", "Alice", create_room=True)
+
+    room = await room_service.create_room("TAKEN1")
+
+    assert list(room.users) == [alice.id]
+
+
+@pytest.mark.parametrize("setting", ["multi_node", "workers"])
+def test_memory_storage_needs_a_single_process(monkeypatch, setting):
+    monkeypatch.setattr(settings, "room_storage", "memory")
+    monkeypatch.setattr(settings, setting, 2 if setting == "workers" else True)
+
+    with pytest.raises(ValueError):
+        create_room_store()
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from app.services.room_store_base import RoomStore
+from app.services.vote_stats import compute_round_stats, room_stats_from_totals, stats_increments
+
+CREATED_AT = "2024-01-01T00:00:00Z"
+
+
+async def fill_room(store: RoomStore, room_code: str, users: int) -> list:
+    """Create a room with `users` members; returns their ids"""
+    assert await store.create_room(room_code, CREATED_AT)
+    for n in range(users):
+        assert await store.add_user(room_code, None, f"user{n}", f"User {n}", CREATED_AT)
+    return [f"user{n}" for n in range(users)]
+
+
+async def test_concurrent_votes_are_all_kept(store):
+    user_ids = await fill_room(store, "VOTES1", 50)
+
+    versions = await asyncio.gather(*(store.submit_vote("VOTES1", user_id, "5") for user_id in user_ids))
+
+    room = await store.load_room("VOTES1")
+    assert {user_id: user.current_vote for user_id, user in room.users.items()} == dict.fromkeys(user_ids, "5")
+    # Each vote was its own atomic change
+    assert sorted(versions) == list(range(51, 101))
+    assert room.version == 100
+
+
+async def test_reveal_records_the_round_once(store):
+    user_ids = await fill_room(store, "REVEAL", 4)
+    for user_id, card in zip(user_ids, ("3", "5", "0.5", "?")):
+        await store.submit_vote("REVEAL", user_id, card)
+
+    revealed, room, totals = await store.reveal_votes("REVEAL", "2024-01-01T00:10:00Z")
+
+    assert revealed and room.state == "revealed" and room.version == 9
+    stats = compute_round_stats({"user0": "3", "user1": "5", "user2": "0.5", "user3": "?"})
+    assert room_stats_from_totals(totals) == room_stats_from_totals(
+        {field: str(amount) for field, amount in stats_increments(stats).items()}
+    )
+    history = await store.get_history("REVEAL", 0, 10)
+    assert history.total == 1
+    assert history.entries[0].round == 1 and history.entries[0].stats == stats
+
+    # Revealing again changes nothing and logs no event
+    assert await store.reveal_votes("REVEAL", "2024-01-01T00:11:00Z") == (False, room, None)
+    assert await store.events_since("REVEAL", 9) == []
+    assert (await store.get_history("REVEAL", 0, 10)).total == 1
+    assert await store.get_stats_totals("REVEAL") == totals
+
+
+@pytest.mark.parametrize("cards", [
+    ("5", "5", "?"),                # consensus, with a non-numeric card
+    ("0.5", "0", "0", "0"),         # average 0.125, rounded half to even
+    ("1", "2", "3", "8"),           # even count: median between two votes
+    ("?", "☕"),                     # no numeric votes at all
+    ("13", "0.5", "8", "8", "2"),   # a single mode, odd count
+])
+async def test_recorded_round_stats_match_compute_round_stats(store, cards):
+    user_ids = await fill_room(store, "STATS1", len(cards))
+    for user_id, card in zip(user_ids, cards):
+        await store.submit_vote("STATS1", user_id, card)
+
+    _, _, totals = await store.reveal_votes("STATS1", "2024-01-01T00:10:00Z")
+
+    stats = compute_round_stats(dict(zip(user_ids, cards)))
+    [entry] = (await store.get_history("STATS1", 0, 10)).entries
+    assert entry.stats.model_dump() == stats.model_dump()
+    assert room_stats_from_totals(totals) == room_stats_from_totals(
+        {field: str(amount) for field, amount in stats_increments(stats).items()}
+    )
+
+
+async def test_room_nobody_joins_expires_early(memory_store, monkeypatch):
+    from app.config import settings
+    from app.services import memory_room_store
+    await memory_store.create_room("EMPTY1", CREATED_AT)
+    await fill_room(memory_store, "USED01", 1)
+    now = memory_room_store.time.time()
+
+    monkeypatch.setattr(memory_room_store.time, "time", lambda: now + settings.empty_room_ttl + 1)
+
+    assert await memory_store.load_room("EMPTY1") is None
+    assert await memory_store.load_room("USED01") is not None
+    assert await memory_store.expired_rooms(10) == ["EMPTY1"]
+
+
+async def test_redis_room_nobody_joins_expires_early(redis_store):
+    from app.config import settings
+    from app.services.redis_room_store import ACTIVE_ROOMS_KEY
+    from app.services.redis_service import redis_service
+    client = redis_service.client
+    await redis_store.create_room("EMPTY1", CREATED_AT)
+    assert 0 < await client.ttl("room:EMPTY1") <= settings.empty_room_ttl
+    # Listed so that the reaper finds it as soon as its keys have expired
+    idle_for = (await client.time())[0] - await client.zscore(ACTIVE_ROOMS_KEY, "EMPTY1")
+    assert idle_for == pytest.approx(settings.room_ttl - settings.empty_room_ttl, abs=2)
+
+    await redis_store.add_user("EMPTY1", None, "user0", "User 0", CREATED_AT)
+
+    assert await client.ttl("room:EMPTY1") > settings.empty_room_ttl
@@ -0,0 +1,40 @@
+import pytest
+from app.websocket import vote_batcher as vote_batcher_module
+from app.websocket.vote_batcher import VoteBatcher
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Events the batcher broadcasts, captured instead of sent"""
+    sent = []
+
+    async def emit(event, data, room=None):
+        sent.append((event, data, room))
+
+    monkeypatch.setattr(vote_batcher_module.sio, "emit", emit)
+    return sent
+
+
+async def test_batch_is_sent_in_version_order(sent):
+    batcher = VoteBatcher(window=60, max_size=100)
+    # Handlers can finish out of order after the store assigned their versions
+    for user_id, version in (("a", 12), ("b", 10), ("c", 11)):
+        await batcher.add("ROOM01", user_id, True, version)
+    assert sent == []
+
+    await batcher.flush("ROOM01")
+
+    [(event, data, room)] = sent
+    assert event == "votes_batched" and room == "ROOM01"
+    assert [entry["version"] for entry in data["votes"]] == [10, 11, 12]
+
+
+async def test_full_batch_and_single_vote_go_out_at_once(sent):
+    batcher = VoteBatcher(window=60, max_size=2)
+    await batcher.add("ROOM01", "a", True, 2)
+    await batcher.add("ROOM01", "b", False, 1)
+    assert [entry["user_id"] for entry in sent[0][1]["votes"]] == ["b", "a"]
+
+    unbatched = VoteBatcher(window=0, max_size=2)
+    await unbatched.add("ROOM01", "c", False, 3)
+    assert sent[1] == ("vote_cleared", {"user_id": "c", "version": 3}, "ROOM01")
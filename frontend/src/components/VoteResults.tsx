@@ -2,7 +2,7 @@ import React from 'react'
 import { useRoom } from '../contexts/RoomContext'
 
 export const VoteResults: React.FC = () => {
-  const { room } = useRoom()
+  const { room, roundStats } = useRoom()
 
   if (!room || room.state !== 'revealed') return null
 
@@ -13,15 +13,18 @@ export const VoteResults: React.FC = () => {
       vote: user.current_vote!
     }))
 
-  // Calculate average (excluding ? and ☕)
+  // Prefer the server's statistics; fall back to a local average (excluding ? and ☕)
+  // when we only have a room_state snapshot, e.g. after rejoining a revealed round
   const numericVotes = votes
     .map(v => v.vote)
     .filter(v => !['?', '☕'].includes(v))
     .map(v => parseFloat(v))
 
-  const average = numericVotes.length > 0
-    ? (numericVotes.reduce((a, b) => a + b, 0) / numericVotes.length).toFixed(1)
-    : 'N/A'
+  const localAverage = numericVotes.length > 0
+    ? numericVotes.reduce((a, b) => a + b, 0) / numericVotes.length
+    : null
+  const averageValue = roundStats ? roundStats.average : localAverage
+  const average = averageValue !== null ? averageValue.toFixed(1) : 'N/A'
 
   return (
     <div className="bg-white rounded-lg shadow-md p-6">
@@ -31,6 +34,14 @@ export const VoteResults: React.FC = () => {
         <div className="text-center">
           <div className="text-sm text-gray-600 mb-1">Average</div>
           <div className="text-4xl font-bold text-blue-600">{average}</div>
+          {roundStats && roundStats.median !== null && (
+            <div className="text-sm text-gray-600 mt-2">
+              Median {roundStats.median} · Spread {roundStats.spread}
+              {roundStats.consensus && (
+                <span className="ml-2 text-green-700 font-medium">Consensus!</span>
+              )}
+            </div>
+          )}
         </div>
       </div>
 
@@ -1,12 +1,19 @@
-import React, { createContext, useContext, useEffect, useState, useCallback } from 'react'
+import React, { createContext, useContext, useEffect, useState, useCallback, useRef } from 'react'
 import { useSocket } from './SocketContext'
-import { Room } from '../types/room'
+import { Room, VoteStats } from '../types/room'
 import { User } from '../types/user'
 import {
+  JoinRoomData,
   RoomJoinedData,
   UserJoinedData,
+  UserUpdatedData,
   UserLeftData,
+  UserDisconnectedData,
+  UsersDisconnectedData,
   VoteSubmittedData,
+  VoteClearedData,
+  VoteBatchEntry,
+  VotesBatchedData,
   VotesRevealedData,
   RoundResetData,
   ErrorData,
@@ -17,6 +24,7 @@ interface RoomContextType {
   room: Room | null
   currentUserId: string | null
   currentUser: User | null
+  roundStats: VoteStats | null
   isFacilitator: boolean
   error: string | null
   joinRoom: (roomCode: string, userName: string) => void
@@ -31,6 +39,9 @@ interface RoomContextType {
 
 const RoomContext = createContext<RoomContextType | null>(null)
 
+// A request_sync not answered with room_state within this long is sent again
+const SYNC_RETRY_MS = 5000
+
 export const useRoom = () => {
   const context = useContext(RoomContext)
   if (!context) {
@@ -44,14 +55,101 @@ interface RoomProviderProps {
 }
 
 export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
-  const { socket, connected } = useSocket()
+  const { socket, connected, roomRouting } = useSocket()
   const [room, setRoom] = useState<Room | null>(null)
   const [currentUserId, setCurrentUserId] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
+  const [roundStats, setRoundStats] = useState<VoteStats | null>(null)
+  // Version of the room we show, updated as soon as a delta is accepted so
+  // deltas arriving before the next render are checked against it
+  const versionRef = useRef<number | null>(null)
+  // Pending retry of request_sync, set while a full state is awaited
+  const syncTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const roomRef = useRef<Room | null>(null)
+  const currentUserIdRef = useRef<string | null>(null)
 
   const currentUser = room && currentUserId ? room.users[currentUserId] : null
   const isFacilitator = currentUser?.is_facilitator || false
 
+  const cancelSync = useCallback(() => {
+    if (syncTimerRef.current) {
+      clearTimeout(syncTimerRef.current)
+      syncTimerRef.current = null
+    }
+  }, [])
+
+  // Ask for the full room state, and keep asking every SYNC_RETRY_MS until
+  // room_state arrives. A disconnect ends the retries: the rejoin catches up.
+  const requestSync = useCallback(() => {
+    if (!socket || syncTimerRef.current) return
+    const send = () => {
+      if (!socket.connected || versionRef.current === null) {
+        syncTimerRef.current = null
+        return
+      }
+      socket.emit('request_sync')
+      syncTimerRef.current = setTimeout(send, SYNC_RETRY_MS)
+    }
+    send()
+  }, [socket])
+
+  // Apply a versioned delta event. Deltas already reflected in our state are
+  // ignored; a gap means we missed one, so ask the server for the full state.
+  const applyDelta = useCallback((version: number, update: (room: Room) => Room) => {
+    const current = versionRef.current
+    if (current === null || version <= current) return
+    if (version !== current + 1) {
+      requestSync()
+      return
+    }
+    versionRef.current = version
+    setRoom(prev => (prev ? { ...update(prev), version } : prev))
+  }, [requestSync])
+
+  const clearRoom = useCallback(() => {
+    versionRef.current = null
+    cancelSync()
+    setRoom(null)
+    setCurrentUserId(null)
+  }, [cancelSync])
+
+  useEffect(() => {
+    roomRef.current = room
+    currentUserIdRef.current = currentUserId
+  }, [room, currentUserId])
+
+  // After a dropped connection the new socket is in no room: rejoin, sending
+  // the version we hold so the server can replay just the events we missed
+  useEffect(() => {
+    if (!socket) return
+
+    const rejoin = () => {
+      const current = roomRef.current
+      const userId = currentUserIdRef.current
+      if (!current || !userId || !current.users[userId]) return
+      const data: JoinRoomData = {
+        room_code: current.room_code,
+        user_name: current.users[userId].name,
+        user_id: userId,
+        last_version: current.version
+      }
+      socket.emit('join_room', data)
+    }
+
+    // The rejoin brings us up to date, so a sync pending from before the
+    // drop is no longer needed
+    const onReconnect = () => {
+      cancelSync()
+      rejoin()
+    }
+
+    socket.io.on('reconnect', onReconnect)
+    return () => {
+      socket.io.off('reconnect', onReconnect)
+      cancelSync()
+    }
+  }, [socket, cancelSync])
+
   // Socket event handlers
   useEffect(() => {
     if (!socket) return
@@ -68,72 +166,77 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
     socket.on('room_state', (data: Room) => {
       console.log('Room state received:', data)
       console.log('Room state user IDs:', Object.keys(data.users))
+      cancelSync()
+      versionRef.current = data.version
       setRoom(data)
     })
 
     socket.on('user_joined', (data: UserJoinedData) => {
       console.log('User joined event received:', data)
-      setRoom(prev => {
-        if (!prev) {
-          console.log('No previous room state, ignoring user_joined')
-          return prev
-        }
-        // Don't add if user already exists (prevents duplicate when joining)
-        if (prev.users[data.user.id]) {
-          console.log('User already exists, skipping:', data.user.id)
-          return prev
+      applyDelta(data.version, prev => ({
+        ...prev,
+        users: {
+          ...prev.users,
+          [data.user.id]: data.user
         }
-        console.log('Adding new user:', data.user.id)
-        return {
-          ...prev,
-          users: {
-            ...prev.users,
-            [data.user.id]: data.user
+      }))
+    })
+
+    socket.on('user_updated', (data: UserUpdatedData) => {
+      applyDelta(data.version, prev => ({
+        ...prev,
+        users: {
+          ...prev.users,
+          [data.user.id]: {
+            ...data.user,
+            // Keep whatever vote state we already show for this user
+            current_vote: prev.users[data.user.id]?.current_vote ?? data.user.current_vote
           }
         }
-      })
+      }))
     })
 
     socket.on('user_left', (data: UserLeftData) => {
       console.log('User left:', data)
-      setRoom(prev => {
-        if (!prev) return prev
+      applyDelta(data.version, prev => {
         const { [data.user_id]: removed, ...remainingUsers } = prev.users
-        return {
-          ...prev,
-          users: remainingUsers
-        }
+        const users = Object.fromEntries(
+          Object.entries(remainingUsers).map(([id, user]) => [
+            id,
+            { ...user, is_facilitator: id === data.facilitator_id }
+          ])
+        )
+        return { ...prev, users }
       })
     })
 
-    socket.on('user_disconnected', (data: { user_id: string }) => {
-      console.log('User disconnected:', data)
-      setRoom(prev => {
-        if (!prev || !prev.users[data.user_id]) return prev
-        return {
-          ...prev,
-          users: {
-            ...prev.users,
-            [data.user_id]: {
-              ...prev.users[data.user_id],
-              connected: false
-            }
+    const markDisconnected = (userIds: string[], version: number) => {
+      applyDelta(version, prev => {
+        const users = { ...prev.users }
+        userIds.forEach(userId => {
+          if (users[userId]) {
+            users[userId] = { ...users[userId], connected: false }
           }
-        }
+        })
+        return { ...prev, users }
       })
+    }
+
+    socket.on('user_disconnected', (data: UserDisconnectedData) => {
+      console.log('User disconnected:', data)
+      markDisconnected([data.user_id], data.version)
     })
 
-    socket.on('vote_submitted', (data: VoteSubmittedData) => {
-      console.log('Vote submitted:', data)
-      // Update UI to show user has voted (without revealing value)
-      // For other users, show 'hidden' placeholder. For current user, keep their actual vote
-      setRoom(prev => {
-        if (!prev || !prev.users[data.user_id]) return prev
-
-        // Don't override the current user's vote - they can see their own vote
-        if (data.user_id === currentUserId) {
-          return prev
-        }
+    socket.on('users_disconnected', (data: UsersDisconnectedData) => {
+      console.log('Users disconnected:', data)
+      markDisconnected(data.user_ids, data.version)
+    })
+
+    // Update UI to show a user has voted (without revealing the value) or cleared their vote.
+    // For other users, show 'hidden' placeholder. For current user, keep their actual vote
+    const applyVote = (data: VoteBatchEntry) => {
+      applyDelta(data.version, prev => {
+        if (!prev.users[data.user_id] || (data.voted && data.user_id === currentUserId)) return prev
 
         return {
           ...prev,
@@ -141,33 +244,31 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
             ...prev.users,
             [data.user_id]: {
               ...prev.users[data.user_id],
-              current_vote: 'hidden' // Placeholder to show they voted
+              current_vote: data.voted ? 'hidden' : null
             }
           }
         }
       })
+    }
+
+    socket.on('vote_submitted', (data: VoteSubmittedData) => {
+      console.log('Vote submitted:', data)
+      applyVote({ ...data, voted: true })
     })
 
-    socket.on('vote_cleared', (data: { user_id: string }) => {
-      setRoom(prev => {
-        if (!prev || !prev.users[data.user_id]) return prev
-        return {
-          ...prev,
-          users: {
-            ...prev.users,
-            [data.user_id]: {
-              ...prev.users[data.user_id],
-              current_vote: null
-            }
-          }
-        }
-      })
+    socket.on('vote_cleared', (data: VoteClearedData) => {
+      applyVote({ ...data, voted: false })
+    })
+
+    // Large rooms may batch vote notifications; apply them one by one, in order
+    socket.on('votes_batched', (data: VotesBatchedData) => {
+      data.votes.forEach(applyVote)
     })
 
     socket.on('votes_revealed', (data: VotesRevealedData) => {
       console.log('Votes revealed:', data)
-      setRoom(prev => {
-        if (!prev) return prev
+      setRoundStats(data.stats)
+      applyDelta(data.version, prev => {
         const updatedUsers = { ...prev.users }
         Object.entries(data.votes).forEach(([userId, vote]) => {
           if (updatedUsers[userId]) {
@@ -187,8 +288,8 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
 
     socket.on('round_reset', (data: RoundResetData) => {
       console.log('Round reset:', data)
-      setRoom(prev => {
-        if (!prev) return prev
+      setRoundStats(null)
+      applyDelta(data.version, prev => {
         const clearedUsers = Object.fromEntries(
           Object.entries(prev.users).map(([id, user]) => [
             id,
@@ -216,30 +317,42 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
           localStorage.removeItem(storageKey)
         }
 
-        setRoom(null)
-        setCurrentUserId(null)
+        clearRoom()
       }
     })
 
     socket.on('error', (data: ErrorData) => {
       console.error('Socket error:', data)
       setError(data.message)
+      // The room was cleaned up after a day without activity
+      if (data.code === 'room_expired') {
+        clearRoom()
+        return
+      }
+      // The pending sync may be what failed: ask again rather than wait out the retry
+      if (syncTimerRef.current) {
+        cancelSync()
+        requestSync()
+      }
     })
 
     return () => {
       socket.off('room_joined')
       socket.off('room_state')
       socket.off('user_joined')
+      socket.off('user_updated')
       socket.off('user_left')
       socket.off('user_disconnected')
+      socket.off('users_disconnected')
       socket.off('vote_submitted')
       socket.off('vote_cleared')
+      socket.off('votes_batched')
       socket.off('votes_revealed')
       socket.off('round_reset')
       socket.off('user_kicked')
       socket.off('error')
     }
-  }, [socket, currentUserId])
+  }, [socket, currentUserId, applyDelta, requestSync, cancelSync, clearRoom])
 
   const joinRoom = useCallback((roomCode: string, userName: string) => {
     if (!socket || !connected) {
@@ -251,12 +364,25 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
     const storageKey = `planning_poker_user_${roomCode}`
     const storedUserId = localStorage.getItem(storageKey)
 
-    socket.emit('join_room', {
+    const join = () => socket.emit('join_room', {
       room_code: roomCode,
       user_name: userName,
       user_id: storedUserId
     })
-  }, [socket, connected])
+
+    // With several workers the backend routes connections by the room in
+    // their URL; a socket opened for another page reconnects for this room
+    // before joining, so the room's sockets share a worker
+    const query = (socket.io.opts.query || {}) as Record<string, string>
+    const routedRoom = roomCode.toUpperCase()
+    if (roomRouting && query.room !== routedRoom) {
+      socket.io.opts.query = { ...query, room: routedRoom }
+      socket.once('connect', join)
+      socket.disconnect().connect()
+      return
+    }
+    join()
+  }, [socket, connected, roomRouting])
 
   const leaveRoom = useCallback(() => {
     if (!socket || !room) return
@@ -266,9 +392,8 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
     const storageKey = `planning_poker_user_${room.room_code}`
     localStorage.removeItem(storageKey)
 
-    setRoom(null)
-    setCurrentUserId(null)
-  }, [socket, room])
+    clearRoom()
+  }, [socket, room, clearRoom])
 
   const submitVote = useCallback((vote: string) => {
     if (!socket || !currentUserId) return
@@ -321,6 +446,7 @@ export const RoomProvider: React.FC<RoomProviderProps> = ({ children }) => {
         room,
         currentUserId,
         currentUser,
+        roundStats,
         isFacilitator,
         error,
         joinRoom,
@@ -1,15 +1,24 @@
 import React, { createContext, useContext, useEffect, useState, useRef } from 'react'
 import { io, Socket } from 'socket.io-client'
-import { WS_URL } from '../utils/constants'
+import msgpackParser from 'socket.io-msgpack-parser'
+import { WS_URL, SOCKET_PARSER } from '../utils/constants'
+import { ConnectSuccessData, ServerRestartingData } from '../types/events'
+
+// socket.io-client's reconnect delays, used except right after a server restart
+const RECONNECTION_DELAY = 1000
+const RECONNECTION_DELAY_MAX = 5000
 
 interface SocketContextType {
   socket: Socket | null
   connected: boolean
+  // The backend routes connections to workers by the room in their URL
+  roomRouting: boolean
 }
 
 const SocketContext = createContext<SocketContextType>({
   socket: null,
-  connected: false
+  connected: false,
+  roomRouting: false
 })
 
 export const useSocket = () => {
@@ -27,6 +36,7 @@ interface SocketProviderProps {
 export const SocketProvider: React.FC<SocketProviderProps> = ({ children }) => {
   const [socket, setSocket] = useState<Socket | null>(null)
   const [connected, setConnected] = useState(false)
+  const [roomRouting, setRoomRouting] = useState(false)
   const socketRef = useRef<Socket | null>(null)
 
   useEffect(() => {
@@ -37,11 +47,19 @@ export const SocketProvider: React.FC<SocketProviderProps> = ({ children }) => {
     }
 
     console.log('Creating new socket connection to:', WS_URL)
+    // With several backend workers connections are routed by room, so a
+    // room link connects straight to the worker that owns the room
+    const roomMatch = window.location.pathname.match(/^\/room\/([^/]+)/)
     const newSocket = io(WS_URL, {
-      transports: ['websocket', 'polling'],
+      // WebSocket only: with several backend workers a session must stay on one
+      // connection, which long-polling does not do
+      transports: ['websocket'],
+      query: roomMatch ? { room: decodeURIComponent(roomMatch[1]).toUpperCase() } : {},
       reconnection: true,
       reconnectionAttempts: 5,
-      reconnectionDelay: 1000
+      reconnectionDelay: RECONNECTION_DELAY,
+      reconnectionDelayMax: RECONNECTION_DELAY_MAX,
+      ...(SOCKET_PARSER === 'msgpack' ? { parser: msgpackParser } : {})
     })
 
     socketRef.current = newSocket
@@ -51,6 +69,22 @@ export const SocketProvider: React.FC<SocketProviderProps> = ({ children }) => {
       setConnected(true)
     })
 
+    newSocket.on('connect_success', (data?: ConnectSuccessData) => {
+      setRoomRouting(Boolean(data?.room_routing))
+    })
+
+    // A restarting server gives each client its own delay, so they do not
+    // all rush back at once; later drops use the usual delays again
+    newSocket.on('server_restarting', (data: ServerRestartingData) => {
+      newSocket.io.reconnectionDelay(data.reconnect_after)
+      newSocket.io.reconnectionDelayMax(Math.max(RECONNECTION_DELAY_MAX, data.reconnect_after))
+    })
+
+    newSocket.io.on('reconnect', () => {
+      newSocket.io.reconnectionDelay(RECONNECTION_DELAY)
+      newSocket.io.reconnectionDelayMax(RECONNECTION_DELAY_MAX)
+    })
+
     newSocket.on('disconnect', () => {
       console.log('Socket disconnected')
       setConnected(false)
@@ -73,7 +107,7 @@ export const SocketProvider: React.FC<SocketProviderProps> = ({ children }) => {
   }, [])
 
   return (
-    <SocketContext.Provider value={{ socket, connected }}>
+    <SocketContext.Provider value={{ socket, connected, roomRouting }}>
       {children}
     </SocketContext.Provider>
   )
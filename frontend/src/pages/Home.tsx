@@ -1,6 +1,7 @@
 import React, { useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { Layout } from '../components/Layout'
+import { API_URL } from '../utils/constants'
 
 export const Home: React.FC = () => {
   const [roomCode, setRoomCode] = useState('')
@@ -8,15 +9,23 @@ export const Home: React.FC = () => {
   const [isCreating, setIsCreating] = useState(false)
   const navigate = useNavigate()
 
-  const handleCreateRoom = () => {
+  const handleCreateRoom = async () => {
     if (!userName.trim()) {
       alert('Please enter your name')
       return
     }
     setIsCreating(true)
-    // Generate a random room code for new rooms
-    const newRoomCode = Math.random().toString(36).substring(2, 8).toUpperCase()
-    navigate(`/room/${newRoomCode}?name=${encodeURIComponent(userName)}`)
+    // Ask the server for an unused room code
+    try {
+      const response = await fetch(`${API_URL}/rooms`, { method: 'POST' })
+      if (!response.ok) throw new Error(`HTTP ${response.status}`)
+      const { room_code: newRoomCode } = await response.json()
+      navigate(`/room/${newRoomCode}?name=${encodeURIComponent(userName)}`)
+    } catch (err) {
+      console.error('Failed to create room:', err)
+      alert('Could not create a room, please try again')
+      setIsCreating(false)
+    }
   }
 
   const handleJoinRoom = (e: React.FormEvent) => {
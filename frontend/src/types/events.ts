@@ -1,45 +1,91 @@
 import { User } from './user'
+import { VoteStats, RoomStats } from './room'
 
 export interface JoinRoomData {
   room_code: string
   user_name: string
+  user_id?: string | null
+  // Room version we still hold after a reconnect; only missed events are sent back
+  last_version?: number
 }
 
 export interface SubmitVoteData {
   vote: string
 }
 
+export interface VoteHistoryRequestData {
+  offset?: number
+  limit?: number
+}
+
+export interface ConnectSuccessData {
+  // Connections are routed to backend workers by the room in their URL
+  room_routing: boolean
+}
+
+export interface ServerRestartingData {
+  // Milliseconds to wait before reconnecting, staggered per client by the server
+  reconnect_after: number
+}
+
 export interface RoomJoinedData {
   room_code: string
   user_id: string
   is_facilitator: boolean
 }
 
-export interface UserJoinedData {
+// Delta events carry the room version produced by the change
+export interface VersionedData {
+  version: number
+}
+
+export interface UserJoinedData extends VersionedData {
+  user: User
+}
+
+export interface UserUpdatedData extends VersionedData {
   user: User
 }
 
-export interface UserLeftData {
+export interface UserLeftData extends VersionedData {
   user_id: string
+  facilitator_id: string | null
 }
 
-export interface UserDisconnectedData {
+export interface UserDisconnectedData extends VersionedData {
   user_id: string
 }
 
-export interface VoteSubmittedData {
+// Several users marked offline by one change
+export interface UsersDisconnectedData extends VersionedData {
+  user_ids: string[]
+}
+
+export interface VoteSubmittedData extends VersionedData {
   user_id: string
 }
 
-export interface VoteClearedData {
+export interface VoteClearedData extends VersionedData {
   user_id: string
 }
 
-export interface VotesRevealedData {
+export interface VoteBatchEntry extends VersionedData {
+  user_id: string
+  voted: boolean // false for a cleared vote
+}
+
+// Several vote_submitted / vote_cleared deltas sent together, in version order
+export interface VotesBatchedData {
+  votes: VoteBatchEntry[]
+}
+
+export interface VotesRevealedData extends VersionedData {
   votes: Record<string, string>
+  stats: VoteStats
+  room_stats: RoomStats | null
 }
 
-export interface RoundResetData {
+export interface RoundResetData extends VersionedData {
   round: number
 }
 
@@ -1,9 +1,38 @@
 import { User } from './user'
 
+export interface VoteStats {
+  vote_count: number
+  numeric_count: number
+  average: number | null
+  median: number | null
+  mode: string[]
+  min: number | null
+  max: number | null
+  spread: number | null
+  consensus: boolean
+  distribution: Record<string, number>
+}
+
+export interface RoomStats {
+  rounds: number
+  consensus_rounds: number
+  vote_count: number
+  numeric_count: number
+  average: number | null
+  distribution: Record<string, number>
+}
+
 export interface VoteHistory {
   round: number
   votes: Record<string, string>
   revealed_at: string
+  stats: VoteStats | null
+}
+
+export interface VoteHistoryPage {
+  entries: VoteHistory[]
+  offset: number
+  total: number
 }
 
 export interface Room {
@@ -11,6 +40,6 @@ export interface Room {
   created_at: string
   state: 'voting' | 'revealed'
   current_round: number
+  version: number
   users: Record<string, User>
-  vote_history: VoteHistory[]
 }
@@ -15,3 +15,6 @@ export type CardValue = (typeof CARD_VALUES)[number];
 
 export const WS_URL = import.meta.env.VITE_WS_URL || "http://localhost:8000";
 export const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+// Must match SOCKETIO_SERIALIZER on the backend ("json" or "msgpack")
+export const SOCKET_PARSER = import.meta.env.VITE_SOCKET_PARSER || "json";
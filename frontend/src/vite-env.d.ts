@@ -3,8 +3,11 @@
 interface ImportMetaEnv {
   readonly VITE_API_URL: string
   readonly VITE_WS_URL: string
+  readonly VITE_SOCKET_PARSER?: string
 }
 
 interface ImportMeta {
   readonly env: ImportMetaEnv
 }
+
+declare module "socket.io-msgpack-parser"